@@ -0,0 +1,234 @@
+import json
+import re
+import time
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+import config
+from modules import email_sender, llm_scheduler
+from modules.llm_cache import cache_key
+from modules.researcher import Researcher
+from benchmarks.scenarios import search_results
+
+_RESULT_RE = re.compile(
+    r"- Title: (?P<title>.*)\n  Snippet: (?P<snippet>.*)\n  Link: (?P<link>.*)(?:\n  Result: (?P<result>\d+))?"
+)
+_YEAR_RE = re.compile(r"Founded in (\d{4})")
+_SECTOR_RE = re.compile(r"is a (\w[\w-]*) company")
+
+
+def _completion(content: str, prompt: str):
+    usage = SimpleNamespace(prompt_tokens=len(prompt) // 4 + 1, completion_tokens=len(content) // 4 + 1,
+                            total_tokens=(len(prompt) + len(content)) // 4 + 2)
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content), finish_reason="stop")],
+                           usage=usage)
+
+
+def _stream_chunk(delta: Optional[str], finish_reason: Optional[str] = None):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=delta), finish_reason=finish_reason)])
+
+
+class _FakeCompletions:
+    def __init__(self, client):
+        self._client = client
+
+    def create(self, model, messages, temperature=0.0, max_tokens=None, stream=False, **kwargs):
+        include_usage = bool((kwargs.get("stream_options") or {}).get("include_usage"))
+        return self._client.complete(model, messages, temperature, max_tokens, stream, include_usage)
+
+
+class FakeLLMClient:
+    def __init__(self, latency: float = 0.02, fixtures: Optional[str] = None, chunk_chars: int = 16):
+        """
+        Drop-in stand-in for config.client. Replays recorded responses keyed
+        like the LLM cache (see export_llm_fixtures) and otherwise synthesizes
+        answers from the prompt.
+        :param latency: Seconds per call (spread across chunks when streaming).
+        :param fixtures: JSON file mapping cache keys to response content.
+        """
+        self.latency = latency
+        self.chunk_chars = chunk_chars
+        self.calls = 0
+        self.fixtures = {}
+        if fixtures:
+            with open(fixtures, encoding="utf-8") as f:
+                self.fixtures = json.load(f)
+        self.chat = SimpleNamespace(completions=_FakeCompletions(self))
+
+    def _respond(self, prompt: str) -> str:
+        results = _RESULT_RE.findall(prompt)
+        if results:
+            entries = []
+            for title, snippet, link, number in results:
+                year = _YEAR_RE.search(snippet)
+                sector = _SECTOR_RE.search(snippet)
+                entries.append({
+                    **({"result": int(number)} if number else {}),
+                    "name": title.split(" - ")[0],
+                    "description": snippet,
+                    "sector": sector.group(1) if sector else None,
+                    "founded_year": int(year.group(1)) if year else None,
+                    "website": link,
+                    "notes": "",
+                })
+            return json.dumps(entries)
+        if "plan" in prompt.lower():
+            return "\n".join(f"{i}. Research step {i}." for i in range(1, 6))
+        lines = [line for line in prompt.splitlines() if line.strip()][1:40]
+        return (
+            "## Overview\nThe market shows **steady growth** across several sectors.\n\n"
+            "## Notable Companies\n" + "\n".join(f"- {line[:120]}" for line in lines) +
+            "\n\n## Recommendations\n1. Focus on high-growth sectors.\n2. Track new entrants.\n"
+        )
+
+    def complete(self, model, messages, temperature, max_tokens, stream, include_usage=False):
+        self.calls += 1
+        prompt = messages[-1]["content"]
+        content = self.fixtures.get(cache_key(model, messages, temperature, max_tokens)) or self._respond(prompt)
+        if not stream:
+            time.sleep(self.latency)
+            return _completion(content, prompt)
+        return self._stream(content, prompt, include_usage)
+
+    def _stream(self, content, prompt, include_usage):
+        pieces = [content[i:i + self.chunk_chars] for i in range(0, len(content), self.chunk_chars)]
+        delay = self.latency / max(len(pieces), 1)
+        for piece in pieces:
+            time.sleep(delay)
+            yield _stream_chunk(piece)
+        yield _stream_chunk(None, "stop")
+        if include_usage:
+            yield SimpleNamespace(choices=[], usage=_completion(content, prompt).usage)
+
+
+def export_llm_fixtures(cache_path: str, out_path: str) -> int:
+    """
+    Dump a real LLM response cache (config.LLM_CACHE_PATH) into a fixture
+    file that FakeLLMClient can replay.
+    """
+    import sqlite3
+
+    conn = sqlite3.connect(cache_path)
+    fixtures = dict(conn.execute("SELECT key, content FROM responses"))
+    conn.close()
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(fixtures, f)
+    return len(fixtures)
+
+
+class FakeSearch:
+    def __init__(self, companies: List[Dict], latency: float = 0.05):
+        """
+        Replaces Researcher._fetch_page: each page request returns the
+        matching slice of the scenario's results in Custom Search JSON shape,
+        so pagination and de-duplication still run for real.
+        """
+        self.results = search_results(companies)
+        self.latency = latency
+        self.calls = 0
+
+    def __call__(self, researcher, query: str, start: int, num: int) -> Dict:
+        self.calls += 1
+        time.sleep(self.latency)
+        return {"items": self.results[start - 1:start - 1 + num]}
+
+
+class FakeSMTP:
+    sent = 0
+
+    def __init__(self, host=None, port=None, timeout=None, latency: float = 0.01, **kwargs):
+        self.latency = latency
+
+    def login(self, user, password):
+        time.sleep(self.latency)
+
+    def send_message(self, msg, from_addr=None, to_addrs=None):
+        msg.as_bytes()  # pay the serialization cost a real send would
+        time.sleep(self.latency)
+        FakeSMTP.sent += 1
+
+    # Enough of the protocol for EmailSender._send_streaming
+    def ehlo_or_helo_if_needed(self):
+        pass
+
+    def has_extn(self, name):
+        return False
+
+    def mail(self, sender, options=()):
+        return (250, b"OK")
+
+    def rcpt(self, recipient, options=()):
+        return (250, b"OK")
+
+    def docmd(self, cmd, args=""):
+        return (354, b"Go ahead") if cmd == "DATA" else (250, b"OK")
+
+    def send(self, data):
+        pass
+
+    def getreply(self):
+        time.sleep(self.latency)
+        FakeSMTP.sent += 1
+        return (250, b"OK")
+
+    def rset(self):
+        pass
+
+    def noop(self):
+        return (250, b"OK")
+
+    def quit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+_MISSING = object()
+
+
+class fake_backends:
+    """
+    Context manager that swaps in the fake LLM client, search and SMTP
+    backends and turns off every on-disk cache and artifact so each run does full work.
+    """
+
+    def __init__(self, companies: List[Dict], llm_latency: float = 0.02, search_latency: float = 0.05,
+                 smtp_latency: float = 0.01, fixtures: Optional[str] = None):
+        self.llm = FakeLLMClient(latency=llm_latency, fixtures=fixtures)
+        self.search = FakeSearch(companies, latency=search_latency)
+        self.smtp_latency = smtp_latency
+        self._saved = {}
+
+    def __enter__(self):
+        search = self.search
+        smtp_latency = self.smtp_latency
+
+        def smtp(*args, **kwargs):
+            return FakeSMTP(*args, latency=smtp_latency, **kwargs)
+
+        patches = [
+            (config, "client", self.llm),
+            (config, "LLM_CACHE_ENABLED", False),
+            (config, "SEARCH_CACHE_ENABLED", False),
+            (config, "ENTITY_STORE_ENABLED", False),
+            (config, "ARTIFACTS_ENABLED", False),
+            # No rate limits: the fake LLM has none and benchmarks measure our own overhead
+            (llm_scheduler, "_scheduler", llm_scheduler.LLMScheduler(rpm=0, tpm=0)),
+            (Researcher, "_fetch_page", lambda researcher, q, start, num: search(researcher, q, start, num)),
+            (email_sender.smtplib, "SMTP", smtp),
+            (email_sender.smtplib, "SMTP_SSL", smtp),
+        ]
+        for target, name, value in patches:
+            # vars() rather than getattr() so the lazy config.client is never built
+            self._saved[(target, name)] = vars(target).get(name, _MISSING)
+            setattr(target, name, value)
+        return self
+
+    def __exit__(self, *exc):
+        for (target, name), value in self._saved.items():
+            if value is _MISSING:
+                delattr(target, name)
+            else:
+                setattr(target, name, value)
+        self._saved.clear()
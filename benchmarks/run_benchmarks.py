@@ -0,0 +1,204 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.analyzer import Analyzer
+from modules.charts import ChartRenderer
+from modules.email_sender import EmailSender
+from modules.pdf_generator import PDFGenerator
+from modules.researcher import Researcher
+from modules.summarizer import Summarizer
+from benchmarks.fakes import fake_backends
+from benchmarks.scenarios import SIZES, generate_companies, search_results
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+STAGE_NAMES = ["research", "extract", "summarize", "analyze", "chart", "render", "email"]
+
+
+def git_commit() -> str:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(RESULTS_DIR), check=True)
+        commit = out.stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True,
+                               text=True, cwd=os.path.dirname(RESULTS_DIR)).stdout.strip()
+        return f"{commit}-dirty" if dirty else commit
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def measure(fn: Callable, memory: bool = True) -> Dict:
+    """
+    Run fn once and return its result with wall time and peak traced memory.
+    """
+    gc.collect()
+    if memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = fn()
+    finally:
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if memory else None
+        if memory:
+            tracemalloc.stop()
+    return {"result": result, "seconds": round(elapsed, 4),
+            "peak_kb": round(peak / 1024, 1) if peak is not None else None}
+
+
+def run_scenario(size: int, out_dir: str, recipients: int = 20, memory: bool = True, seed: int = 42,
+                 llm_latency: float = 0.02, search_latency: float = 0.05, smtp_latency: float = 0.01,
+                 fixtures: Optional[str] = None, stages: List[str] = None) -> Dict:
+    """
+    Run every stage of the pipeline for one scenario size against fake
+    backends. Stages feed each other as in the real pipeline; extraction
+    covers all `size` results while research is capped at the API's 100.
+    """
+    stages = stages or STAGE_NAMES
+    companies = generate_companies(size, seed=seed)
+    timings = {}
+    ctx = {}
+
+    with fake_backends(companies, llm_latency=llm_latency, search_latency=search_latency,
+                       smtp_latency=smtp_latency, fixtures=fixtures) as fakes:
+        summarizer = Summarizer()
+        analyzer = Analyzer(renderer=ChartRenderer())
+
+        def research():
+            return Researcher(api_key="bench", cse_id="bench").search("benchmark startups", num_results=size)
+
+        def extract():
+            return summarizer.extract_structured(search_results(companies))
+
+        def summarize():
+            return summarizer.summarize_market(ctx["structured"])
+
+        def analyze():
+            df = analyzer.to_dataframe(ctx["structured"])
+            return analyzer.analyze(df), analyzer.stats_and_chart_specs(df)
+
+        def chart():
+            return [analyzer.renderer.render(spec) for _, spec in ctx["analysis"][1][1]]
+
+        def render():
+            gen = PDFGenerator()
+            gen.save_dir = out_dir
+            return gen.create_report(ctx["summary"], f"bench_{size}.pdf", stats=ctx["analysis"][1][0],
+                                     charts=ctx["charts"], companies=ctx["structured"])
+
+        def email():
+            sender = EmailSender(host="bench.invalid", port=25, user="", password="", use_ssl=False)
+            try:
+                return sender.send_bulk([f"user{i}@example.com" for i in range(recipients)],
+                                        "Benchmark report", "See attached.", attachment_path=ctx["pdf_path"])
+            finally:
+                sender.close()
+
+        steps = {"research": ("raw_results", research), "extract": ("structured", extract),
+                 "summarize": ("summary", summarize), "analyze": ("analysis", analyze),
+                 "chart": ("charts", chart), "render": ("pdf_path", render), "email": ("deliveries", email)}
+        # Later stages need earlier outputs, so skipped stages still run, untimed.
+        needed = max(STAGE_NAMES.index(name) for name in stages)
+        for name in STAGE_NAMES[:needed + 1]:
+            key, fn = steps[name]
+            if name not in stages:
+                ctx[key] = fn()
+                continue
+            calls_before = fakes.llm.calls
+            m = measure(fn, memory=memory)
+            ctx[key] = m.pop("result")
+            m["llm_calls"] = fakes.llm.calls - calls_before
+            timings[name] = m
+
+    timings["_meta"] = {
+        "companies": size,
+        "structured": len(ctx.get("structured") or []),
+        "pdf_bytes": os.path.getsize(ctx["pdf_path"]) if ctx.get("pdf_path") else None,
+        "delivered": sum(1 for d in ctx.get("deliveries") or [] if d["ok"]),
+    }
+    return timings
+
+
+def compare(current: Dict, baseline: Dict):
+    """
+    Print per-stage time and memory deltas against a previous results file.
+    """
+    print(f"\nCompared with {baseline['commit']}:")
+    for size, stages in current["scenarios"].items():
+        old_stages = baseline["scenarios"].get(size)
+        if not old_stages:
+            continue
+        for stage, m in stages.items():
+            old = old_stages.get(stage)
+            if stage.startswith("_") or not old:
+                continue
+            dt = (m["seconds"] - old["seconds"]) / old["seconds"] * 100 if old["seconds"] else 0.0
+            line = f"  {size:>6} {stage:<10} {old['seconds']:>9.3f}s -> {m['seconds']:>9.3f}s ({dt:+.1f}%)"
+            if m.get("peak_kb") is not None and old.get("peak_kb"):
+                dm = (m["peak_kb"] - old["peak_kb"]) / old["peak_kb"] * 100
+                line += f"  mem {old['peak_kb']:.0f} -> {m['peak_kb']:.0f} KB ({dm:+.1f}%)"
+            print(line)
+
+
+def print_results(results: Dict):
+    print(f"Commit {results['commit']}")
+    for size, stages in results["scenarios"].items():
+        print(f"\n{size} companies")
+        for stage in STAGE_NAMES:
+            m = stages.get(stage)
+            if not m:
+                continue
+            mem = f"{m['peak_kb']:>10.0f} KB" if m["peak_kb"] is not None else ""
+            print(f"  {stage:<10} {m['seconds']:>9.3f}s {mem}  llm calls: {m['llm_calls']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end pipeline benchmark against fake backends.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="Scenario sizes (companies)")
+    parser.add_argument("--stages", nargs="+", choices=STAGE_NAMES, default=None)
+    parser.add_argument("--recipients", type=int, default=20)
+    parser.add_argument("--llm-latency", type=float, default=0.02, help="Seconds per fake LLM call")
+    parser.add_argument("--search-latency", type=float, default=0.05, help="Seconds per fake search page")
+    parser.add_argument("--smtp-latency", type=float, default=0.01, help="Seconds per fake SMTP command")
+    parser.add_argument("--fixtures", default=None, help="Recorded LLM responses (see fakes.export_llm_fixtures)")
+    parser.add_argument("--no-memory", action="store_true", help="Skip tracemalloc (it slows Python code down)")
+    parser.add_argument("--output", default=None, help="Results file (defaults to results/<commit>.json)")
+    parser.add_argument("--compare", default=None, help="Previous results file to diff against")
+    args = parser.parse_args()
+
+    results = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "params": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        "scenarios": {},
+    }
+    with tempfile.TemporaryDirectory() as out_dir:
+        for size in args.sizes:
+            print(f"Running {size} companies...")
+            results["scenarios"][str(size)] = run_scenario(
+                size, out_dir, recipients=args.recipients, memory=not args.no_memory,
+                llm_latency=args.llm_latency, search_latency=args.search_latency,
+                smtp_latency=args.smtp_latency, fixtures=args.fixtures, stages=args.stages,
+            )
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{results['commit']}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+    print_results(results)
+    print(f"\nResults written to {output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(results, json.load(f))
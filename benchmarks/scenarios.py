@@ -0,0 +1,42 @@
+import random
+from typing import Dict, List
+
+SECTORS = ["Fintech", "Healthtech", "Edtech", "Agritech", "E-commerce", "Logistics", "AI", "Cleantech"]
+PREFIXES = ["Neo", "Data", "Smart", "Deep", "Blue", "Quantum", "Bright", "Swift", "Green", "Nova"]
+SUFFIXES = ["Labs", "AI", "Tech", "Systems", "Works", "Analytics", "Hub", "Cloud"]
+
+
+def generate_companies(n: int, seed: int = 42) -> List[Dict]:
+    """
+    Deterministic synthetic companies for a scenario of size n.
+    """
+    rng = random.Random(seed)
+    companies = []
+    for i in range(n):
+        name = f"{rng.choice(PREFIXES)}{rng.choice(SUFFIXES)} {i}"
+        sector = rng.choice(SECTORS)
+        companies.append({
+            "name": name,
+            "sector": sector,
+            "founded_year": rng.randint(2005, 2024),
+            "website": f"https://{name.lower().replace(' ', '')}.example.com",
+            "description": f"{name} builds {sector.lower()} products for emerging markets.",
+        })
+    return companies
+
+
+def search_results(companies: List[Dict]) -> List[Dict]:
+    """
+    Raw CSE-style results (title, link, snippet) for the companies.
+    """
+    return [
+        {
+            "title": f"{c['name']} - {c['sector']} startup",
+            "link": c["website"],
+            "snippet": f"Founded in {c['founded_year']}, {c['name']} is a {c['sector']} company. {c['description']}",
+        }
+        for c in companies
+    ]
+
+
+SIZES = [10, 100, 1000, 10000]
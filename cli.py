@@ -0,0 +1,162 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import config
+from modules.pipeline import new_context, run_pipeline
+
+
+def _read_json(path: str):
+    if path == "-":
+        return json.load(sys.stdin)
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _read_text(path: str) -> str:
+    if path == "-":
+        return sys.stdin.read()
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def _write(output: str, text: str):
+    if not output or output == "-":
+        print(text)
+        return
+    with open(output, "w", encoding="utf-8") as f:
+        f.write(text)
+    print(f"Written to {output}", file=sys.stderr)
+
+
+def cmd_plan(args):
+    from modules.pipeline import plan_stage
+
+    _write(args.output, plan_stage(new_context(args.goal))["plan"])
+
+
+def cmd_research(args):
+    from modules.pipeline import research_stage
+
+    ctx = new_context(args.query, num_results=args.num_results)
+    results = research_stage(ctx)["raw_results"]
+    if args.enrich:
+        from modules.enricher import Enricher
+        results = Enricher().enrich(results)
+    _write(args.output, json.dumps(results, indent=2, ensure_ascii=False))
+
+
+def cmd_summarize(args):
+    from modules.pipeline import extract_stage, summarize_stage
+
+    ctx = new_context("summarize")
+    ctx["raw_results"] = _read_json(args.results)
+    ctx.update(extract_stage(ctx))
+    if args.structured_output:
+        with open(args.structured_output, "w", encoding="utf-8") as f:
+            json.dump(ctx["structured"], f, indent=2, ensure_ascii=False)
+    _write(args.output, summarize_stage(ctx)["summary"])
+
+
+def cmd_render(args):
+    from modules.pipeline import analyze_stage, render_stage
+
+    name = args.name or os.path.splitext(os.path.basename(args.summary))[0]
+    ctx = new_context(name)
+    ctx["summary"] = _read_text(args.summary)
+    ctx["stats"] = None
+    if args.structured:
+        ctx["structured"] = _read_json(args.structured)
+        ctx.update(analyze_stage(ctx))
+    print(render_stage(ctx)["pdf_path"])
+
+
+def cmd_send(args):
+    from modules.email_sender import EmailSender
+
+    sender = EmailSender()
+    try:
+        deliveries = sender.send_bulk(args.recipient, args.subject, args.body, attachment_path=args.pdf)
+    finally:
+        sender.close()
+    for d in deliveries:
+        print(f"{'✅' if d['ok'] else '❌'} {d['recipient']}" + (f": {d['error']}" if d["error"] else ""))
+    if not all(d["ok"] for d in deliveries):
+        sys.exit(1)
+
+
+def cmd_run(args):
+    ctx = run_pipeline(new_context(args.goal, query=args.query, recipients=args.recipient,
+                                   num_results=args.num_results))
+    print("Plan:", ctx["plan"])
+    print("Stats:", ctx["stats"])
+    print("Report:", ctx["pdf_path"])
+    for d in ctx["deliveries"]:
+        print(f"{'✅' if d['ok'] else '❌'} {d['recipient']}")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Market research pipeline, one stage or end to end.")
+    parser.add_argument("--prewarm", action="store_true",
+                        help="Load every dependency and API client up front (for long-lived workers)")
+    parser.add_argument("--trace", default=None, help="Append JSONL spans to this file")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("plan", help="Print a research plan for a goal")
+    p.add_argument("goal")
+    p.add_argument("-o", "--output", default=None)
+    p.set_defaults(func=cmd_plan)
+
+    p = sub.add_parser("research", help="Search and print raw results as JSON")
+    p.add_argument("query")
+    p.add_argument("-n", "--num-results", type=int, default=5)
+    p.add_argument("-o", "--output", default=None)
+    p.add_argument("--enrich", action="store_true", help="Fetch each result's page for extraction")
+    p.set_defaults(func=cmd_research)
+
+    p = sub.add_parser("summarize", help="Extract companies from results JSON and write a market summary")
+    p.add_argument("results", help="Raw results JSON from 'research' ('-' for stdin)")
+    p.add_argument("-o", "--output", default=None)
+    p.add_argument("--structured-output", default=None, help="Also save the extracted companies as JSON")
+    p.set_defaults(func=cmd_summarize)
+
+    p = sub.add_parser("render", help="Render a summary (and optional company JSON) to PDF")
+    p.add_argument("summary", help="Summary text file ('-' for stdin)")
+    p.add_argument("--structured", default=None, help="Companies JSON for stats and charts")
+    p.add_argument("--name", default=None, help="Report name (defaults to the summary file name)")
+    p.set_defaults(func=cmd_render)
+
+    p = sub.add_parser("send", help="Email a PDF report")
+    p.add_argument("pdf")
+    p.add_argument("--recipient", action="append", required=True)
+    p.add_argument("--subject", default="Market Research Report")
+    p.add_argument("--body", default="Please find attached the market research report.")
+    p.set_defaults(func=cmd_send)
+
+    p = sub.add_parser("run", help="Run the whole pipeline for one goal")
+    p.add_argument("goal")
+    p.add_argument("--query", default=None, help="Search query (defaults to the goal)")
+    p.add_argument("--recipient", action="append", default=[])
+    p.add_argument("-n", "--num-results", type=int, default=5)
+    p.set_defaults(func=cmd_run)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    config.ensure_dirs()
+    if args.trace:
+        from modules import tracing
+        tracing.configure(args.trace)
+    if args.prewarm:
+        from modules.pipeline import prewarm
+        started = time.perf_counter()
+        prewarm()
+        print(f"Prewarmed in {time.perf_counter() - started:.2f}s", file=sys.stderr)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
 import os
+import threading
 from dotenv import load_dotenv
-from openai import OpenAI
 
 load_dotenv()
 
@@ -11,15 +11,107 @@ EMAIL_HOST = os.getenv("EMAIL_HOST")
 EMAIL_USER = os.getenv("EMAIL_USER")
 EMAIL_PORT = int(os.getenv("EMAIL_PORT", 465))
 EMAIL_PASS = os.getenv("EMAIL_PASS")
-
-# Initialize OpenAI client
-client = OpenAI(api_key=OPENAI_API_KEY)
+EMAIL_FROM = os.getenv("EMAIL_FROM") or EMAIL_USER or "market-research@localhost"
+EMAIL_USE_SSL = os.getenv("EMAIL_USE_SSL", "1") != "0"  # 0 for plain SMTP, e.g. a local debugging server
+EMAIL_POOL_SIZE = int(os.getenv("EMAIL_POOL_SIZE", 3))
+# Attachments this large are base64-streamed from disk to the SMTP socket
+EMAIL_STREAM_MIN_BYTES = int(os.getenv("EMAIL_STREAM_MIN_BYTES", 8 * 1024 * 1024))
 
 # Local paths
 DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
 REPORTS_DIR = os.path.join(DATA_DIR, "reports")
 STARTUPS_JSON = os.path.join(DATA_DIR, "startups.json")
+CACHE_DIR = os.path.join(DATA_DIR, "cache")
+
+# LLM response cache (set LLM_CACHE_TTL / LLM_CACHE_MAX_BYTES to 0 to disable the limit)
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") != "0"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(CACHE_DIR, "llm_responses.sqlite3"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", 7 * 24 * 3600)) or None
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", 256 * 1024 * 1024)) or None
+
+# Shared LLM rate limits (per process; 0 disables a limit). Calls queue until the
+# request and token budgets allow them, interactive calls ahead of bulk ones.
+LLM_RPM = int(os.getenv("LLM_RPM", 500))
+LLM_TPM = int(os.getenv("LLM_TPM", 200000))
+LLM_BURST_SECONDS = float(os.getenv("LLM_BURST_SECONDS", 10))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 5))
+LLM_DEFAULT_COMPLETION_TOKENS = int(os.getenv("LLM_DEFAULT_COMPLETION_TOKENS", 1000))
+# Bulk runs merge small extraction requests from different goals into one call.
+# A merged call's answer is budgeted at the single-call rate per result
+# (EXTRACT_MAX_TOKENS / EXTRACT_CHUNK_MAX_ITEMS); LLM_BATCH_MAX_TOKENS caps that
+# completion budget and so how many results one merged call carries.
+LLM_BATCH_WINDOW = float(os.getenv("LLM_BATCH_WINDOW", 0.05))
+LLM_BATCH_MAX_ITEMS = int(os.getenv("LLM_BATCH_MAX_ITEMS", 24))
+LLM_BATCH_MAX_TOKENS = int(os.getenv("LLM_BATCH_MAX_TOKENS", 4000))
+
+# Structured extraction: results per LLM call and concurrent calls
+EXTRACT_CHUNK_TOKENS = int(os.getenv("EXTRACT_CHUNK_TOKENS", 1500))
+EXTRACT_CHUNK_MAX_ITEMS = int(os.getenv("EXTRACT_CHUNK_MAX_ITEMS", 6))
+# Completion budget of one extraction call (a chunk of up to EXTRACT_CHUNK_MAX_ITEMS results)
+EXTRACT_MAX_TOKENS = int(os.getenv("EXTRACT_MAX_TOKENS", 800))
+EXTRACT_MAX_WORKERS = int(os.getenv("EXTRACT_MAX_WORKERS", 4))
+
+# Market summary: above this many entries summarize per sector group, then reduce
+SUMMARY_HIERARCHICAL_THRESHOLD = int(os.getenv("SUMMARY_HIERARCHICAL_THRESHOLD", 60))
+SUMMARY_GROUP_SIZE = int(os.getenv("SUMMARY_GROUP_SIZE", 40))
+SUMMARY_REDUCE_FANIN = int(os.getenv("SUMMARY_REDUCE_FANIN", 12))
+
+# Persistent company store; seeded from STARTUPS_JSON on first use
+ENTITY_STORE_ENABLED = os.getenv("ENTITY_STORE_ENABLED", "1") != "0"
+ENTITY_STORE_PATH = os.getenv("ENTITY_STORE_PATH", os.path.join(DATA_DIR, "startups.sqlite3"))
+
+# Optional enrichment: fetch result pages so extraction sees more than the snippet
+ENRICH_ENABLED = os.getenv("ENRICH_ENABLED", "0") == "1"
+ENRICH_CACHE_DIR = os.getenv("ENRICH_CACHE_DIR", os.path.join(CACHE_DIR, "pages"))
+ENRICH_FRESH_TTL = float(os.getenv("ENRICH_FRESH_TTL", 7 * 24 * 3600))
+ENRICH_CONCURRENCY = int(os.getenv("ENRICH_CONCURRENCY", 16))
+ENRICH_PER_HOST = int(os.getenv("ENRICH_PER_HOST", 2))
+ENRICH_MAX_BYTES = int(os.getenv("ENRICH_MAX_BYTES", 512 * 1024))
+ENRICH_TIMEOUT = float(os.getenv("ENRICH_TIMEOUT", 10))
+ENRICH_TEXT_CHARS = int(os.getenv("ENRICH_TEXT_CHARS", 1500))
+
+# Stage outputs stored under a hash of their inputs; stages whose inputs are unchanged are not re-run
+ARTIFACTS_ENABLED = os.getenv("ARTIFACTS_ENABLED", "1") != "0"
+ARTIFACTS_DIR = os.getenv("ARTIFACTS_DIR", os.path.join(CACHE_DIR, "artifacts"))
+
+# Durable job queue with per-stage checkpoints
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", os.path.join(DATA_DIR, "jobs.sqlite3"))
+
+# Append a JSONL span per stage and outbound call here (unset: in-memory summaries only)
+TRACE_PATH = os.getenv("TRACE_PATH") or None
+
+# Search result cache; point SEARCH_CACHE_DIR at a recorded fixture store and set
+# SEARCH_OFFLINE=1 to run the pipeline without network access.
+SEARCH_CACHE_ENABLED = os.getenv("SEARCH_CACHE_ENABLED", "1") != "0"
+SEARCH_CACHE_DIR = os.getenv("SEARCH_CACHE_DIR", os.path.join(CACHE_DIR, "search"))
+SEARCH_FRESH_TTL = float(os.getenv("SEARCH_FRESH_TTL", 24 * 3600))
+SEARCH_STALE_TTL = float(os.getenv("SEARCH_STALE_TTL", 7 * 24 * 3600))
+SEARCH_OFFLINE = os.getenv("SEARCH_OFFLINE", "0") == "1"
+# Seconds to wait at exit for stale-while-revalidate refreshes still in flight.
+SEARCH_REFRESH_JOIN_TIMEOUT = float(os.getenv("SEARCH_REFRESH_JOIN_TIMEOUT", 10))
+
+_client_lock = threading.Lock()
+
+
+def __getattr__(name):
+    # The OpenAI client (and the openai package) is only loaded on first use of
+    # config.client; tests and benchmarks can still assign config.client directly.
+    if name == "client":
+        with _client_lock:
+            if "client" not in globals():
+                from openai import OpenAI
+                # Every call goes through llm_scheduler, which retries rate limits and transient
+                # errors itself; the client's own retries would sleep outside its queue.
+                globals()["client"] = OpenAI(api_key=OPENAI_API_KEY, max_retries=0)
+        return globals()["client"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
-# Ensure data directories exist
-os.makedirs(REPORTS_DIR, exist_ok=True)
-os.makedirs(DATA_DIR, exist_ok=True)
\ No newline at end of file
+def ensure_dirs():
+    """
+    Create the data directories. Called by entry points rather than at import,
+    so importing config never touches the filesystem.
+    """
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+    os.makedirs(DATA_DIR, exist_ok=True)
+    os.makedirs(CACHE_DIR, exist_ok=True)
@@ -1,4 +1,4 @@
-from config import GOOGLE_API_KEY, GOOGLE_CSE_ID
+from config import GOOGLE_API_KEY, GOOGLE_CSE_ID, ensure_dirs
 
 from modules.planner import Planner
 from modules.researcher import Researcher
@@ -8,6 +8,7 @@ from modules.pdf_generator import PDFGenerator
 from modules.email_sender import EmailSender
 
 def main():
+    ensure_dirs()
     goal = "Find top 10 AI startups in Pakistan and create a market research report."
 
     # Step 1: Plan
@@ -27,14 +28,14 @@ def main():
     # Step 4: Analyze
     analyzer = Analyzer()
     df = analyzer.to_dataframe(strucData)
-    stats, charts, *_ = analyzer.basic_stats_and_charts(df, slug="report")
+    stats, charts, *_ = analyzer.basic_stats_and_charts(df, slug="report", in_memory=True)
 
     print("Stats:", stats)
-    print("Charts generated:", charts)
+    print("Charts generated:", len(charts))
 
     # Step 5: Generate PDF (with charts embedded)
     pdf_gen = PDFGenerator()
-    pdf_path = pdf_gen.create_report(summary, "market_research_report", stats=stats)
+    pdf_path = pdf_gen.create_report(summary, "market_research_report", stats=stats, charts=charts)
 
     # Step 6: Send Email
     email_sender = EmailSender()
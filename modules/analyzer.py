@@ -1,58 +1,137 @@
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Union
+import hashlib
 import pandas as pd
-import matplotlib.pyplot as plt
 import os
+import threading
 from config import REPORTS_DIR
+from modules import tracing
+from modules.artifacts import get_artifact_store
+from modules.dedup import resolve_entities
+from modules.charts import ChartRenderer, bar_spec, hist_spec
+from modules.stats_engine import compute_stats, describe_counts, prepare_frame
 
 class Analyzer:
-    def __init__(self):
-        pass
+    def __init__(self, renderer: ChartRenderer = None):
+        self.renderer = renderer or ChartRenderer(cache=get_artifact_store())
 
-    def to_dataframe(self, structured: List[Dict]) -> pd.DataFrame:
+    def to_dataframe(self, structured: List[Dict], dedup: bool = True) -> pd.DataFrame:
+        """
+        One row per company. With dedup, near-duplicate entries (the same
+        startup under different names or URLs) are merged first so they are
+        not counted twice; see dedup.EntityResolver.
+        """
+        if dedup:
+            structured, _ = resolve_entities(structured)
         df = pd.DataFrame(structured)
         expected = ['name', 'description', 'sector', 'founded_year', 'website', 'notes']
         for col in expected:
             if col not in df.columns:
                 df[col] = None
-        return df[expected]
+        # Type sector/founded_year once here instead of on every stats call
+        return prepare_frame(df[expected])
 
-    def basic_stats_and_charts(self, df: pd.DataFrame, slug: str = "report") -> Tuple[Dict, List[str], pd.DataFrame]:
-        os.makedirs(REPORTS_DIR, exist_ok=True)
-        charts = []
+    @tracing.traced("analyzer.store_stats")
+    def store_stats(self, store, sector: str = None, founded_from: int = None,
+                    founded_to: int = None) -> Tuple[Dict, List[Tuple[str, Dict]]]:
+        """
+        Stats and chart specs over the accumulated EntityStore, aggregated in
+        SQL so years of data never have to be loaded into memory.
+        """
+        specs = []
+        stats = {}
+
+        sector_counts = store.sector_counts(founded_from=founded_from, founded_to=founded_to)
+        if sector is not None:
+            sector = sector.strip().title()
+            sector_counts = {sector: sector_counts[sector]} if sector in sector_counts else {}
+        if sector_counts:
+            specs.append(("sector_distribution", bar_spec('Startups by Sector', sector_counts)))
+            stats['sector_counts'] = sector_counts
+
+        year_counts = pd.Series(store.founded_year_counts(sector=sector), dtype="int64")
+        if founded_from is not None:
+            year_counts = year_counts[year_counts.index >= founded_from]
+        if founded_to is not None:
+            year_counts = year_counts[year_counts.index <= founded_to]
+        if not year_counts.empty:
+            bins = min(len(year_counts), 20)
+            specs.append(("founded_hist", hist_spec('Founded Year Distribution', year_counts.index.tolist(), bins,
+                                                    weights=year_counts.tolist())))
+            stats['founded_year_summary'] = describe_counts(year_counts.index, year_counts.to_numpy())
+
+        stats['total_companies'] = sum(sector_counts.values())
+        stats['unique_sectors'] = len(sector_counts)
+        return stats, specs
+
+    def _save_chart(self, png: bytes, slug: str, name: str, in_memory: bool) -> Union[str, bytes]:
+        if in_memory:
+            return png
+        # Content-addressed name: concurrent runs never overwrite each other's charts.
+        path = os.path.join(REPORTS_DIR, f"{slug}_{name}_{hashlib.sha256(png).hexdigest()[:12]}.png")
+        if not os.path.exists(path):
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(png)
+            os.replace(tmp, path)
+        return path
+
+    def analyze(self, df: pd.DataFrame, bucket_size: int = 5) -> Dict:
+        """
+        Full stat set (sector cohorts, founding-year buckets, growth over
+        time, sector x bucket cross-tab) in one vectorized pass; see
+        stats_engine.compute_stats. The input frame is not modified.
+        """
+        return compute_stats(df, bucket_size=bucket_size)
+
+    def stats_and_chart_specs(self, df: pd.DataFrame) -> Tuple[Dict, List[Tuple[str, Dict]]]:
+        """
+        Compute summary stats and describe the charts to draw as (name, spec) pairs.
+        Only the report's stats are derived; see analyze for the full set.
+        """
+        full = compute_stats(df, detail=False)
+        specs = []
         stats = {}
 
-        # Normalize sector text
-        if 'sector' in df.columns:
-            df['sector'] = df['sector'].fillna('Unknown').astype(str).str.strip().str.title()
-            sector_counts = df['sector'].value_counts()
-            if not sector_counts.empty:
-                fig, ax = plt.subplots(figsize=(6, 4))
-                sector_counts.plot(kind='bar', ax=ax)
-                ax.set_title('Startups by Sector')
-                plt.tight_layout()
-                path = os.path.join(REPORTS_DIR, f"{slug}_sector_distribution.png")
-                fig.savefig(path)
-                plt.close(fig)
-                charts.append(path)
-                stats['sector_counts'] = sector_counts.to_dict()
-
-        # Founded year histogram
-        if 'founded_year' in df.columns and df['founded_year'].notna().any():
-            years = pd.to_numeric(df['founded_year'], errors='coerce').dropna().astype(int)
-            if not years.empty:
-                bins = min(len(years.unique()), 20)  # Adaptive bin count
-                fig, ax = plt.subplots(figsize=(6, 4))
-                years.plot(kind='hist', bins=bins, ax=ax)
-                ax.set_title('Founded Year Distribution')
-                plt.tight_layout()
-                path = os.path.join(REPORTS_DIR, f"{slug}_founded_hist.png")
-                fig.savefig(path)
-                plt.close(fig)
-                charts.append(path)
-                stats['founded_year_summary'] = years.describe().to_dict()
+        if full['sector_counts']:
+            specs.append(("sector_distribution", bar_spec('Startups by Sector', full['sector_counts'])))
+            stats['sector_counts'] = full['sector_counts']
+
+        if 'founded_year_summary' in full:
+            growth = full['growth_over_time']
+            bins = min(len(growth), 20)  # Adaptive bin count
+            specs.append(("founded_hist", hist_spec('Founded Year Distribution', list(growth), bins,
+                                                    weights=[g['founded'] for g in growth.values()])))
+            stats['founded_year_summary'] = full['founded_year_summary']
 
         # Basic counts
-        stats['total_companies'] = len(df)
-        stats['unique_sectors'] = df['sector'].nunique() if 'sector' in df.columns else None
+        stats['total_companies'] = full['total_companies']
+        stats['unique_sectors'] = full['unique_sectors'] if 'sector' in df.columns else None
 
+        return stats, specs
+
+    @tracing.traced("analyzer.stats_and_charts")
+    def basic_stats_and_charts(self, df: pd.DataFrame, slug: str = "report",
+                               in_memory: bool = False) -> Tuple[Dict, List[Union[str, bytes]], pd.DataFrame]:
+        """
+        Compute summary stats and render charts. Charts are written to
+        REPORTS_DIR and returned as paths, or returned as PNG bytes when
+        in_memory is True (ready for PDFGenerator.create_report(charts=...)).
+        """
+        os.makedirs(REPORTS_DIR, exist_ok=True)
+        df = prepare_frame(df)
+        stats, specs = self.stats_and_chart_specs(df)
+        charts = [
+            self._save_chart(self.renderer.render(spec), slug, name, in_memory)
+            for name, spec in specs
+        ]
         return stats, charts, df
+
+    @tracing.traced("analyzer.batch_stats_and_charts")
+    def batch_stats_and_charts(self, dfs: List[pd.DataFrame]) -> List[Tuple[Dict, List[bytes]]]:
+        """
+        Stats plus in-memory PNG charts for many reports, with every chart
+        rendered in one ChartRenderer.render_batch call.
+        """
+        results = [self.stats_and_chart_specs(df) for df in dfs]
+        images = self.renderer.render_batch([[spec for _, spec in specs] for _, specs in results])
+        return [(stats, charts) for (stats, _), charts in zip(results, images)]
@@ -0,0 +1,184 @@
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+import config
+
+# Bump to invalidate every stored artifact after a change to how stages build outputs.
+ARTIFACT_VERSION = 1
+
+
+def _fingerprint_default(value):
+    if isinstance(value, (bytes, bytearray)):
+        return {"__sha256__": hashlib.sha256(value).hexdigest()}
+    if hasattr(value, "item"):  # numpy scalars
+        return value.item()
+    raise TypeError(f"Cannot fingerprint {type(value).__name__}")
+
+
+def fingerprint(*parts) -> str:
+    """
+    Stable sha256 of JSON-like values. Dict order does not matter and bytes
+    (chart PNGs) contribute their own digest rather than their contents.
+    """
+    payload = json.dumps(parts, sort_keys=True, separators=(",", ":"), ensure_ascii=False,
+                         default=_fingerprint_default)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _write_atomic(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write then rename so concurrent runs never see (or clobber) a partial file.
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class ArtifactStore:
+    def __init__(self, directory: str):
+        """
+        Content-addressed store of stage outputs. An output is filed under a
+        key derived from the stage's inputs, so a stage whose inputs have not
+        changed is answered from disk instead of re-run. Binary values (chart
+        PNGs) are kept once as blobs named by their own sha256 and shared by
+        every output that contains them.
+        """
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def key(self, stage: str, inputs: Dict) -> str:
+        return fingerprint(ARTIFACT_VERSION, stage, inputs)
+
+    def _path(self, kind: str, key: str) -> str:
+        return os.path.join(self.directory, kind, key[:2], key)
+
+    def get_blob(self, digest: str) -> Optional[bytes]:
+        try:
+            with open(self._path("blobs", digest), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put_blob(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path("blobs", digest)
+        try:
+            os.utime(path)  # already stored; keep it young for prune()
+        except FileNotFoundError:
+            _write_atomic(path, bytes(data))
+        return digest
+
+    def _encode(self, value):
+        if isinstance(value, (bytes, bytearray)):
+            return {"__blob__": self.put_blob(value)}
+        if hasattr(value, "item"):  # numpy scalars
+            return value.item()
+        raise TypeError(f"Cannot store {type(value).__name__}")
+
+    def _decode(self, obj):
+        if "__blob__" in obj and len(obj) == 1:
+            data = self.get_blob(obj["__blob__"])
+            if data is None:
+                raise FileNotFoundError(obj["__blob__"])
+            return data
+        return obj
+
+    def get(self, key: str, max_age: Optional[float] = None) -> Optional[Dict]:
+        """
+        Return the stored output for key, or None when missing, older than
+        max_age seconds, or referencing a blob or file that no longer exists.
+        """
+        path = self._path("outputs", f"{key}.json")
+        try:
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f, object_hook=self._decode)
+            output = entry["output"]
+            if max_age is not None and time.time() - entry["created_at"] > max_age:
+                raise FileNotFoundError(path)
+            if any(not os.path.exists(output[name]) for name in entry.get("files", [])):
+                raise FileNotFoundError(path)
+            os.utime(path)  # mark as used for prune()
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return output
+
+    def put(self, key: str, stage: str, output: Dict) -> bool:
+        """
+        Store a stage output. Keys ending in "_path" are files the output
+        points at; the entry is ignored once any of them is deleted. Returns
+        False (and stores nothing) when the output is not serializable.
+        """
+        files = [name for name, value in output.items() if name.endswith("_path") and isinstance(value, str)]
+        try:
+            data = json.dumps({"stage": stage, "created_at": time.time(), "files": files, "output": output},
+                              ensure_ascii=False, default=self._encode)
+        except (TypeError, ValueError):
+            return False
+        _write_atomic(self._path("outputs", f"{key}.json"), data.encode("utf-8"))
+        return True
+
+    def prune(self, older_than: float) -> int:
+        """
+        Delete outputs not used for older_than seconds, and equally old blobs
+        no remaining output refers to. Returns the number of files removed.
+        """
+        cutoff = time.time() - older_than
+        keep, removed = set(), 0
+        outputs = os.path.join(self.directory, "outputs")
+        for root, _, files in os.walk(outputs):
+            for name in files:
+                path = os.path.join(root, name)
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+                    continue
+                with open(path, encoding="utf-8") as f:
+                    json.load(f, object_hook=lambda obj: keep.add(obj["__blob__"]) if "__blob__" in obj else obj)
+        for root, _, files in os.walk(os.path.join(self.directory, "blobs")):
+            for name in files:
+                path = os.path.join(root, name)
+                # Young blobs may belong to an output that is being written right now.
+                if name not in keep and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+        return removed
+
+    def stats(self) -> Dict:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_artifact_store() -> Optional[ArtifactStore]:
+    """
+    Return the process-wide artifact store, or None when artifacts are disabled.
+    """
+    global _store
+    if not config.ARTIFACTS_ENABLED:
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = ArtifactStore(config.ARTIFACTS_DIR)
+        return _store
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage stored stage artifacts.")
+    parser.add_argument("--older-than", type=float, default=30, help="Prune artifacts unused for this many days")
+    args = parser.parse_args()
+
+    removed = ArtifactStore(config.ARTIFACTS_DIR).prune(args.older_than * 24 * 3600)
+    print(f"Removed {removed} artifact files")
@@ -0,0 +1,210 @@
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Dict, List, Optional
+
+import config
+from modules import llm_scheduler, tracing
+from modules.pipeline import STAGES, new_context, prewarm, report_payload, run_stage
+from modules.render_service import RenderService
+
+# Default number of goals allowed inside each stage at the same time.
+DEFAULT_STAGE_LIMITS = {
+    "plan": 4,
+    "research": 4,
+    "enrich": 4,
+    "extract": 4,
+    "dedup": 2,
+    "summarize": 4,
+    "analyze": 2,
+    "render": 2,
+    "send": 2,
+}
+
+
+def load_goals(path: str) -> List[str]:
+    """
+    Read one goal per line, skipping blank lines and '#' comments.
+    """
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+
+class BatchRunner:
+    def __init__(self, stage_limits: Optional[Dict[str, int]] = None, stages=None,
+                 render_workers: Optional[int] = None):
+        """
+        Run the pipeline for many goals concurrently.
+        :param stage_limits: Max goals per stage at once, e.g. {"research": 8}.
+        :param stages: Ordered (name, callable) pairs, defaults to pipeline.STAGES.
+        :param render_workers: Render PDFs on a RenderService with this many processes.
+        """
+        self.stages = stages or STAGES
+        self.stage_limits = dict(DEFAULT_STAGE_LIMITS)
+        if render_workers:
+            self.stage_limits["render"] = render_workers
+        self.stage_limits.update(stage_limits or {})
+        self.render_workers = render_workers
+
+    def _with_render_service(self, service: RenderService):
+        def render_stage(ctx: Dict) -> Dict:
+            return {"pdf_path": service.render(report_payload(ctx))}
+
+        return [(name, render_stage if name == "render" else stage) for name, stage in self.stages]
+
+    async def _run_goal(self, ctx: Dict, semaphores: Dict[str, asyncio.Semaphore],
+                        executor: ThreadPoolExecutor) -> Dict:
+        loop = asyncio.get_running_loop()
+        timings = {}
+        started = time.perf_counter()
+        error = None
+
+        with tracing.span("pipeline", goal=ctx["slug"]):
+            for name, stage in self.stages:
+                queued = time.perf_counter()
+                async with semaphores[name]:
+                    began = time.perf_counter()
+                    try:
+                        call = tracing.propagate(partial(run_stage, name, stage, ctx))
+                        ctx.update(await loop.run_in_executor(executor, call))
+                    except Exception as e:
+                        error = f"{name}: {e}"
+                    finally:
+                        timings[name] = {
+                            "wait": began - queued,
+                            "run": time.perf_counter() - began,
+                        }
+                if error:
+                    break
+
+        return {
+            "goal": ctx["goal"],
+            "ok": error is None,
+            "error": error,
+            "latency": time.perf_counter() - started,
+            "stages": timings,
+            "context": ctx,
+        }
+
+    async def run_async(self, contexts: List[Dict]) -> Dict:
+        if not self.render_workers:
+            return await self._run_all(contexts)
+
+        service = RenderService(max_workers=self.render_workers)
+        stages = self.stages
+        self.stages = self._with_render_service(service)
+        try:
+            return await self._run_all(contexts)
+        finally:
+            self.stages = stages
+            service.close()
+
+    async def _run_all(self, contexts: List[Dict]) -> Dict:
+        semaphores = {
+            name: asyncio.Semaphore(self.stage_limits.get(name, 1))
+            for name, _ in self.stages
+        }
+        # Every stage blocks on I/O in a worker thread, so size the pool to
+        # the total number of slots across all stages.
+        workers = sum(self.stage_limits.get(name, 1) for name, _ in self.stages)
+        started = time.perf_counter()
+
+        # Batch goals queue behind interactive LLM calls and may share extraction calls.
+        with llm_scheduler.priority(llm_scheduler.BULK), \
+                ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch") as executor:
+            results = await asyncio.gather(
+                *(self._run_goal(ctx, semaphores, executor) for ctx in contexts)
+            )
+
+        return self.report(results, time.perf_counter() - started)
+
+    def run(self, goals: List[str], recipients: List[str] = None, num_results: int = 5) -> Dict:
+        """
+        Run the pipeline for every goal and return a throughput/latency report.
+        """
+        contexts = [new_context(goal, recipients=recipients, num_results=num_results) for goal in goals]
+        return asyncio.run(self.run_async(contexts))
+
+    def report(self, results: List[Dict], elapsed: float) -> Dict:
+        stage_report = {}
+        for name, _ in self.stages:
+            runs = [r["stages"][name] for r in results if name in r["stages"]]
+            if not runs:
+                continue
+            stage_report[name] = {
+                "count": len(runs),
+                "limit": self.stage_limits.get(name, 1),
+                "avg_run": sum(t["run"] for t in runs) / len(runs),
+                "max_run": max(t["run"] for t in runs),
+                "p50_run": tracing.percentile([t["run"] for t in runs], 0.5),
+                "p95_run": tracing.percentile([t["run"] for t in runs], 0.95),
+                "avg_wait": sum(t["wait"] for t in runs) / len(runs),
+                "max_wait": max(t["wait"] for t in runs),
+            }
+
+        latencies = sorted(r["latency"] for r in results)
+        succeeded = sum(1 for r in results if r["ok"])
+        return {
+            "goals": len(results),
+            "succeeded": succeeded,
+            "failed": len(results) - succeeded,
+            "elapsed": elapsed,
+            "throughput_per_min": succeeded / elapsed * 60 if elapsed else 0.0,
+            "latency_avg": sum(latencies) / len(latencies) if latencies else 0.0,
+            "latency_max": latencies[-1] if latencies else 0.0,
+            "stages": stage_report,
+            "results": results,
+        }
+
+
+def print_report(report: Dict):
+    print(f"Goals: {report['goals']}  succeeded: {report['succeeded']}  failed: {report['failed']}")
+    print(f"Elapsed: {report['elapsed']:.1f}s  throughput: {report['throughput_per_min']:.2f} goals/min")
+    print(f"Latency avg: {report['latency_avg']:.1f}s  max: {report['latency_max']:.1f}s")
+    print("Stage       limit   avg run   p50 run   p95 run   max run  avg wait  max wait")
+    for name, s in report["stages"].items():
+        print(f"{name:<10} {s['limit']:>6} {s['avg_run']:>9.2f} {s['p50_run']:>9.2f} {s['p95_run']:>9.2f} "
+              f"{s['max_run']:>9.2f} {s['avg_wait']:>9.2f} {s['max_wait']:>9.2f}")
+    for r in report["results"]:
+        status = "✅" if r["ok"] else f"❌ {r['error']}"
+        print(f"  {r['latency']:7.1f}s  {r['goal']}  {status}")
+
+
+def _parse_limits(values: List[str]) -> Dict[str, int]:
+    limits = {}
+    for value in values or []:
+        name, _, limit = value.partition("=")
+        limits[name.strip()] = int(limit)
+    return limits
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the research pipeline for a batch of goals.")
+    parser.add_argument("goals_file", help="Text file with one research goal per line")
+    parser.add_argument("--recipient", action="append", default=[], help="Email recipient (repeatable)")
+    parser.add_argument("--num-results", type=int, default=5)
+    parser.add_argument("--limit", action="append", metavar="STAGE=N",
+                        help="Per-stage concurrency limit, e.g. --limit research=8")
+    parser.add_argument("--render-workers", type=int, default=None,
+                        help="Render PDFs in this many worker processes")
+    parser.add_argument("--trace", default=None, help="Append JSONL spans to this file")
+    parser.add_argument("--metrics", default=None, help="Write OpenMetrics span summaries to this file")
+    parser.add_argument("--prewarm", action="store_true",
+                        help="Load every stage dependency before starting, not inside the first goals")
+    args = parser.parse_args()
+
+    config.ensure_dirs()
+    if args.prewarm:
+        prewarm()
+
+    tracer = tracing.configure(args.trace) if args.trace else tracing.get_tracer()
+    runner = BatchRunner(stage_limits=_parse_limits(args.limit), render_workers=args.render_workers)
+    print_report(runner.run(load_goals(args.goals_file), recipients=args.recipient,
+                            num_results=args.num_results))
+    print("LLM scheduler:", llm_scheduler.get_scheduler().stats())
+    print("Spans:")
+    tracing.print_summary(tracer.summary())
+    if args.metrics:
+        tracer.write_openmetrics(args.metrics)
@@ -0,0 +1,114 @@
+import io
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from modules import tracing
+
+# Pre-configured looks per chart kind; specs only carry data and a title.
+TEMPLATES = {
+    "bar": {"figsize": (6, 4), "dpi": 100, "color": "#3498DB", "title_size": 12, "rotate_labels": 45},
+    "hist": {"figsize": (6, 4), "dpi": 100, "color": "#2C3E50", "title_size": 12, "rotate_labels": 0},
+}
+
+
+def bar_spec(title: str, counts: Dict) -> Dict:
+    return {"kind": "bar", "title": title, "labels": [str(k) for k in counts], "values": list(counts.values())}
+
+
+def hist_spec(title: str, values: List, bins: int, weights: List = None) -> Dict:
+    spec = {"kind": "hist", "title": title, "values": list(values), "bins": bins}
+    if weights is not None:
+        spec["weights"] = list(weights)
+    return spec
+
+
+def render_chart(spec: Dict) -> bytes:
+    """
+    Render a chart spec to PNG bytes with the object-oriented Figure/Agg API.
+    No pyplot state is touched, so this is safe from worker threads and processes.
+    matplotlib is imported on the first render, not when this module loads.
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    template = TEMPLATES[spec["kind"]]
+    fig = Figure(figsize=template["figsize"], dpi=template["dpi"])
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+
+    if spec["kind"] == "bar":
+        ax.bar(spec["labels"], spec["values"], color=template["color"])
+    else:
+        ax.hist(spec["values"], bins=spec["bins"], weights=spec.get("weights"), color=template["color"])
+
+    ax.set_title(spec["title"], fontsize=template["title_size"])
+    if template["rotate_labels"]:
+        ax.tick_params(axis="x", labelrotation=template["rotate_labels"])
+    fig.tight_layout()
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png")
+    return buf.getvalue()
+
+
+class ChartRenderer:
+    def __init__(self, max_workers: int = 4, use_processes: bool = False, cache=None):
+        """
+        Render chart specs to PNG bytes, optionally in parallel.
+        :param max_workers: Threads (or processes) used by render_batch.
+        :param use_processes: Use a process pool; Agg rendering holds the GIL for much of its work.
+        :param cache: ArtifactStore; a spec rendered before is served from it instead of redrawn.
+        """
+        self.max_workers = max_workers
+        self.use_processes = use_processes
+        self.cache = cache
+
+    def _key(self, spec: Dict) -> str:
+        return self.cache.key("chart", {"spec": spec, "template": TEMPLATES[spec["kind"]]})
+
+    def _cached(self, spec: Dict) -> Optional[bytes]:
+        if self.cache is None:
+            return None
+        output = self.cache.get(self._key(spec))
+        return output["png"] if output else None
+
+    def _store(self, spec: Dict, png: bytes):
+        if self.cache is not None:
+            self.cache.put(self._key(spec), "chart", {"png": png})
+
+    def render(self, spec: Dict) -> bytes:
+        with tracing.span("chart.render", kind=spec["kind"]) as span:
+            png = self._cached(spec)
+            span.set(reused=png is not None)
+            if png is None:
+                png = render_chart(spec)
+                self._store(spec, png)
+            span.record(bytes_out=len(png))
+            return png
+
+    def render_batch(self, reports: List[List[Dict]]) -> List[List[bytes]]:
+        """
+        Render every chart of N reports in one go, returning PNG bytes grouped per report.
+        """
+        specs = [spec for report in reports for spec in report]
+        with tracing.span("chart.render_batch", charts=len(specs)) as span:
+            images = [self._cached(spec) for spec in specs]
+            missing = [i for i, png in enumerate(images) if png is None]
+            todo = [specs[i] for i in missing]
+            if len(todo) <= 1 or self.max_workers <= 1:
+                rendered = [render_chart(spec) for spec in todo]
+            else:
+                executor_cls = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+                with executor_cls(max_workers=min(self.max_workers, len(todo))) as executor:
+                    rendered = list(executor.map(render_chart, todo))
+            for i, png in zip(missing, rendered):
+                images[i] = png
+                self._store(specs[i], png)
+            span.set(reused=len(specs) - len(todo))
+            span.record(bytes_out=sum(len(png) for png in images))
+
+        grouped, i = [], 0
+        for report in reports:
+            grouped.append(images[i:i + len(report)])
+            i += len(report)
+        return grouped
@@ -0,0 +1,354 @@
+import argparse
+import re
+import zlib
+from itertools import chain
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from modules.normalize import PROFILE_HOSTS, company_website, normalize_name
+
+FIELDS = ['name', 'description', 'sector', 'founded_year', 'website', 'notes']
+# Trailing name tokens that are domain decorations rather than part of the name ("Foo AI" ~ "Foo.ai").
+STEM_DROP = {"ai", "io", "app", "hq"}
+# Trailing host labels dropped to find a domain's stem ("foo.com.pk" -> "foo").
+HOST_SUFFIXES = {"com", "co", "pk", "ai", "io", "net", "org", "tech", "app", "uk", "in", "us", "de", "dev"}
+# Leading host labels that name a service rather than the company ("app.foo.com" -> "foo").
+HOST_PREFIXES = {"app", "web", "m", "en", "my", "home", "portal", "blog", "get"}
+MERSENNE = np.uint64((1 << 61) - 1)
+_DIGITS_RE = re.compile(r"\d+")
+
+
+def name_stem(name) -> str:
+    tokens = normalize_name(name).split()
+    while len(tokens) > 1 and tokens[-1] in STEM_DROP:
+        tokens.pop()
+    return "".join(tokens)
+
+
+def _is_profile(website: str) -> bool:
+    return website.split("/", 1)[0] in PROFILE_HOSTS
+
+
+def website_stem(website: str) -> str:
+    """
+    Stem of a normalized website: the profile slug on social/directory sites,
+    else the company's host label ("app.foo.com.pk" -> "foo"). The first
+    label wins over the parent domain, so "foo.example.com" is "foo".
+    """
+    if not website:
+        return ""
+    if _is_profile(website):
+        segments = website.split("/")[1:]
+        return name_stem(segments[-1].replace("-", " ")) if segments else ""
+    labels = website.split(".")
+    while len(labels) > 1 and labels[-1] in HOST_SUFFIXES:
+        labels.pop()
+    while len(labels) > 1 and labels[0] in HOST_PREFIXES:
+        labels.pop(0)
+    return labels[0]
+
+
+def _shingles(text: str, k: int = 3) -> List[int]:
+    text = f" {text} "
+    if len(text) <= k:
+        return [zlib.crc32(text.encode("utf-8"))]
+    return list({zlib.crc32(text[i:i + k].encode("utf-8")) for i in range(len(text) - k + 1)})
+
+
+class _UnionFind:
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+
+    def find(self, i: int) -> int:
+        root = i
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[i] != root:
+            self.parent[i], i = root, self.parent[i]
+        return root
+
+    def union(self, i: int, j: int):
+        ri, rj = self.find(i), self.find(j)
+        if ri != rj:
+            self.parent[max(ri, rj)] = min(ri, rj)
+
+
+class EntityResolver:
+    def __init__(self, num_perm: int = 64, bands: int = 16, threshold: float = 0.6,
+                 max_bucket: int = 20, seed: int = 1):
+        """
+        Find entries that describe the same company. Exact blocking keys
+        (normalized website, normalized name, name/domain/profile stem) catch
+        "Foo AI" / "Foo.ai (Pvt) Ltd" / linkedin.com/company/foo-ai; MinHash LSH
+        over name shingles catches spelling variants. Candidates are only
+        compared within blocks and LSH buckets, so cost grows ~linearly.
+        :param num_perm: MinHash signature length; bands * rows must equal it.
+        :param bands: LSH bands; more bands find lower-similarity pairs.
+        :param threshold: Estimated Jaccard similarity needed to merge fuzzy name matches.
+        :param max_bucket: Rows in an LSH bucket are compared with at most this many neighbours.
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.max_bucket = max_bucket
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 1 << 31, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 1 << 31, num_perm, dtype=np.uint64)
+
+    def signatures(self, shingle_sets: List[List[int]], block: int = 65536) -> np.ndarray:
+        """
+        MinHash signatures (len(shingle_sets) x num_perm), computed in blocks of
+        shingles with one vectorized hash per permutation. Every set must be non-empty.
+        """
+        lengths = np.fromiter((len(s) for s in shingle_sets), dtype=np.int64, count=len(shingle_sets))
+        flat = np.fromiter(chain.from_iterable(shingle_sets), dtype=np.uint64, count=int(lengths.sum()))
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        signatures = np.empty((len(shingle_sets), self.num_perm), dtype=np.uint64)
+
+        first = 0
+        while first < len(shingle_sets):
+            last = first + 1
+            # Grow the block of entities until it holds ~`block` shingles.
+            last = max(last, int(np.searchsorted(starts, starts[first] + block, side="right")))
+            lo, hi = starts[first], starts[last - 1] + lengths[last - 1]
+            # x < 2^32 and a, b < 2^31, so a * x + b fits in 64 bits.
+            hashed = (flat[lo:hi, None] * self._a + self._b) % MERSENNE
+            signatures[first:last] = np.minimum.reduceat(hashed, starts[first:last] - lo, axis=0)
+            first = last
+        return signatures
+
+    def candidate_pairs(self, signatures: np.ndarray, block: int = 50000) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Pairs (x, y) that share at least one LSH band bucket, with their
+        estimated Jaccard similarity. Within a bucket each row is paired with
+        the next max_bucket - 1 rows, so oversized buckets cost linear time.
+        """
+        n = len(signatures)
+        keys = []
+        for band in range(self.bands):
+            rows = signatures[:, band * self.rows:(band + 1) * self.rows]
+            _, bucket = np.unique(rows, axis=0, return_inverse=True)
+            bucket = bucket.ravel()
+            order = np.argsort(bucket, kind="stable")
+            ordered = bucket[order]
+            for offset in range(1, min(self.max_bucket, n)):
+                same = ordered[offset:] == ordered[:-offset]
+                if not same.any():
+                    break
+                x, y = order[:-offset][same], order[offset:][same]
+                keys.append(np.minimum(x, y).astype(np.int64) * n + np.maximum(x, y))
+        if not keys:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty, np.empty(0)
+        keys = np.unique(np.concatenate(keys))
+        xs, ys = keys // n, keys % n
+        similarity = np.empty(len(keys))
+        for start in range(0, len(keys), block):
+            sx, sy = xs[start:start + block], ys[start:start + block]
+            similarity[start:start + block] = (signatures[sx] == signatures[sy]).mean(axis=1)
+        return xs, ys, similarity
+
+    @staticmethod
+    def _facts(item: Dict) -> Dict:
+        """
+        What an entry (or, once merged, a whole cluster) is known to be:
+        the sets of its sectors, founding years, company domains and their stems.
+        """
+        website = item["_website"]
+        site = website if website and not _is_profile(website) else ""
+        return {
+            "sectors": {str(item.get("sector") or "").strip().lower()} - {""},
+            "years": {_year(item.get("founded_year"))} - {None},
+            "sites": {site} - {""},
+            "stems": {website_stem(site)} - {""},
+        }
+
+    @staticmethod
+    def _compatible(a: Dict, b: Dict, fuzzy: bool = False) -> bool:
+        """
+        Veto merging two clusters whose known facts disagree: two sectors,
+        founding years more than a year apart, or company domains with
+        different stems. Only an exact key may join different domains with
+        the same stem ("foo.ai" / "foo.com"); a fuzzy name match needs a
+        domain in common when both clusters have one.
+        """
+        if len(a["sectors"] | b["sectors"]) > 1:
+            return False
+        years = a["years"] | b["years"]
+        if years and max(years) - min(years) > 1:
+            return False
+        if len(a["stems"] | b["stems"]) > 1:
+            return False
+        if fuzzy and a["sites"] and b["sites"] and not a["sites"] & b["sites"]:
+            return False
+        return True
+
+    def _join(self, uf: _UnionFind, facts: List[Dict], i: int, j: int, fuzzy: bool = False) -> bool:
+        """
+        Union the clusters of i and j unless their combined facts disagree.
+        Checked cluster against cluster, so vetoes cannot be bypassed by
+        chaining through an entry that knows less (a name without a website).
+        """
+        ri, rj = uf.find(i), uf.find(j)
+        if ri == rj:
+            return True
+        if not self._compatible(facts[ri], facts[rj], fuzzy):
+            return False
+        uf.union(ri, rj)
+        root = uf.find(ri)
+        facts[root] = {key: facts[ri][key] | facts[rj][key] for key in facts[ri]}
+        return True
+
+    @staticmethod
+    def _compatible_pairs(items: List[Dict], xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        """
+        Pairwise _compatible for fuzzy candidate pairs, as one boolean array;
+        _join then checks the surviving pairs cluster against cluster. Name
+        similarity alone never overrides two different company domains, and
+        names whose numbers differ ("Series 1" / "Series 2") never merge.
+        """
+        def codes(values):
+            lookup = {}
+            return np.array([lookup.setdefault(v, len(lookup)) if v else -1 for v in values], dtype=np.int64)
+
+        sector = codes(str(item.get("sector") or "").strip().lower() for item in items)
+        year = np.array([_year(item.get("founded_year")) or -1 for item in items], dtype=np.int64)
+        site = codes(item["_website"] if item["_website"] and not _is_profile(item["_website"]) else ""
+                     for item in items)
+        digits = codes(" ".join(_DIGITS_RE.findall(item["_stem"])) or "-" for item in items)
+
+        ok = ~((sector[xs] >= 0) & (sector[ys] >= 0) & (sector[xs] != sector[ys]))
+        ok &= ~((year[xs] >= 0) & (year[ys] >= 0) & (np.abs(year[xs] - year[ys]) > 1))
+        ok &= ~((site[xs] >= 0) & (site[ys] >= 0) & (site[xs] != site[ys]))
+        ok &= digits[xs] == digits[ys]
+        return ok
+
+    def clusters(self, entries: List[Dict]) -> List[List[int]]:
+        """
+        Indices of entries that refer to the same company, one list per
+        cluster of two or more, each sorted ascending. Only company websites
+        (see normalize.company_website) act as keys: an article link says
+        nothing about which company an entry is.
+        """
+        info = []
+        for entry in entries:
+            entry = entry if isinstance(entry, dict) else {}
+            website = company_website(entry.get("website"))
+            stem = name_stem(entry.get("name"))
+            info.append({**entry, "_website": website, "_stem": stem})
+        uf = _UnionFind(len(info))
+        facts = [self._facts(item) for item in info]
+
+        # Exact blocking keys: join every entry to the clusters already holding
+        # the key; a key keeps one holder per cluster it could not join.
+        holders = {}
+        for i, item in enumerate(info):
+            keys = []
+            if item["_website"]:
+                keys += ["web:" + item["_website"], "stem:" + website_stem(item["_website"])]
+            name = normalize_name(item.get("name"))
+            if name:
+                keys.append("name:" + name)
+            if item["_stem"]:
+                keys.append("stem:" + item["_stem"])
+            for key in dict.fromkeys(keys):
+                if key == "stem:":
+                    continue
+                key_holders = holders.setdefault(key, [])
+                joined = [self._join(uf, facts, i, j) for j in key_holders]
+                if not any(joined) and len(key_holders) < self.max_bucket:
+                    key_holders.append(i)
+
+        # Fuzzy name matches via MinHash LSH.
+        indexed = [i for i, item in enumerate(info) if item["_stem"]]
+        if len(indexed) > 1:
+            signatures = self.signatures([_shingles(info[i]["_stem"]) for i in indexed])
+            xs, ys, similarity = self.candidate_pairs(signatures)
+            keep = (similarity >= self.threshold) & self._compatible_pairs([info[i] for i in indexed], xs, ys)
+            for x, y in zip(xs[keep].tolist(), ys[keep].tolist()):
+                self._join(uf, facts, indexed[x], indexed[y], fuzzy=True)
+
+        groups = {}
+        for i in range(len(info)):
+            groups.setdefault(uf.find(i), []).append(i)
+        return [members for members in groups.values() if len(members) > 1]
+
+    def resolve(self, entries: List[Dict]) -> Tuple[List[Dict], List[List[int]]]:
+        """
+        Collapse each cluster into one merged entry (see merge_cluster).
+        Returns the de-duplicated entries, in first-seen order, and the clusters.
+        """
+        entries = [e for e in entries if isinstance(e, dict)]
+        clusters = self.clusters(entries)
+        merged_at = {}
+        for members in clusters:
+            merged_at[members[0]] = merge_cluster([entries[i] for i in members])
+            for i in members[1:]:
+                merged_at[i] = None
+        resolved = [merged_at.get(i, entry) for i, entry in enumerate(entries)]
+        return [e for e in resolved if e is not None], clusters
+
+
+def _year(value) -> Optional[int]:
+    try:
+        return int(str(value).strip()[:4])
+    except (TypeError, ValueError):
+        return None
+
+
+def _completeness(entry: Dict) -> Tuple:
+    website = company_website(entry.get("website"))
+    return (bool(website) and not _is_profile(website),
+            sum(entry.get(f) not in (None, "") for f in FIELDS))
+
+
+def canonical_index(entries: List[Dict]) -> int:
+    """
+    The entry to keep for a cluster: one with a company domain, then the most filled-in fields.
+    """
+    return max(range(len(entries)), key=lambda i: (_completeness(entries[i]), -i))
+
+
+def merge_cluster(entries: List[Dict]) -> Dict:
+    """
+    Merge a cluster into its canonical entry, filling missing fields from the
+    others and listing their differing names under "aliases".
+    """
+    keep = canonical_index(entries)
+    merged = dict(entries[keep])
+    for entry in entries[:keep] + entries[keep + 1:]:
+        for field, value in entry.items():
+            if merged.get(field) in (None, "") and value not in (None, ""):
+                merged[field] = value
+    aliases = {e.get("name") for e in entries if e.get("name")} - {merged.get("name")}
+    aliases.update(a for e in entries for a in e.get("aliases") or [])
+    aliases.discard(merged.get("name"))
+    if aliases:
+        merged["aliases"] = sorted(aliases)
+    return merged
+
+
+def resolve_entities(entries: List[Dict], resolver: EntityResolver = None) -> Tuple[List[Dict], List[List[int]]]:
+    return (resolver or EntityResolver()).resolve(entries)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge near-duplicate companies in the entity store.")
+    parser.add_argument("--threshold", type=float, default=0.6)
+    parser.add_argument("--dry-run", action="store_true", help="Only print the clusters that would merge")
+    args = parser.parse_args()
+
+    from modules.entity_store import get_entity_store
+
+    store = get_entity_store()
+    if store is None:
+        raise SystemExit("Entity store is disabled (ENTITY_STORE_ENABLED=0)")
+    merges = store.merge_duplicates(EntityResolver(threshold=args.threshold), dry_run=args.dry_run)
+    for merge in merges:
+        print(f"{merge['canonical']} <- {', '.join(merge['merged'])}")
+    print(f"{'Would merge' if args.dry_run else 'Merged'} {sum(len(m['merged']) for m in merges)} "
+          f"duplicates into {len(merges)} companies")
@@ -1,38 +1,270 @@
 import smtplib
+import base64
+import math
 import os
+import queue
+import random
+import re
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from email.mime.base import MIMEBase
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.application import MIMEApplication
-from config import EMAIL_HOST, EMAIL_PORT, EMAIL_USER, EMAIL_PASS
+from typing import Dict, List
+from modules import tracing
+from config import (
+    EMAIL_HOST, EMAIL_PORT, EMAIL_USER, EMAIL_PASS, EMAIL_FROM, EMAIL_USE_SSL, EMAIL_POOL_SIZE,
+    EMAIL_STREAM_MIN_BYTES,
+)
+
+# Connection-level failures worth a retry on a fresh connection.
+TRANSIENT_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError,
+                    socket.timeout, TimeoutError)
+
+# Raw bytes read per chunk when streaming an attachment; a multiple of 57
+# encodes to whole 76-character base64 lines.
+STREAM_CHUNK = 57 * 1024
+_LEADING_DOT_RE = re.compile(br"(?m)^\.")
+
+
+def _base64_size(size: int) -> int:
+    encoded = 4 * math.ceil(size / 3)
+    return encoded + 2 * math.ceil(encoded / 76)
+
+
+def _is_transient(error: Exception) -> bool:
+    """
+    Whether a failed send is worth retrying: connection failures and 4xx
+    replies are; 5xx replies are permanent.
+    """
+    if isinstance(error, TRANSIENT_ERRORS):
+        return True
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    # Anything else (other SMTP errors, missing or unreadable attachments) would fail the same way again.
+    return False
+
 
 class EmailSender:
-    def send_email(self, recipient, subject, body, attachment_path):
+    def __init__(self, host=None, port=None, user=None, password=None, sender=None, use_ssl=None,
+                 pool_size=EMAIL_POOL_SIZE, max_retries=3, backoff=1.0, timeout=30):
+        """
+        Send reports over SMTP, reusing a small pool of authenticated connections.
+        Arguments default to the EMAIL_* settings in config; with use_ssl=False and
+        no credentials it talks plain SMTP, e.g. to a local aiosmtpd debugging server.
+        :param pool_size: Connections kept open, and concurrent sends in send_bulk.
+        :param max_retries: Retries per recipient on transient (4xx/connection) failures.
+        :param backoff: Base delay in seconds for exponential backoff.
+        """
+        self.host = host or EMAIL_HOST
+        self.port = port or EMAIL_PORT
+        self.user = EMAIL_USER if user is None else user
+        self.password = EMAIL_PASS if password is None else password
+        self.sender = sender or (self.user if user else EMAIL_FROM)
+        self.use_ssl = EMAIL_USE_SSL if use_ssl is None else use_ssl
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        smtp_cls = smtplib.SMTP_SSL if self.use_ssl else smtplib.SMTP
+        server = smtp_cls(self.host, self.port, timeout=self.timeout)
+        if self.user and self.password:
+            server.login(self.user, self.password)
+        return server
+
+    def _acquire(self):
         try:
-            # Create email
-            msg = MIMEMultipart()
-            msg["From"] = EMAIL_USER
-            msg["To"] = recipient
-            msg["Subject"] = subject
-
-            # Email body
-            msg.attach(MIMEText(body, "plain"))
-
-            # Attach PDF
-            with open(attachment_path, "rb") as f:
-                pdf_attachment = MIMEApplication(f.read(), _subtype="pdf")
-                pdf_attachment.add_header(
-                    "Content-Disposition",
-                    "attachment",
-                    filename=os.path.basename(attachment_path)
-                )
-                msg.attach(pdf_attachment)
-
-            # Send email
-            with smtplib.SMTP_SSL(EMAIL_HOST, EMAIL_PORT) as server:
-                server.login(EMAIL_USER, EMAIL_PASS)
-                server.send_message(msg)
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect()
 
-            print(f"✅ Email sent to {recipient}")
+    def _release(self, server):
+        if self._idle.qsize() < self.pool_size:
+            self._idle.put(server)
+        else:
+            self._discard(server)
+
+    def _discard(self, server):
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    def close(self):
+        """
+        Close every pooled connection.
+        """
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+    def _build_attachment(self, attachment_path):
+        # Read and base64-encode once; the part is shared by every message.
+        with open(attachment_path, "rb") as f:
+            pdf_attachment = MIMEApplication(f.read(), _subtype="pdf")
+        pdf_attachment.add_header(
+            "Content-Disposition",
+            "attachment",
+            filename=os.path.basename(attachment_path)
+        )
+        return pdf_attachment
 
+    def _build_message(self, recipient, subject, body, attachment):
+        # Create email
+        msg = MIMEMultipart()
+        msg["From"] = self.sender
+        msg["To"] = recipient
+        msg["Subject"] = subject
+
+        # Email body
+        msg.attach(MIMEText(body, "plain"))
+        if attachment is not None:
+            msg.attach(attachment)
+        return msg
+
+    def _stream_parts(self, recipient, subject, body, attachment_path):
+        """
+        Split a message with an attachment into the bytes before the encoded
+        file (headers, text part, attachment headers) and the closing boundary.
+        """
+        boundary = f"==============={uuid.uuid4().hex}=="
+        msg = self._build_message(recipient, subject, body, None)
+        msg.set_boundary(boundary)
+        head = msg.as_bytes(policy=msg.policy.clone(linesep="\r\n"))
+        head = head[:head.rindex(f"--{boundary}--".encode("ascii"))]
+
+        part = MIMEBase("application", "pdf")
+        part["Content-Transfer-Encoding"] = "base64"
+        part.add_header("Content-Disposition", "attachment", filename=os.path.basename(attachment_path))
+        part_head = part.as_bytes(policy=part.policy.clone(linesep="\r\n"))
+        # Lines starting with "." must be doubled inside DATA (RFC 5321 4.5.2).
+        prefix = _LEADING_DOT_RE.sub(b"..", head + f"--{boundary}\r\n".encode("ascii") + part_head)
+        return prefix, f"\r\n--{boundary}--\r\n".encode("ascii")
+
+    def _send_streaming(self, server, recipient, subject, body, attachment_path) -> int:
+        """
+        Send over an open connection, issuing MAIL/RCPT/DATA by hand and
+        writing the attachment as base64 in STREAM_CHUNK pieces read from
+        disk, so memory stays flat however large the report is. Returns the
+        bytes written.
+        """
+        prefix, closing = self._stream_parts(recipient, subject, body, attachment_path)
+        size = len(prefix) + _base64_size(os.path.getsize(attachment_path)) + len(closing)
+
+        server.ehlo_or_helo_if_needed()
+        options = [f"SIZE={size}"] if server.has_extn("size") else []
+        code, resp = server.mail(self.sender, options)
+        if code != 250:
+            server.rset()
+            raise smtplib.SMTPSenderRefused(code, resp, self.sender)
+        code, resp = server.rcpt(recipient)
+        if code not in (250, 251):
+            server.rset()
+            raise smtplib.SMTPRecipientsRefused({recipient: (code, resp)})
+        code, resp = server.docmd("DATA")
+        if code != 354:
+            server.rset()
+            raise smtplib.SMTPDataError(code, resp)
+
+        server.send(prefix)
+        with open(attachment_path, "rb") as f:
+            while True:
+                chunk = f.read(STREAM_CHUNK)
+                if not chunk:
+                    break
+                server.send(base64.encodebytes(chunk).replace(b"\n", b"\r\n"))
+        server.send(closing + b".\r\n")
+        code, resp = server.getreply()
+        if code != 250:
+            raise smtplib.SMTPDataError(code, resp)
+        return size
+
+    def _deliver(self, send, recipient, size=0) -> Dict:
+        """
+        Deliver with retries; send(server) writes one message on a pooled connection.
+        """
+        with tracing.span("email.deliver") as span:
+            result = self._deliver_with_retries(send, recipient)
+            span.set(ok=result["ok"], attempts=result["attempts"])
+            if result["ok"]:
+                span.record(bytes_out=size)
+            return result
+
+    def _deliver_with_retries(self, send, recipient) -> Dict:
+        started = time.perf_counter()
+        error = None
+        for attempt in range(1, self.max_retries + 2):
+            server = None
+            try:
+                server = self._acquire()
+                send(server)
+                self._release(server)
+                return {"recipient": recipient, "ok": True, "attempts": attempt, "error": None,
+                        "elapsed": time.perf_counter() - started}
+            except Exception as e:
+                error = e
+                if server is not None:
+                    # The connection state is unknown after a failure; start fresh.
+                    self._discard(server)
+                if not _is_transient(e) or attempt > self.max_retries:
+                    break
+                time.sleep(self.backoff * (2 ** (attempt - 1)) * (0.5 + random.random()))
+        return {"recipient": recipient, "ok": False, "attempts": attempt, "error": f"{type(error).__name__}: {error}",
+                "elapsed": time.perf_counter() - started}
+
+    def send_bulk(self, recipients: List[str], subject, body, attachment_path=None) -> List[Dict]:
+        """
+        Send the same report to many recipients concurrently over pooled
+        connections. Returns one result dict per recipient, in order, with
+        recipient, ok, attempts, error and elapsed. Attachments of at least
+        EMAIL_STREAM_MIN_BYTES are streamed from disk (see _send_streaming)
+        instead of being encoded into memory once for all recipients.
+        """
+        with tracing.span("email.send_bulk", recipients=len(recipients)):
+            if attachment_path and os.path.getsize(attachment_path) >= EMAIL_STREAM_MIN_BYTES:
+                size = len(body.encode("utf-8")) + _base64_size(os.path.getsize(attachment_path))
+                messages = [
+                    (lambda server, r=r: self._send_streaming(server, r, subject, body, attachment_path), r)
+                    for r in recipients
+                ]
+            else:
+                attachment = self._build_attachment(attachment_path) if attachment_path else None
+                # Approximate bytes on the wire per message: body plus the encoded attachment.
+                size = len(body.encode("utf-8")) + (len(attachment.get_payload()) if attachment is not None else 0)
+                messages = [
+                    (lambda server, msg=self._build_message(r, subject, body, attachment): server.send_message(msg), r)
+                    for r in recipients
+                ]
+            if len(messages) <= 1:
+                return [self._deliver(msg, r, size) for msg, r in messages]
+            deliver = tracing.propagate(lambda item: self._deliver(*item, size))
+            with ThreadPoolExecutor(max_workers=min(self.pool_size, len(messages))) as executor:
+                return list(executor.map(deliver, messages))
+
+    def send_email(self, recipient, subject, body, attachment_path):
+        try:
+            result = self.send_bulk([recipient], subject, body, attachment_path)[0]
         except Exception as e:
-            print(f"❌ Failed to send email: {e}")
+            result = {"ok": False, "error": e}
+        finally:
+            self.close()
+
+        if result["ok"]:
+            print(f"✅ Email sent to {recipient}")
+        else:
+            print(f"❌ Failed to send email: {result['error']}")
@@ -0,0 +1,267 @@
+import asyncio
+import codecs
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from html.parser import HTMLParser
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+import config
+from modules import tracing
+
+# Elements whose text never describes the company.
+SKIP_TAGS = {"script", "style", "noscript", "svg", "template", "nav", "footer", "header", "form", "iframe"}
+META_NAMES = {"description", "keywords", "og:description", "og:site_name", "og:title", "twitter:description"}
+HTML_TYPES = ("text/html", "application/xhtml+xml")
+_SPACE_RE = re.compile(r"\s+")
+
+
+class PageExtractor(HTMLParser):
+    def __init__(self, max_text_chars: int = 1500):
+        """
+        Incremental HTML parser that keeps only the title, descriptive meta
+        tags, schema.org Organization facts and the first max_text_chars of
+        visible body text. Feed it chunks as they arrive; once `done` is set
+        the rest of the page is not needed.
+        """
+        super().__init__(convert_charrefs=True)
+        self.max_text_chars = max_text_chars
+        self.title = ""
+        self.meta = {}
+        self.text_parts = []
+        self.text_chars = 0
+        self.in_body = False
+        self._skip_depth = 0
+        self._in_title = False
+        self._in_ld_json = False
+        self._ld_parts = []
+
+    @property
+    def done(self) -> bool:
+        return self.in_body and self.text_chars >= self.max_text_chars and not self._in_ld_json
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "body":
+            self.in_body = True
+        elif tag == "title":
+            self._in_title = True
+        elif tag == "meta":
+            name = (attrs.get("name") or attrs.get("property") or "").lower()
+            if name in META_NAMES and attrs.get("content"):
+                self.meta.setdefault(name, attrs["content"].strip())
+        elif tag == "script" and (attrs.get("type") or "").lower() == "application/ld+json":
+            self._in_ld_json = True
+            self._ld_parts = []
+            return
+        if tag in SKIP_TAGS:
+            self._skip_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag == "title":
+            self._in_title = False
+        elif tag == "script" and self._in_ld_json:
+            self._in_ld_json = False
+            self._parse_ld_json("".join(self._ld_parts))
+            return
+        if tag in SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_data(self, data):
+        if self._in_ld_json:
+            self._ld_parts.append(data)
+        elif self._in_title:
+            self.title += data
+        elif self.in_body and not self._skip_depth and self.text_chars < self.max_text_chars:
+            text = _SPACE_RE.sub(" ", data).strip()
+            if text:
+                text = text[:self.max_text_chars - self.text_chars]
+                self.text_parts.append(text)
+                self.text_chars += len(text) + 1
+
+    def _parse_ld_json(self, raw: str):
+        try:
+            data = json.loads(raw)
+        except ValueError:
+            return
+        stack = data if isinstance(data, list) else [data]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, list):
+                stack.extend(item)
+                continue
+            if not isinstance(item, dict):
+                continue
+            stack.extend(item.get("@graph") or [])
+            for source, target in (("foundingDate", "founding_date"), ("industry", "industry"),
+                                   ("description", "ld:description"), ("legalName", "legal_name")):
+                value = item.get(source)
+                if isinstance(value, str) and value.strip():
+                    self.meta.setdefault(target, value.strip())
+
+    def result(self) -> Dict:
+        return {
+            "title": _SPACE_RE.sub(" ", self.title).strip(),
+            "meta": self.meta,
+            "text": " ".join(self.text_parts),
+        }
+
+
+class PageCache:
+    def __init__(self, directory: str, fresh_ttl: float = 7 * 24 * 3600):
+        """
+        File-backed cache of extracted pages keyed by URL. Entries keep the
+        response's ETag/Last-Modified so stale pages are revalidated with a
+        conditional GET instead of downloaded again.
+        :param fresh_ttl: Seconds an entry is served without contacting the host.
+        """
+        self.directory = directory
+        self.fresh_ttl = fresh_ttl
+
+    def _path(self, url: str) -> str:
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def load(self, url: str) -> Optional[Dict]:
+        try:
+            with open(self._path(url), encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def store(self, url: str, page: Dict, etag: Optional[str], last_modified: Optional[str]):
+        path = self._path(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        entry = {"url": url, "etag": etag, "last_modified": last_modified, "fetched_at": time.time(), "page": page}
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def touch(self, url: str, entry: Dict):
+        """
+        Mark a revalidated (304) entry fresh again.
+        """
+        self.store(url, entry["page"], entry.get("etag"), entry.get("last_modified"))
+
+    def is_fresh(self, entry: Dict) -> bool:
+        return time.time() - entry["fetched_at"] <= self.fresh_ttl
+
+
+class Enricher:
+    def __init__(self, concurrency: int = None, per_host: int = None, max_bytes: int = None,
+                 timeout: float = None, max_text_chars: int = None, cache: Optional[PageCache] = None,
+                 use_cache: bool = True):
+        """
+        Fetch the pages behind search results concurrently and attach their
+        title, meta description, schema.org facts and leading body text, so
+        extraction can fill in sector and founding year. Arguments default
+        to the ENRICH_* settings in config.
+        :param concurrency: Pages fetched at once across all hosts.
+        :param per_host: Open connections allowed per host.
+        :param max_bytes: Stop reading a page after this many bytes.
+        :param timeout: Total seconds allowed per page, counted from when it gets a connection slot.
+        :param max_text_chars: Body text kept per page.
+        """
+        self.concurrency = concurrency or config.ENRICH_CONCURRENCY
+        self.per_host = per_host or config.ENRICH_PER_HOST
+        self.max_bytes = max_bytes or config.ENRICH_MAX_BYTES
+        self.timeout = timeout or config.ENRICH_TIMEOUT
+        self.max_text_chars = max_text_chars or config.ENRICH_TEXT_CHARS
+        if cache is None and use_cache:
+            cache = PageCache(config.ENRICH_CACHE_DIR, fresh_ttl=config.ENRICH_FRESH_TTL)
+        self.cache = cache
+
+    async def _read(self, response) -> Dict:
+        """
+        Stream the body through the parser, stopping at the byte cap or as
+        soon as the parser has everything it keeps.
+        """
+        parser = PageExtractor(self.max_text_chars)
+        decoder = codecs.getincrementaldecoder(response.charset or "utf-8")(errors="replace")
+        received = 0
+        async for chunk in response.content.iter_chunked(16384):
+            chunk = chunk[:self.max_bytes - received]
+            received += len(chunk)
+            parser.feed(decoder.decode(chunk))
+            if received >= self.max_bytes or parser.done:
+                break
+        tracing.record(bytes_in=received)
+        return parser.result()
+
+    async def _fetch(self, session, semaphore: asyncio.Semaphore, host_semaphores: Dict[str, asyncio.Semaphore],
+                     url: str) -> Optional[Dict]:
+        import aiohttp
+
+        entry = self.cache.load(url) if self.cache is not None else None
+        if entry is not None and self.cache.is_fresh(entry):
+            tracing.record(cache_hits=1)
+            return entry["page"]
+
+        headers = {}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        host = urlsplit(url).hostname or ""
+        host_semaphore = host_semaphores.setdefault(host, asyncio.Semaphore(self.per_host))
+        async with semaphore, host_semaphore:
+            try:
+                async with session.get(url, headers=headers, allow_redirects=True) as response:
+                    if response.status == 304 and entry is not None:
+                        tracing.record(cache_hits=1)
+                        self.cache.touch(url, entry)
+                        return entry["page"]
+                    content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+                    if response.status != 200 or content_type not in HTML_TYPES:
+                        return entry["page"] if entry is not None else None
+                    tracing.record(cache_misses=1)
+                    page = await self._read(response)
+                    etag = response.headers.get("ETag")
+                    last_modified = response.headers.get("Last-Modified")
+            except (aiohttp.ClientError, asyncio.TimeoutError, UnicodeDecodeError, LookupError):
+                # Enrichment is best effort; fall back to a stale copy or the snippet alone.
+                return entry["page"] if entry is not None else None
+
+        if self.cache is not None:
+            self.cache.store(url, page, etag, last_modified)
+        return page
+
+    async def fetch_pages(self, urls: List[str]) -> Dict[str, Optional[Dict]]:
+        """
+        Fetch and parse each distinct URL once; returns url -> page (None on failure).
+        """
+        import aiohttp
+
+        urls = list(dict.fromkeys(u for u in urls if u and u.startswith(("http://", "https://"))))
+        if not urls:
+            return {}
+        # The semaphores, not the connector, enforce the global and per-host limits: a
+        # request waiting for a connector slot would spend its timeout before it is sent.
+        connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=0, ttl_dns_cache=300)
+        timeout = aiohttp.ClientTimeout(total=self.timeout, sock_connect=min(self.timeout, 5))
+        headers = {"User-Agent": "MarketResearchAgent/1.0 (+enrichment)", "Accept": "text/html,application/xhtml+xml"}
+        semaphore = asyncio.Semaphore(self.concurrency)
+        host_semaphores = {}
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=headers) as session:
+            pages = await asyncio.gather(*(self._fetch(session, semaphore, host_semaphores, url) for url in urls))
+        return dict(zip(urls, pages))
+
+    def enrich(self, results: List[Dict]) -> List[Dict]:
+        """
+        Return copies of the search results with a "page" dict (title, meta,
+        text) added wherever the linked page could be fetched.
+        """
+        with tracing.span("enrich", results=len(results)):
+            pages = asyncio.run(self.fetch_pages([r.get("link") for r in results]))
+        enriched = []
+        for r in results:
+            page = pages.get(r.get("link"))
+            enriched.append({**r, "page": page} if page else dict(r))
+        return enriched
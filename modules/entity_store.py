@@ -0,0 +1,397 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+import config
+from modules.normalize import company_website, normalize_name, normalize_website
+
+FIELDS = ['name', 'description', 'sector', 'founded_year', 'website', 'notes']
+
+
+def _clean_value(field: str, value):
+    if value in (None, ""):
+        return None
+    if field == 'founded_year':
+        try:
+            return int(str(value).strip()[:4])
+        except ValueError:
+            return None
+    if field == 'sector':
+        return str(value).strip().title() or None
+    return value if isinstance(value, str) else str(value)
+
+
+class EntityStore:
+    def __init__(self, path: str):
+        """
+        Persistent company store backed by SQLite. Entities are keyed by
+        normalized website (or name) and upserted field by field, each with
+        its own source and timestamp.
+        :param path: SQLite database file.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS entities (
+                key TEXT PRIMARY KEY,
+                name TEXT,
+                description TEXT,
+                sector TEXT,
+                founded_year INTEGER,
+                website TEXT,
+                notes TEXT,
+                name_norm TEXT,
+                website_norm TEXT,
+                provenance TEXT NOT NULL DEFAULT '{}',
+                first_seen REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS entities_sector ON entities (sector);
+            CREATE INDEX IF NOT EXISTS entities_founded_year ON entities (founded_year);
+            CREATE INDEX IF NOT EXISTS entities_name_norm ON entities (name_norm);
+            CREATE INDEX IF NOT EXISTS entities_website_norm ON entities (website_norm);
+
+            -- Normalized website/name of entities merged away by merge_duplicates
+            CREATE TABLE IF NOT EXISTS entity_aliases (
+                alias TEXT PRIMARY KEY,
+                entity_key TEXT NOT NULL
+            );
+
+            CREATE TABLE IF NOT EXISTS link_entities (
+                link TEXT NOT NULL,
+                entity_key TEXT,
+                seen_at REAL NOT NULL,
+                PRIMARY KEY (link, entity_key)
+            );
+            """
+        )
+        self._conn.commit()
+
+    def _find_key(self, website_norm: str, name_norm: str) -> Optional[str]:
+        if website_norm:
+            row = self._conn.execute(
+                "SELECT key FROM entities WHERE website_norm = ?", (website_norm,)
+            ).fetchone()
+            if row:
+                return row[0]
+        if name_norm:
+            row = self._conn.execute(
+                "SELECT key FROM entities WHERE name_norm = ?", (name_norm,)
+            ).fetchone()
+            if row:
+                return row[0]
+        aliases = [f"web:{website_norm}"] * bool(website_norm) + [f"name:{name_norm}"] * bool(name_norm)
+        for alias in aliases:
+            row = self._conn.execute(
+                "SELECT entity_key FROM entity_aliases WHERE alias = ?", (alias,)
+            ).fetchone()
+            if row:
+                return row[0]
+        return None
+
+    def _upsert_one(self, entry: Dict, source: Optional[str], now: float) -> Optional[str]:
+        values = {field: _clean_value(field, entry.get(field)) for field in FIELDS}
+        # An article link is not the company's site and would collide with every company it covers.
+        website_norm = company_website(values['website'])
+        name_norm = normalize_name(values['name'])
+        if not website_norm and not name_norm:
+            return None
+
+        key = self._find_key(website_norm, name_norm)
+        if key is None:
+            key = f"web:{website_norm}" if website_norm else f"name:{name_norm}"
+            provenance = {
+                field: {"source": source, "updated_at": now}
+                for field, value in values.items() if value is not None
+            }
+            self._conn.execute(
+                "INSERT INTO entities (key, name, description, sector, founded_year, website, notes,"
+                " name_norm, website_norm, provenance, first_seen, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, *(values[f] for f in FIELDS), name_norm or None, website_norm or None,
+                 json.dumps(provenance), now, now),
+            )
+            return key
+
+        row = self._conn.execute("SELECT * FROM entities WHERE key = ?", (key,)).fetchone()
+        provenance = json.loads(row["provenance"])
+        changes = {}
+        for field, value in values.items():
+            # Never overwrite a known value with an unknown one.
+            if value is not None and value != row[field]:
+                changes[field] = value
+                provenance[field] = {"source": source, "updated_at": now}
+        if not row["website_norm"] and website_norm:
+            changes["website_norm"] = website_norm
+        if name_norm and name_norm != row["name_norm"]:
+            changes["name_norm"] = name_norm
+            if row["name_norm"]:
+                # Keep the previous name resolving to this entity.
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO entity_aliases (alias, entity_key) VALUES (?, ?)",
+                    (f"name:{row['name_norm']}", key),
+                )
+        if changes:
+            assignments = ", ".join(f"{field} = ?" for field in changes)
+            self._conn.execute(
+                f"UPDATE entities SET {assignments}, provenance = ?, updated_at = ? WHERE key = ?",
+                (*changes.values(), json.dumps(provenance), now, key),
+            )
+        return key
+
+    def upsert(self, entries: Iterable[Dict], source: Optional[str] = None,
+               links: Optional[List[str]] = None, origins: Optional[List[Optional[str]]] = None) -> List[str]:
+        """
+        Insert or update entries and return their keys.
+        :param source: Provenance recorded for every field this call sets.
+        :param links: Result links the entries were extracted from. A link is marked as seen once an
+                      entity is tied to it, or as empty when every entry was tied to some link.
+        :param origins: The link each entry came from (None when unknown), parallel to entries.
+                        Without one, an entity is tied to the only link, or to the link on its own
+                        website, if any.
+        """
+        now = time.time()
+        keys = []
+        origins = list(origins) if origins is not None else []
+        unattributed = False
+        with self._lock:
+            for i, entry in enumerate(entries):
+                if not isinstance(entry, dict):
+                    continue
+                key = self._upsert_one(entry, source, now)
+                if key is None:
+                    continue
+                keys.append(key)
+                origin = origins[i] if i < len(origins) else None
+                if origin is None and links:
+                    website = company_website(entry.get('website'))
+                    origin = next((l for l in links if website and normalize_website(l) == website), None)
+                    if origin is None and len(links) == 1:
+                        origin = links[0]
+                if origin:
+                    self._conn.execute(
+                        "INSERT OR IGNORE INTO link_entities (link, entity_key, seen_at) VALUES (?, ?, ?)",
+                        (origin, key, now),
+                    )
+                else:
+                    unattributed = True
+            if links and not unattributed:
+                # Remember links that yielded nothing so they are not re-extracted either. With an
+                # unattributed entity any link may have been its source, so none is known to be empty.
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO link_entities (link, entity_key, seen_at)"
+                    " SELECT ?, NULL, ? WHERE NOT EXISTS (SELECT 1 FROM link_entities WHERE link = ?)",
+                    [(link, now, link) for link in links],
+                )
+            self._conn.commit()
+        return keys
+
+    def seen_links(self, links: Iterable[str]) -> Set[str]:
+        links = [l for l in links if l]
+        seen = set()
+        with self._lock:
+            for i in range(0, len(links), 500):
+                batch = links[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                seen.update(row[0] for row in self._conn.execute(
+                    f"SELECT DISTINCT link FROM link_entities WHERE link IN ({placeholders})", batch
+                ))
+        return seen
+
+    def entities_for_links(self, links: Iterable[str]) -> List[Dict]:
+        links = [l for l in links if l]
+        entities, keys = [], set()
+        with self._lock:
+            for i in range(0, len(links), 500):
+                batch = links[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                for row in self._conn.execute(
+                    "SELECT e.* FROM entities e JOIN link_entities l ON l.entity_key = e.key"
+                    f" WHERE l.link IN ({placeholders})", batch
+                ):
+                    if row["key"] not in keys:
+                        keys.add(row["key"])
+                        entities.append({field: row[field] for field in FIELDS})
+        return entities
+
+    def _where(self, sector: Optional[str], founded_from: Optional[int], founded_to: Optional[int]):
+        clauses, params = [], []
+        if sector is not None:
+            clauses.append("sector = ?")
+            params.append(_clean_value('sector', sector))
+        if founded_from is not None:
+            clauses.append("founded_year >= ?")
+            params.append(founded_from)
+        if founded_to is not None:
+            clauses.append("founded_year <= ?")
+            params.append(founded_to)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def query(self, sector: Optional[str] = None, founded_from: Optional[int] = None,
+              founded_to: Optional[int] = None, batch_size: int = 1000) -> Iterator[Dict]:
+        """
+        Stream matching entities without loading the whole store.
+        """
+        where, params = self._where(sector, founded_from, founded_to)
+        # A dedicated connection keeps a long-running scan from holding the lock.
+        conn = sqlite3.connect(self.path)
+        try:
+            cursor = conn.execute(f"SELECT {', '.join(FIELDS)} FROM entities{where} ORDER BY key", params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield dict(zip(FIELDS, row))
+        finally:
+            conn.close()
+
+    def iter_dataframes(self, chunksize: int = 50000, sector: Optional[str] = None,
+                        founded_from: Optional[int] = None, founded_to: Optional[int] = None):
+        """
+        Yield matching entities as pandas DataFrames of at most chunksize rows.
+        """
+        import pandas as pd
+
+        where, params = self._where(sector, founded_from, founded_to)
+        conn = sqlite3.connect(self.path)
+        try:
+            yield from pd.read_sql_query(
+                f"SELECT {', '.join(FIELDS)} FROM entities{where}", conn, params=params, chunksize=chunksize
+            )
+        finally:
+            conn.close()
+
+    def sector_counts(self, founded_from: Optional[int] = None, founded_to: Optional[int] = None) -> Dict[str, int]:
+        where, params = self._where(None, founded_from, founded_to)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT COALESCE(sector, 'Unknown') AS s, COUNT(*) AS n FROM entities{where}"
+                " GROUP BY s ORDER BY n DESC", params
+            ).fetchall()
+        return {row[0]: row[1] for row in rows}
+
+    def founded_year_counts(self, sector: Optional[str] = None) -> Dict[int, int]:
+        where, params = self._where(sector, None, None)
+        where += (" AND" if where else " WHERE") + " founded_year IS NOT NULL"
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT founded_year, COUNT(*) FROM entities{where} GROUP BY founded_year ORDER BY founded_year",
+                params,
+            ).fetchall()
+        return {row[0]: row[1] for row in rows}
+
+    def merge_duplicates(self, resolver=None, dry_run: bool = False) -> List[Dict]:
+        """
+        Find near-duplicate entities with dedup.EntityResolver and fold each
+        cluster into one entity: missing fields are filled from the others,
+        their links are re-pointed and the duplicates are deleted. The kept
+        entity's provenance lists the merged keys under "merged_from".
+        Returns one {"canonical": key, "merged": [keys]} per cluster.
+        """
+        from modules.dedup import EntityResolver, canonical_index
+
+        resolver = resolver or EntityResolver()
+        with self._lock:
+            rows = self._conn.execute(f"SELECT key, {', '.join(FIELDS)} FROM entities ORDER BY key").fetchall()
+        keys = [row["key"] for row in rows]
+        entries = [{field: row[field] for field in FIELDS} for row in rows]
+
+        merges = []
+        for members in resolver.clusters(entries):
+            keep = members[canonical_index([entries[i] for i in members])]
+            merges.append({"canonical": keys[keep], "merged": [keys[i] for i in members if i != keep]})
+        if dry_run or not merges:
+            return merges
+
+        now = time.time()
+        index = {key: i for i, key in enumerate(keys)}
+        with self._lock:
+            for merge in merges:
+                canonical = merge["canonical"]
+                row = self._conn.execute("SELECT * FROM entities WHERE key = ?", (canonical,)).fetchone()
+                provenance = json.loads(row["provenance"])
+                changes = {}
+                for key in merge["merged"]:
+                    for field, value in entries[index[key]].items():
+                        if value is not None and row[field] is None and field not in changes:
+                            changes[field] = value
+                            provenance[field] = {"source": f"merge:{key}", "updated_at": now}
+                provenance["merged_from"] = sorted(set(provenance.get("merged_from", [])) | set(merge["merged"]))
+                assignments = "".join(f"{field} = ?, " for field in changes)
+                self._conn.execute(
+                    f"UPDATE entities SET {assignments}provenance = ?, updated_at = ? WHERE key = ?",
+                    (*changes.values(), json.dumps(provenance), now, canonical),
+                )
+                placeholders = ",".join("?" * len(merge["merged"]))
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO link_entities (link, entity_key, seen_at)"
+                    f" SELECT link, ?, seen_at FROM link_entities WHERE entity_key IN ({placeholders})",
+                    (canonical, *merge["merged"]),
+                )
+                self._conn.execute(f"DELETE FROM link_entities WHERE entity_key IN ({placeholders})", merge["merged"])
+                # Keep resolving the merged entities' website/name to the kept one.
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO entity_aliases (alias, entity_key)"
+                    " SELECT 'web:' || website_norm, ? FROM entities"
+                    f" WHERE key IN ({placeholders}) AND website_norm IS NOT NULL"
+                    " UNION ALL SELECT 'name:' || name_norm, ? FROM entities"
+                    f" WHERE key IN ({placeholders}) AND name_norm IS NOT NULL",
+                    (canonical, *merge["merged"], canonical, *merge["merged"]),
+                )
+                self._conn.execute(
+                    f"UPDATE entity_aliases SET entity_key = ? WHERE entity_key IN ({placeholders})",
+                    (canonical, *merge["merged"]),
+                )
+                self._conn.execute(f"DELETE FROM entities WHERE key IN ({placeholders})", merge["merged"])
+            self._conn.commit()
+        return merges
+
+    def provenance(self, key: str) -> Dict:
+        with self._lock:
+            row = self._conn.execute("SELECT provenance FROM entities WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM entities").fetchone()[0]
+
+    def import_json(self, path: str) -> int:
+        """
+        Load a JSON array of structured entries (e.g. config.STARTUPS_JSON).
+        """
+        with open(path, encoding="utf-8") as f:
+            entries = json.load(f)
+        return len(self.upsert(entries, source=os.path.basename(path)))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_entity_store() -> Optional[EntityStore]:
+    """
+    Return the process-wide entity store, or None when it is disabled. A new
+    store is seeded from STARTUPS_JSON when that file exists.
+    """
+    global _store
+    if not config.ENTITY_STORE_ENABLED:
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = EntityStore(config.ENTITY_STORE_PATH)
+            if _store.count() == 0 and os.path.exists(config.STARTUPS_JSON):
+                _store.import_json(config.STARTUPS_JSON)
+        return _store
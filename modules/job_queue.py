@@ -0,0 +1,345 @@
+import argparse
+import base64
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import config
+from modules import llm_scheduler, tracing
+from modules.pipeline import STAGES, new_context, prewarm, run_stage
+
+
+class LeaseLost(Exception):
+    """
+    The job's lease expired and another worker may have claimed it.
+    """
+
+
+class DeliveryError(Exception):
+    """
+    The report could not be sent to every recipient.
+    """
+
+
+def _encode(value):
+    if isinstance(value, (bytes, bytearray)):
+        return {"__b64__": base64.b64encode(bytes(value)).decode("ascii")}
+    raise TypeError(f"Cannot checkpoint {type(value).__name__}")
+
+
+def _decode(obj):
+    if "__b64__" in obj and len(obj) == 1:
+        return base64.b64decode(obj["__b64__"])
+    return obj
+
+
+class JobQueue:
+    def __init__(self, path: str = None, lease_seconds: float = 600, max_attempts: int = 3):
+        """
+        Durable SQLite-backed queue of research goals. Each stage's output is
+        checkpointed, so a job resumes after the last completed stage.
+        Safe to share between processes; open one JobQueue per process.
+        :param lease_seconds: A running job whose worker stops heartbeating for this long is reclaimed.
+        :param max_attempts: Failed jobs are retried until they reach this many attempts.
+        """
+        self.path = path or config.JOB_QUEUE_PATH
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                goal TEXT NOT NULL,
+                params TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                worker TEXT,
+                lease_expires REAL,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                job_id INTEGER NOT NULL REFERENCES jobs (id),
+                stage TEXT NOT NULL,
+                output TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (job_id, stage)
+            );
+            """
+        )
+
+    def enqueue(self, goal: str, query: str = None, recipients: List[str] = None, num_results: int = 5) -> int:
+        now = time.time()
+        params = {"query": query, "recipients": recipients or [], "num_results": num_results}
+        cursor = self._conn.execute(
+            "INSERT INTO jobs (goal, params, created_at, updated_at) VALUES (?, ?, ?, ?)",
+            (goal, json.dumps(params), now, now),
+        )
+        return cursor.lastrowid
+
+    def claim(self, worker: str) -> Optional[Dict]:
+        """
+        Atomically take the oldest pending job, or a running job whose lease
+        has expired (its worker crashed). A job whose lease expired on its
+        last allowed attempt is failed instead. Returns None when nothing is
+        claimable.
+        """
+        now = time.time()
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'failed', lease_expires = NULL,"
+                " error = 'Lease expired after ' || attempts || ' attempts', updated_at = ?"
+                " WHERE status = 'running' AND lease_expires < ? AND attempts >= ?",
+                (now, now, self.max_attempts),
+            )
+            row = self._conn.execute(
+                "SELECT * FROM jobs WHERE status = 'pending'"
+                " OR (status = 'running' AND lease_expires < ?) ORDER BY id LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is None:
+                self._conn.execute("COMMIT")
+                return None
+            self._conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, lease_expires = ?,"
+                " attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                (worker, now + self.lease_seconds, now, row["id"]),
+            )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        job["attempts"] += 1
+        return job
+
+    def heartbeat(self, job_id: int, worker: str) -> bool:
+        """
+        Extend the lease; False when the worker no longer owns the job.
+        """
+        now = time.time()
+        cursor = self._conn.execute(
+            "UPDATE jobs SET lease_expires = ?, updated_at = ?"
+            " WHERE id = ? AND worker = ? AND status = 'running'",
+            (now + self.lease_seconds, now, job_id, worker),
+        )
+        return cursor.rowcount == 1
+
+    def save_checkpoint(self, job_id: int, worker: str, stage: str, output: Dict):
+        """
+        Store a stage output. Raises LeaseLost when the worker no longer owns the job.
+        """
+        cursor = self._conn.execute(
+            "INSERT OR REPLACE INTO checkpoints (job_id, stage, output, created_at)"
+            " SELECT ?, ?, ?, ? WHERE EXISTS"
+            " (SELECT 1 FROM jobs WHERE id = ? AND worker = ? AND status = 'running')",
+            (job_id, stage, json.dumps(output, default=_encode), time.time(), job_id, worker),
+        )
+        if cursor.rowcount != 1:
+            raise LeaseLost(f"Job {job_id} is no longer owned by {worker}")
+
+    def checkpoints(self, job_id: int) -> Dict[str, Dict]:
+        rows = self._conn.execute(
+            "SELECT stage, output FROM checkpoints WHERE job_id = ?", (job_id,)
+        ).fetchall()
+        return {row["stage"]: json.loads(row["output"], object_hook=_decode) for row in rows}
+
+    def complete(self, job_id: int, worker: str) -> bool:
+        """
+        Mark the job done; False when the worker no longer owns it.
+        """
+        cursor = self._conn.execute(
+            "UPDATE jobs SET status = 'done', lease_expires = NULL, error = NULL, updated_at = ?"
+            " WHERE id = ? AND worker = ? AND status = 'running'",
+            (time.time(), job_id, worker),
+        )
+        return cursor.rowcount == 1
+
+    def fail(self, job_id: int, worker: str, error: str) -> bool:
+        """
+        Record a failure; the job goes back to pending until max_attempts is reached.
+        Returns False when the worker no longer owns the job.
+        """
+        cursor = self._conn.execute(
+            "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,"
+            " lease_expires = NULL, error = ?, updated_at = ?"
+            " WHERE id = ? AND worker = ? AND status = 'running'",
+            (self.max_attempts, error, time.time(), job_id, worker),
+        )
+        return cursor.rowcount == 1
+
+    def status(self) -> Dict[str, int]:
+        rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {row[0]: row[1] for row in rows}
+
+    def job(self, job_id: int) -> Optional[Dict]:
+        row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def close(self):
+        self._conn.close()
+
+
+@contextmanager
+def _heartbeat(queue: JobQueue, job_id: int, worker: str):
+    """
+    Renew the job's lease from a background thread (with its own connection)
+    while the block runs, so a stage longer than lease_seconds is not
+    reclaimed. Yields an Event that is set once the lease is lost.
+    """
+    stop, lost = threading.Event(), threading.Event()
+
+    def beat():
+        beats = JobQueue(queue.path, lease_seconds=queue.lease_seconds, max_attempts=queue.max_attempts)
+        try:
+            while not stop.wait(queue.lease_seconds / 3):
+                try:
+                    if not beats.heartbeat(job_id, worker):
+                        lost.set()
+                        return
+                except sqlite3.OperationalError:
+                    pass  # database busy; the next beat retries well before the lease runs out
+        finally:
+            beats.close()
+
+    thread = threading.Thread(target=beat, name=f"heartbeat-{job_id}", daemon=True)
+    thread.start()
+    try:
+        yield lost
+    finally:
+        stop.set()
+        thread.join()
+
+
+def run_job(queue: JobQueue, job: Dict, worker: str, stages=None) -> Dict:
+    """
+    Run one claimed job, skipping stages that already have a checkpoint.
+    Raises LeaseLost once another worker may own the job, and DeliveryError
+    when the report could not be sent to every recipient; recipients that
+    did get it are checkpointed and skipped when the job is retried.
+    """
+    params = job["params"]
+    ctx = new_context(job["goal"], query=params.get("query"), recipients=params.get("recipients"),
+                      num_results=params.get("num_results", 5))
+    done = queue.checkpoints(job["id"])
+    ctx.update(done.get("delivered", {}))
+
+    with tracing.span("pipeline", goal=ctx["slug"], job=job["id"], attempt=job["attempts"]), \
+            _heartbeat(queue, job["id"], worker) as lost:
+        for name, stage in stages or STAGES:
+            if name in done:
+                ctx.update(done[name])
+                continue
+            if lost.is_set():
+                raise LeaseLost(f"Job {job['id']} is no longer owned by {worker}")
+            output = run_stage(name, stage, ctx)
+            deliveries = output.get("deliveries") or []
+            failed = [d["recipient"] for d in deliveries if not d["ok"]]
+            if failed:
+                delivered = ctx.get("delivered", []) + [d["recipient"] for d in deliveries if d["ok"]]
+                queue.save_checkpoint(job["id"], worker, "delivered", {"delivered": delivered})
+                raise DeliveryError(f"Could not deliver to {', '.join(failed)}")
+            queue.save_checkpoint(job["id"], worker, name, output)
+            ctx.update(output)
+    return ctx
+
+
+def run_worker(path: str = None, worker: str = None, stages=None, poll_interval: float = 2.0,
+               drain: bool = True, lease_seconds: float = 600, max_attempts: int = 3,
+               warm: bool = False) -> int:
+    """
+    Claim and run jobs until the queue is empty (drain=True) or forever.
+    Returns the number of jobs completed by this worker.
+    :param warm: Load every stage dependency before claiming the first job (see pipeline.prewarm).
+    """
+    worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+    if warm:
+        prewarm()
+    queue = JobQueue(path, lease_seconds=lease_seconds, max_attempts=max_attempts)
+    completed = 0
+    try:
+        while True:
+            job = queue.claim(worker)
+            if job is None:
+                if drain:
+                    return completed
+                time.sleep(poll_interval)
+                continue
+            try:
+                with llm_scheduler.priority(llm_scheduler.BULK):
+                    run_job(queue, job, worker, stages)
+            except LeaseLost as e:
+                print(f"⚠️ {e}; leaving it to its new worker")
+            except Exception as e:
+                print(f"❌ Job {job['id']} failed (attempt {job['attempts']}): {e}")
+                queue.fail(job["id"], worker, f"{type(e).__name__}: {e}")
+            else:
+                if queue.complete(job["id"], worker):
+                    completed += 1
+                    print(f"✅ Job {job['id']} done: {job['goal']}")
+                else:
+                    print(f"⚠️ Job {job['id']} finished after its lease was lost; leaving it to its new worker")
+    finally:
+        queue.close()
+
+
+def run_workers(path: str = None, workers: int = 2, **kwargs):
+    """
+    Drain the queue with several worker processes in parallel.
+    """
+    processes = [
+        multiprocessing.Process(target=run_worker, args=(path,), kwargs=kwargs, name=f"worker-{i}")
+        for i in range(workers)
+    ]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Durable job queue for research goals.")
+    parser.add_argument("--db", default=None, help="Queue database (defaults to config.JOB_QUEUE_PATH)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    enqueue = sub.add_parser("enqueue", help="Add goals from a file, one per line")
+    enqueue.add_argument("goals_file")
+    enqueue.add_argument("--recipient", action="append", default=[])
+    enqueue.add_argument("--num-results", type=int, default=5)
+
+    work = sub.add_parser("work", help="Drain the queue")
+    work.add_argument("--workers", type=int, default=1)
+    work.add_argument("--forever", action="store_true", help="Keep polling for new jobs")
+    work.add_argument("--prewarm", action="store_true", help="Load dependencies before the first job")
+
+    sub.add_parser("status", help="Show job counts by status")
+    args = parser.parse_args()
+
+    if args.command == "enqueue":
+        from modules.batch_runner import load_goals
+        q = JobQueue(args.db)
+        ids = [q.enqueue(goal, recipients=args.recipient, num_results=args.num_results)
+               for goal in load_goals(args.goals_file)]
+        print(f"Enqueued {len(ids)} jobs")
+    elif args.command == "work":
+        if args.workers > 1:
+            run_workers(args.db, workers=args.workers, drain=not args.forever, warm=args.prewarm)
+        else:
+            run_worker(args.db, drain=not args.forever, warm=args.prewarm)
+    else:
+        print(JobQueue(args.db).status())
@@ -0,0 +1,323 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterator, List, Optional
+
+import config
+from modules import tracing
+from modules.llm_scheduler import estimate_request_tokens, get_scheduler
+
+
+def cache_key(model: str, messages: List[Dict], temperature: float, max_tokens: Optional[int]) -> str:
+    """
+    Content-address a completion request. Keys are stable across runs because
+    the payload is serialized with sorted keys and no whitespace.
+    """
+    payload = json.dumps(
+        {"model": model, "messages": messages, "temperature": temperature, "max_tokens": max_tokens},
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# Cache hits refresh accessed_at at most this often, and the refreshes are
+# written in batches instead of one commit per hit.
+TOUCH_INTERVAL = 60.0
+TOUCH_BATCH = 256
+# Every this many writes, expired entries are swept and the running size is
+# re-read from disk (other processes may share the file).
+SWEEP_EVERY = 256
+# Eviction frees space down to this fraction of max_bytes, so a full cache
+# does not evict again on every write.
+EVICT_TO = 0.9
+
+
+class LLMCache:
+    def __init__(self, path: str, ttl: Optional[float] = None, max_bytes: Optional[int] = None):
+        """
+        On-disk cache of chat completion responses backed by SQLite.
+        :param path: SQLite database file.
+        :param ttl: Seconds an entry stays valid; None keeps entries forever.
+        :param max_bytes: Evict least recently used entries above this total size.
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._touched = {}
+        self._writes = 0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " content TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+        self._conn.commit()
+        self._size = self._total_size()
+
+    def _total_size(self) -> int:
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def _delete(self, key: str):
+        row = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+        self._touched.pop(key, None)
+        if row:
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._size -= row[0]
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content, created_at, accessed_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row and self.ttl is not None and now - row[1] > self.ttl:
+                self._delete(key)
+                self._conn.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            if now - max(row[2], self._touched.get(key, 0.0)) > TOUCH_INTERVAL:
+                self._touched[key] = now
+                if len(self._touched) >= TOUCH_BATCH:
+                    self._flush_touched()
+                    self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def _flush_touched(self):
+        self._conn.executemany(
+            "UPDATE responses SET accessed_at = ? WHERE key = ?",
+            [(at, key) for key, at in self._touched.items()],
+        )
+        self._touched.clear()
+
+    def set(self, key: str, content: str):
+        now = time.time()
+        size = len(content.encode("utf-8"))
+        with self._lock:
+            self._delete(key)
+            self._conn.execute(
+                "INSERT INTO responses (key, content, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, content, size, now, now),
+            )
+            self._size += size
+            self._writes += 1
+            if self._writes % SWEEP_EVERY == 0:
+                self._sweep(now)
+            if self.max_bytes is not None and self._size > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def invalidate(self, key: str):
+        """
+        Drop one entry, e.g. a response that turned out to be unusable.
+        """
+        with self._lock:
+            self._delete(key)
+            self._conn.commit()
+
+    def _sweep(self, now: float):
+        if self.ttl is not None:
+            self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,))
+        self._size = self._total_size()
+
+    def _evict(self):
+        # Pending hits must be on disk before recency decides what goes.
+        self._flush_touched()
+        self._size = self._total_size()
+        target = self.max_bytes * EVICT_TO
+        # Walk entries from least to most recently used until we fit again.
+        doomed = []
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+            if self._size <= target:
+                break
+            doomed.append((key,))
+            self._size -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._touched.clear()
+            self._size = 0
+            self._conn.commit()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": size}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> Optional[LLMCache]:
+    """
+    Return the process-wide cache, or None when caching is disabled.
+    """
+    global _cache
+    if not config.LLM_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache(config.LLM_CACHE_PATH, ttl=config.LLM_CACHE_TTL,
+                              max_bytes=config.LLM_CACHE_MAX_BYTES)
+        return _cache
+
+
+def _prompt_bytes(messages: List[Dict]) -> int:
+    return sum(len(str(m.get("content") or "").encode("utf-8")) for m in messages)
+
+
+def _record_usage(span, usage, content: str):
+    span.record(
+        prompt_tokens=getattr(usage, "prompt_tokens", 0) if usage else 0,
+        completion_tokens=getattr(usage, "completion_tokens", 0) if usage else 0,
+        bytes_in=len(content.encode("utf-8")) if content else 0,
+    )
+
+
+def chat_completion(model: str, messages: List[Dict], temperature: float = 0.0,
+                    max_tokens: Optional[int] = None, priority: Optional[int] = None) -> str:
+    """
+    Call the chat completions API through the response cache and return the
+    message content. Identical requests are served from disk; the rest wait
+    their turn in the shared LLMScheduler. Each call is traced as an
+    "llm.chat" span with token usage and cache hits.
+    :param priority: llm_scheduler.INTERACTIVE or BULK (default: the caller's context).
+    """
+    with tracing.span("llm.chat", model=model) as span:
+        cache = get_cache()
+        key = cache_key(model, messages, temperature, max_tokens)
+        if cache is not None:
+            cached = cache.get(key)
+            if cached is not None:
+                span.record(cache_hits=1)
+                return cached
+            span.record(cache_misses=1)
+
+        kwargs = {"model": model, "messages": messages, "temperature": temperature}
+        if max_tokens is not None:
+            kwargs["max_tokens"] = max_tokens
+        span.record(bytes_out=_prompt_bytes(messages))
+        scheduler = get_scheduler()
+        estimated = estimate_request_tokens(messages, max_tokens)
+        resp = scheduler.call(lambda: config.client.chat.completions.create(**kwargs), estimated, priority)
+        choice = resp.choices[0]
+        content = choice.message.content
+        usage = getattr(resp, "usage", None)
+        scheduler.settle(estimated, getattr(usage, "total_tokens", None))
+        _record_usage(span, usage, content)
+
+        # Truncated ("length") or filtered answers are not worth replaying.
+        if cache is not None and content is not None and getattr(choice, "finish_reason", None) == "stop":
+            cache.set(key, content)
+        return content
+
+
+def cached_completion(model: str, messages: List[Dict], temperature: float = 0.0,
+                      max_tokens: Optional[int] = None) -> Optional[str]:
+    """
+    The cached response to a request, or None, without calling the API.
+    """
+    cache = get_cache()
+    if cache is None:
+        return None
+    content = cache.get(cache_key(model, messages, temperature, max_tokens))
+    if content is not None:
+        tracing.record(cache_hits=1)
+    return content
+
+
+def store_completion(model: str, messages: List[Dict], content: str, temperature: float = 0.0,
+                     max_tokens: Optional[int] = None):
+    """
+    Cache content as the response to a request, e.g. one request's share of a
+    batched answer, so the request on its own is served from disk.
+    """
+    cache = get_cache()
+    if cache is not None:
+        cache.set(cache_key(model, messages, temperature, max_tokens), content)
+
+
+def invalidate(model: str, messages: List[Dict], temperature: float = 0.0, max_tokens: Optional[int] = None):
+    """
+    Forget the cached response to a request, for callers that find it unusable
+    (e.g. extraction JSON that does not parse) so the next call asks again.
+    """
+    cache = get_cache()
+    if cache is not None:
+        cache.invalidate(cache_key(model, messages, temperature, max_tokens))
+
+
+def stream_chat_completion(model: str, messages: List[Dict], temperature: float = 0.0,
+                           max_tokens: Optional[int] = None, priority: Optional[int] = None) -> Iterator[str]:
+    """
+    Like chat_completion, but yield the content as it is generated. A cached
+    response is yielded in one piece; a streamed one is cached once complete.
+    """
+    # Not made current: the consumer runs between yields, outside this span.
+    span = tracing.get_tracer().start_span("llm.stream", model=model)
+    error = None
+    try:
+        cache = get_cache()
+        key = cache_key(model, messages, temperature, max_tokens)
+        if cache is not None:
+            cached = cache.get(key)
+            if cached is not None:
+                span.record(cache_hits=1)
+                yield cached
+                return
+            span.record(cache_misses=1)
+
+        kwargs = {"model": model, "messages": messages, "temperature": temperature, "stream": True,
+                  "stream_options": {"include_usage": True}}
+        if max_tokens is not None:
+            kwargs["max_tokens"] = max_tokens
+        span.record(bytes_out=_prompt_bytes(messages))
+        scheduler = get_scheduler()
+        estimated = estimate_request_tokens(messages, max_tokens)
+        stream = scheduler.call(lambda: config.client.chat.completions.create(**kwargs), estimated, priority)
+        parts = []
+        usage = None
+        finish_reason = None
+        for chunk in stream:
+            # With include_usage the last chunk has no choices, only usage.
+            usage = getattr(chunk, "usage", None) or usage
+            if not chunk.choices:
+                continue
+            finish_reason = getattr(chunk.choices[0], "finish_reason", None) or finish_reason
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                yield delta
+
+        content = "".join(parts)
+        scheduler.settle(estimated, getattr(usage, "total_tokens", None))
+        _record_usage(span, usage, content)
+        if cache is not None and parts and finish_reason == "stop":
+            cache.set(key, content)
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        span.end(error=None if isinstance(error, GeneratorExit) else error)
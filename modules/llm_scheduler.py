@@ -0,0 +1,321 @@
+import contextvars
+import heapq
+import itertools
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+import config
+from modules import tracing
+
+# Lower runs first: a waiting interactive call always goes ahead of queued bulk work.
+INTERACTIVE = 0
+BULK = 1
+
+_priority = contextvars.ContextVar("llm_priority", default=INTERACTIVE)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate (~4 characters per token for English text).
+    """
+    return len(text) // 4 + 1
+
+
+def estimate_request_tokens(messages: List[Dict], max_tokens: Optional[int]) -> int:
+    """
+    Tokens a request may count against TPM: the prompt plus the completion it
+    is allowed to generate (the provider reserves max_tokens up front).
+    """
+    prompt = sum(estimate_tokens(str(m.get("content") or "")) + 4 for m in messages)
+    return prompt + (max_tokens if max_tokens is not None else config.LLM_DEFAULT_COMPLETION_TOKENS)
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    for name, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        value = headers.get(name)
+        if value:
+            try:
+                return float(value) * scale
+            except ValueError:
+                pass
+    return None
+
+
+def is_rate_limited(error: BaseException) -> bool:
+    # openai.RateLimitError carries status_code 429; checked by attribute so
+    # the openai package is not needed to recognize it.
+    return getattr(error, "status_code", None) == 429
+
+
+def is_transient(error: BaseException) -> bool:
+    # What the openai client would retry by itself: 408/409/5xx responses and
+    # connection errors or timeouts (openai.APIConnectionError and subclasses).
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in (408, 409) or status >= 500
+    if any(cls.__name__ == "APIConnectionError" for cls in type(error).__mro__):
+        return True
+    return isinstance(error, (ConnectionError, TimeoutError))
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float, burst_seconds: float = 60.0):
+        """
+        Continuously refilled bucket holding at most burst_seconds of quota.
+        The level may go negative when one request costs more than the whole
+        bucket; later requests then wait until it is paid back.
+        """
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def time_until(self, amount: float, now: float) -> float:
+        self._refill(now)
+        needed = min(amount, self.capacity) - self.level
+        return max(0.0, needed / self.rate)
+
+    def take(self, amount: float, now: float):
+        self._refill(now)
+        self.level -= amount
+
+    def give(self, amount: float, now: float):
+        self._refill(now)
+        self.level = min(self.capacity, self.level + amount)
+
+
+class LLMScheduler:
+    def __init__(self, rpm: Optional[int] = None, tpm: Optional[int] = None, burst_seconds: float = None,
+                 max_retries: int = None, backoff: float = 1.0, max_backoff: float = 60.0):
+        """
+        Process-wide admission control for chat completion requests. Calls
+        wait in a priority queue until both the requests-per-minute and
+        tokens-per-minute buckets can cover them, so concurrent goals run at
+        the quota ceiling instead of tripping it. A 429 pauses every waiting
+        call for the provider's Retry-After (or an exponential backoff).
+        Budgets are per process: split them across job queue workers.
+        :param rpm: Requests per minute; 0 or None means unlimited.
+        :param tpm: Tokens per minute; 0 or None means unlimited.
+        :param burst_seconds: Seconds of quota that may be spent at once.
+        :param max_retries: Attempts after a 429 or transient error before the error is raised.
+        """
+        burst_seconds = burst_seconds or config.LLM_BURST_SECONDS
+        self._requests = TokenBucket(rpm, burst_seconds) if rpm else None
+        self._tokens = TokenBucket(tpm, burst_seconds) if tpm else None
+        self.max_retries = config.LLM_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.admitted = 0
+        self.rate_limited = 0
+        self.waited = 0.0
+        self._paused_until = 0.0
+        self._waiting = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def _delay(self, tokens: int, now: float) -> float:
+        delay = self._paused_until - now
+        if self._requests is not None:
+            delay = max(delay, self._requests.time_until(1, now))
+        if self._tokens is not None:
+            delay = max(delay, self._tokens.time_until(tokens, now))
+        return delay
+
+    def acquire(self, tokens: int, priority: Optional[int] = None):
+        """
+        Block until the request is at the head of the queue and fits both budgets.
+        """
+        entry = (_priority.get() if priority is None else priority, next(self._seq))
+        started = time.monotonic()
+        with self._cond:
+            heapq.heappush(self._waiting, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    if self._waiting[0] == entry:
+                        delay = self._delay(tokens, now)
+                        if delay <= 0:
+                            break
+                        self._cond.wait(delay)
+                    else:
+                        self._cond.wait()
+            except BaseException:
+                self._waiting.remove(entry)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+                raise
+            heapq.heappop(self._waiting)
+            if self._requests is not None:
+                self._requests.take(1, now)
+            if self._tokens is not None:
+                self._tokens.take(tokens, now)
+            self.admitted += 1
+            self.waited += now - started
+            self._cond.notify_all()
+
+    def settle(self, estimated: int, actual: Optional[int]):
+        """
+        Correct the token bucket once the response reports real usage.
+        """
+        if self._tokens is None or not actual:
+            return
+        with self._cond:
+            now = time.monotonic()
+            if actual < estimated:
+                self._tokens.give(estimated - actual, now)
+            else:
+                self._tokens.take(actual - estimated, now)
+            self._cond.notify_all()
+
+    def pause(self, seconds: float):
+        """
+        Hold every queued call for at least this long (after a 429).
+        """
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._cond.notify_all()
+
+    def call(self, fn: Callable, tokens: int, priority: Optional[int] = None):
+        """
+        Run fn() once admitted, retrying with backoff while it is rate limited
+        (which pauses every queued call) or fails transiently (just this one).
+        """
+        for attempt in range(self.max_retries + 1):
+            self.acquire(tokens, priority)
+            try:
+                return fn()
+            except Exception as e:
+                limited = is_rate_limited(e)
+                if not (limited or is_transient(e)) or attempt == self.max_retries:
+                    raise
+                delay = _retry_after(e)
+                if delay is None:
+                    delay = min(self.max_backoff, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+                if not limited:
+                    time.sleep(delay)
+                    continue
+                with self._cond:
+                    self.rate_limited += 1
+                tracing.record(rate_limited=1)
+                self.pause(delay)
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {"admitted": self.admitted, "rate_limited": self.rate_limited,
+                    "waited": self.waited, "queued": len(self._waiting)}
+
+
+class MicroBatcher:
+    def __init__(self, run_batch: Callable[[List], List], window: float = 0.05,
+                 max_items: int = 24, max_tokens: int = 3000):
+        """
+        Coalesce small requests submitted from different threads within a
+        short window into one call. run_batch receives a list of request
+        payloads and returns one result per payload, in order.
+        :param window: Seconds the first request of a batch waits for company.
+        :param max_items: Close the batch once it holds this many items.
+        :param max_tokens: Close the batch once its payloads cost this many tokens.
+        """
+        self.run_batch = run_batch
+        self.window = window
+        self.max_items = max_items
+        self.max_tokens = max_tokens
+        self._lock = threading.Lock()
+        self._open = None
+
+    def submit(self, payload, items: int, tokens: int):
+        """
+        Add a payload to the open batch (or start one) and block for its result.
+        The thread that opens a batch waits out the window, then runs it.
+        """
+        with self._lock:
+            batch = self._open
+            leader = batch is None or batch["items"] + items > self.max_items or batch["tokens"] + tokens > self.max_tokens
+            if leader:
+                if batch is not None:
+                    batch["closed"].set()
+                batch = {"payloads": [], "items": 0, "tokens": 0, "closed": threading.Event(),
+                         "done": threading.Event(), "results": None, "error": None}
+                self._open = batch
+            index = len(batch["payloads"])
+            batch["payloads"].append(payload)
+            batch["items"] += items
+            batch["tokens"] += tokens
+            if batch["items"] >= self.max_items:
+                self._open = None
+                batch["closed"].set()
+
+        if not leader:
+            batch["done"].wait()
+        else:
+            batch["closed"].wait(self.window)
+            with self._lock:
+                if self._open is batch:
+                    self._open = None
+            try:
+                batch["results"] = self.run_batch(batch["payloads"])
+            except BaseException as e:
+                batch["error"] = e
+            finally:
+                batch["done"].set()
+
+        if batch["error"] is not None:
+            raise batch["error"]
+        return batch["results"][index]
+
+
+_scheduler = None
+_batchers = {}
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> LLMScheduler:
+    """
+    Return the process-wide scheduler built from the LLM_* settings in config.
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = LLMScheduler(rpm=config.LLM_RPM, tpm=config.LLM_TPM)
+        return _scheduler
+
+
+def get_batcher(key, run_batch: Callable[[List], List]) -> MicroBatcher:
+    """
+    Return the process-wide MicroBatcher for key, creating it with run_batch
+    on first use. Requests only share a batch when they share a key, so the
+    key must cover everything run_batch depends on: every later caller's
+    requests run through the first caller's run_batch.
+    """
+    with _scheduler_lock:
+        if key not in _batchers:
+            _batchers[key] = MicroBatcher(run_batch, window=config.LLM_BATCH_WINDOW,
+                                          max_items=config.LLM_BATCH_MAX_ITEMS,
+                                          max_tokens=config.LLM_BATCH_MAX_TOKENS)
+        return _batchers[key]
+
+
+def current_priority() -> int:
+    return _priority.get()
+
+
+@contextmanager
+def priority(level: int):
+    """
+    Run LLM calls made inside the block (and in threads started through
+    tracing.propagate) at this priority, e.g. `with priority(BULK):`.
+    """
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
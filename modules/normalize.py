@@ -0,0 +1,103 @@
+import re
+import unicodedata
+from urllib.parse import urlsplit
+
+# Hosts where the company identity lives in the path, not the domain.
+PROFILE_HOSTS = {
+    "linkedin.com", "crunchbase.com", "facebook.com", "twitter.com", "x.com",
+    "instagram.com", "github.com", "angel.co", "wellfound.com",
+}
+
+# News, blog, directory and review hosts: a link there is a page about a
+# company (often one of many), not the company's own site.
+PUBLISHER_HOSTS = {
+    "medium.com", "substack.com", "wordpress.com", "blogspot.com", "techcrunch.com", "forbes.com",
+    "bloomberg.com", "reuters.com", "businessinsider.com", "venturebeat.com", "wired.com",
+    "theverge.com", "wikipedia.org", "youtube.com", "reddit.com", "quora.com", "news.ycombinator.com",
+    "producthunt.com", "tracxn.com", "f6s.com", "g2.com", "capterra.com", "clutch.co", "glassdoor.com",
+    "indeed.com", "yelp.com", "google.com", "dawn.com", "tribune.com.pk", "thenews.com.pk",
+    "techjuice.pk", "propakistani.pk", "profit.pakistantoday.com.pk", "menabytes.com", "wamda.com",
+    "magnitt.com",
+}
+
+LEGAL_SUFFIXES = {
+    "pvt", "private", "ltd", "limited", "inc", "incorporated", "llc", "llp",
+    "corp", "corporation", "co", "company", "plc", "gmbh", "smc",
+}
+
+_PUNCT_RE = re.compile(r"[^\w\s]+", re.UNICODE)
+_TLD_RE = re.compile(r"\.(ai|io|com|co|pk|net|org|tech|app)\b")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def _split(url):
+    url = str(url).strip().lower()
+    if "://" not in url:
+        url = "http://" + url
+    parts = urlsplit(url)
+    host = parts.hostname or ""
+    if host.startswith("www."):
+        host = host[4:]
+    return host, parts
+
+
+def _on_host(host: str, domains) -> bool:
+    return any(host == domain or host.endswith("." + domain) for domain in domains)
+
+
+def normalize_website(url) -> str:
+    """
+    Reduce a URL to the part that identifies a company: the host without
+    scheme/www, plus the profile path on social and directory sites.
+    """
+    if not url:
+        return ""
+    host, parts = _split(url)
+    for profile_host in PROFILE_HOSTS:
+        if host == profile_host or host.endswith("." + profile_host):
+            segments = [s for s in parts.path.split("/") if s][:2]
+            return "/".join([profile_host] + segments)
+    return host
+
+
+def company_website(url) -> str:
+    """
+    normalize_website(url) when the URL can stand for one company: a profile
+    page, or the home or a top-level page of a site that is not a publisher.
+    Articles return "" since many companies share their host, e.g.
+    "techcrunch.com/2024/01/foo-raises" or "dawn.com/news/123/bar".
+    """
+    website = normalize_website(url)
+    if not website or "/" in website:
+        return website
+    host, parts = _split(url)
+    if _on_host(host, PROFILE_HOSTS) or _on_host(host, PUBLISHER_HOSTS):
+        return ""
+    if len([s for s in parts.path.split("/") if s]) > 1:
+        return ""
+    return website
+
+
+def normalize_name(name) -> str:
+    """
+    Casefold a company name and drop punctuation, TLD decorations and legal
+    suffixes, e.g. "Foo.ai (Pvt) Ltd" -> "foo".
+    """
+    if not name:
+        return ""
+    text = unicodedata.normalize("NFKC", str(name)).casefold()
+    text = _TLD_RE.sub(" ", text)
+    text = _PUNCT_RE.sub(" ", text)
+    tokens = [t for t in _SPACE_RE.split(text) if t and t not in LEGAL_SUFFIXES]
+    return " ".join(tokens)
+
+
+def entity_key(entry: dict) -> str:
+    """
+    Stable identity for a structured entry: its website when known, else its name.
+    """
+    website = normalize_website(entry.get("website"))
+    if website:
+        return "web:" + website
+    name = normalize_name(entry.get("name"))
+    return "name:" + name if name else ""
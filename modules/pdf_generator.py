@@ -1,13 +1,424 @@
 from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, LongTable, TableStyle, Flowable
+from reportlab.graphics.shapes import Drawing
+from reportlab.lib.utils import ImageReader
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_JUSTIFY
 from reportlab.lib import colors
 from reportlab.lib.units import inch, cm
 from reportlab.pdfgen import canvas
+from collections import OrderedDict
 from datetime import datetime
+from functools import lru_cache
+import hashlib
+import io
 import os
 import re
+import threading
+from xml.sax.saxutils import quoteattr, unescape
+
+from modules import tracing
+
+# Custom color palette
+PRIMARY_COLOR = "#2C3E50"  # Dark blue
+SECONDARY_COLOR = "#3498DB"  # Bright blue
+ACCENT_COLOR = "#E74C3C"  # Red
+LIGHT_GRAY = "#F5F5F5"
+DARK_GRAY = "#333333"
+
+# Company listing: rows per LongTable, and flowables held ahead of the layout
+COMPANY_TABLE_ROWS = 100
+PREFETCH_FLOWABLES = 8
+
+
+@lru_cache(maxsize=None)
+def get_styles():
+    """
+    Build the sample stylesheet plus the report's custom styles. Cached, so
+    a process (or render worker) pays for this once.
+    """
+    styles = getSampleStyleSheet()
+
+    # Enhanced styles
+    styles.add(ParagraphStyle(
+        name='TitleModern',
+        fontSize=24,
+        leading=30,
+        alignment=TA_CENTER,
+        spaceAfter=24,
+        textColor=PRIMARY_COLOR,
+        fontName='Helvetica-Bold',
+        underline=True,
+        underlineColor=SECONDARY_COLOR,
+        underlineWidth=1
+    ))
+    
+    styles.add(ParagraphStyle(
+        name='DateModern',
+        parent=styles['Normal'],
+        fontSize=11,
+        leading=16,
+        alignment=TA_CENTER,
+        spaceAfter=24,
+        textColor=SECONDARY_COLOR,
+        fontName='Helvetica'
+    ))
+
+    styles.add(ParagraphStyle(
+        name='SectionHeader',
+        fontSize=16,
+        leading=22,
+        alignment=TA_LEFT,
+        spaceBefore=12,
+        spaceAfter=8,
+        textColor=PRIMARY_COLOR,
+        fontName='Helvetica-Bold',
+        leftIndent=0,
+        borderLeft=4,
+        borderColor=SECONDARY_COLOR,
+        borderPadding=(0, 0, 0, 10)
+    ))
+    
+    styles.add(ParagraphStyle(
+        name='SubSectionHeader',
+        fontSize=12,
+        leading=16,
+        alignment=TA_LEFT,
+        spaceBefore=6,
+        spaceAfter=4,
+        textColor=PRIMARY_COLOR,
+        fontName='Helvetica-Bold'
+    ))
+    
+    styles.add(ParagraphStyle(
+        name='BodyModern',
+        fontSize=11,
+        leading=16,
+        alignment=TA_JUSTIFY,
+        spaceAfter=10,
+        textColor=DARK_GRAY,
+        fontName='Helvetica'
+    ))
+    
+    styles.add(ParagraphStyle(
+        name='BulletModern',
+        fontSize=11,
+        leading=16,
+        alignment=TA_JUSTIFY,
+        spaceAfter=6,
+        textColor=DARK_GRAY,
+        fontName='Helvetica',
+        leftIndent=16,
+        bulletIndent=0,
+        bulletFontName='Helvetica-Bold',
+        bulletFontSize=11
+    ))
+    return styles
+
+
+@lru_cache(maxsize=None)
+def get_stats_table_style():
+    return TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(PRIMARY_COLOR)),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor(LIGHT_GRAY)),
+        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor(SECONDARY_COLOR)),
+    ])
+
+
+@lru_cache(maxsize=None)
+def get_company_table_style():
+    return TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(PRIMARY_COLOR)),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 8),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor(LIGHT_GRAY)]),
+        ('LINEBELOW', (0, 0), (-1, -1), 0.25, colors.HexColor(SECONDARY_COLOR)),
+    ])
+
+
+def _cell(value, limit):
+    text = "" if value is None else str(value)
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+# Markdown patterns, compiled once and applied line by line in a single pass.
+MD_HEADING_RE = re.compile(r"(#{1,6})\s+(.*?)\s*#*")
+BOLD_HEADING_RE = re.compile(r"\*\*([^*]+?)\*\*:?")
+PLAIN_HEADING_RE = re.compile(r"[A-Z][A-Za-z ]+[:\-]?")
+BULLET_RE = re.compile(r"[-*•+]\s+(.*)")
+NUMBERED_RE = re.compile(r"(\d+)[.)]\s+(.*)")
+INLINE_RE = re.compile(
+    r"\*\*(?P<bold>.+?)\*\*"
+    r"|__(?P<bold2>.+?)__"
+    r"|(?<![\w*])\*(?P<italic>[^*\s](?:[^*]*[^*\s])?)\*(?![\w*])"
+    r"|`(?P<code>[^`]+)`"
+    r"|\[(?P<label>[^\]]+)\]\((?P<url>https?://[^)\s]+)\)"
+)
+_ESCAPES = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;"})
+
+
+def _inline_markup(text):
+    """
+    Escape text for reportlab's paragraph markup and turn markdown emphasis,
+    code spans and links into the equivalent tags.
+    """
+    def replace(m):
+        if m.group("bold") or m.group("bold2"):
+            return f"<b>{m.group('bold') or m.group('bold2')}</b>"
+        if m.group("italic"):
+            return f"<i>{m.group('italic')}</i>"
+        if m.group("code"):
+            return f'<font face="Courier">{m.group("code")}</font>'
+        # The url was escaped along with the text; quoteattr escapes it again, so undo that first.
+        return f'<link href={quoteattr(unescape(m.group("url")))} color="blue">{m.group("label")}</link>'
+
+    return INLINE_RE.sub(replace, text.translate(_ESCAPES))
+
+
+class MarkdownSectionParser:
+    """
+    Single-pass tokenizer for the LLM summary. Feed it text (all at once or
+    as streamed fragments) and it returns completed sections as
+    (heading, blocks) tuples, where each block is (kind, markup, label):
+
+        ("para", markup, None)       paragraph text
+        ("bullet", markup, "•")      unordered list item
+        ("bullet", markup, "3.")     numbered list item
+        ("subheading", markup, None) heading below level 2
+
+    A section is returned as soon as the next heading shows it is complete.
+    Text before the first heading becomes an "Introduction" section. A plain
+    heading ("Conclusion:") only counts once a non-blank line follows it, as
+    with the old regex splitter; on the last line it is paragraph text.
+    """
+
+    def __init__(self):
+        self._pending = ""
+        self._heading = "Introduction"
+        self._explicit = False
+        self._candidate = None
+        self._blocks = []
+        self._paragraph = []
+
+    def _flush_paragraph(self):
+        if self._paragraph:
+            self._blocks.append(("para", _inline_markup(" ".join(self._paragraph)), None))
+            self._paragraph = []
+
+    def _finish_section(self, next_heading):
+        self._flush_paragraph()
+        # An empty implicit Introduction has no text; an empty titled section keeps its heading.
+        sections = [(self._heading, self._blocks)] if self._blocks or self._explicit else []
+        self._heading, self._blocks, self._explicit = next_heading, [], True
+        return sections
+
+    def _feed_line(self, line):
+        line = line.strip()
+        if not line:
+            if self._candidate is None:
+                self._flush_paragraph()
+            return []
+
+        sections = []
+        if self._candidate is not None:
+            sections = self._finish_section(self._candidate.rstrip(":-").strip())
+            self._candidate = None
+        return sections + self._classify_line(line)
+
+    def _classify_line(self, line):
+        m = MD_HEADING_RE.fullmatch(line)
+        if m:
+            text = m.group(2).strip("*_ ").rstrip(":").strip()
+            if len(m.group(1)) <= 2:
+                return self._finish_section(text)
+            self._flush_paragraph()
+            self._blocks.append(("subheading", _inline_markup(text), None))
+            return []
+
+        m = BOLD_HEADING_RE.fullmatch(line)
+        if m:
+            return self._finish_section(m.group(1).rstrip(":-").strip())
+
+        if PLAIN_HEADING_RE.fullmatch(line):
+            self._candidate = line
+            return []
+
+        m = BULLET_RE.fullmatch(line)
+        if m:
+            self._flush_paragraph()
+            self._blocks.append(("bullet", _inline_markup(m.group(1)), "•"))
+            return []
+
+        m = NUMBERED_RE.fullmatch(line)
+        if m:
+            self._flush_paragraph()
+            self._blocks.append(("bullet", _inline_markup(m.group(2)), f"{m.group(1)}."))
+            return []
+
+        self._paragraph.append(line)
+        return []
+
+    def feed(self, text):
+        self._pending += text
+        *lines, self._pending = self._pending.split("\n")
+        sections = []
+        for line in lines:
+            sections.extend(self._feed_line(line))
+        return sections
+
+    def close(self):
+        sections = self._feed_line(self._pending)
+        self._pending = ""
+        if self._candidate is not None:
+            # Nothing followed it, so it was the closing words, not a heading.
+            self._paragraph.append(self._candidate)
+            self._candidate = None
+        return sections + self._finish_section(None)
+
+
+def parse_summary(summary):
+    """
+    Tokenize a complete summary into (heading, blocks) sections.
+    """
+    parser = MarkdownSectionParser()
+    return parser.feed(summary) + parser.close()
+
+
+# Decoded chart images keyed by content hash, shared across reports
+IMAGE_CACHE_SIZE = 64
+_image_cache = OrderedDict()
+_image_cache_lock = threading.Lock()
+
+
+def _chart_bytes(chart):
+    if isinstance(chart, (bytes, bytearray, memoryview)):
+        return bytes(chart)
+    if hasattr(chart, "getvalue"):
+        return chart.getvalue()
+    with open(chart, "rb") as f:
+        return f.read()
+
+
+def get_image_reader(data):
+    """
+    Return a cached ImageReader for PNG bytes. The reader keeps its decoded
+    pixels, so a chart is decoded once per process, and reportlab reuses one
+    image XObject for identical content within a document.
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    with _image_cache_lock:
+        reader = _image_cache.get(digest)
+        if reader is not None:
+            _image_cache.move_to_end(digest)
+            return reader
+    reader = ImageReader(io.BytesIO(data))
+    reader.getRGBData()
+    with _image_cache_lock:
+        _image_cache[digest] = reader
+        while len(_image_cache) > IMAGE_CACHE_SIZE:
+            _image_cache.popitem(last=False)
+    return reader
+
+
+class ChartImage(Flowable):
+    """
+    Draws a cached ImageReader scaled to fit the available width.
+    """
+
+    def __init__(self, reader, max_width):
+        super().__init__()
+        self.reader = reader
+        img_width, img_height = reader.getSize()
+        scale = min(1.0, max_width / img_width)
+        self.width = img_width * scale
+        self.height = img_height * scale
+        self.hAlign = 'CENTER'
+
+    def draw(self):
+        self.canv.drawImage(self.reader, 0, 0, self.width, self.height, mask='auto')
+
+
+class _LazyFlowables(list):
+    """
+    Flowable list that doc.build drains while it pulls the next flowables
+    from an iterator, so only a few exist at a time. doc.build deletes each
+    flowable from the front once it is drawn.
+    """
+
+    def __init__(self, flowables, prefetch=PREFETCH_FLOWABLES):
+        super().__init__()
+        self._source = iter(flowables)
+        self.prefetch = prefetch
+
+    def __len__(self):
+        # Refill ahead of the layout so keepWithNext look-ahead sees real flowables.
+        while list.__len__(self) < self.prefetch and self._source is not None:
+            try:
+                self.append(next(self._source))
+            except StopIteration:
+                self._source = None
+        return list.__len__(self)
+
+
+class _BuildAborted(Exception):
+    pass
+
+
+class _FlowableStream(list):
+    """
+    Flowable list that doc.build can consume while it is still being filled.
+    len() blocks until another flowable arrives or the producer closes it,
+    so layout and drawing run concurrently with generation. With max_pending,
+    put() waits while that many flowables are queued, bounding memory when
+    the producer is faster than the layout. After abort(), len() raises so
+    doc.build stops instead of finishing a truncated document.
+    """
+
+    def __init__(self, max_pending=None):
+        super().__init__()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._aborted = False
+        self.max_pending = max_pending
+
+    def put(self, flowables):
+        for flowable in flowables:
+            with self._cond:
+                while self.max_pending and list.__len__(self) >= self.max_pending and not self._closed:
+                    self._cond.wait()
+                self.append(flowable)
+                self._cond.notify_all()
+
+    def __delitem__(self, index):
+        with self._cond:
+            super().__delitem__(index)
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def abort(self):
+        with self._cond:
+            self._aborted = self._closed = True
+            self._cond.notify_all()
+
+    def __len__(self):
+        with self._cond:
+            while not list.__len__(self) and not self._closed:
+                self._cond.wait()
+            if self._aborted:
+                raise _BuildAborted()
+            return list.__len__(self)
+
 
 class PDFGenerator:
     def __init__(self, filename=None):
@@ -24,117 +435,15 @@ class PDFGenerator:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             self.filename = os.path.join(self.save_dir, f"report_{timestamp}.pdf")
 
-        self.styles = getSampleStyleSheet()
+        # Styles are built once per process and shared by every instance
+        self.styles = get_styles()
 
         # Custom color palette
-        self.primary_color = "#2C3E50"  # Dark blue
-        self.secondary_color = "#3498DB"  # Bright blue
-        self.accent_color = "#E74C3C"  # Red
-        self.light_gray = "#F5F5F5"
-        self.dark_gray = "#333333"
-
-        # Enhanced styles
-        self.styles.add(ParagraphStyle(
-            name='TitleModern',
-            fontSize=24,
-            leading=30,
-            alignment=TA_CENTER,
-            spaceAfter=24,
-            textColor=self.primary_color,
-            fontName='Helvetica-Bold',
-            underline=True,
-            underlineColor=self.secondary_color,
-            underlineWidth=1
-        ))
-        
-        self.styles.add(ParagraphStyle(
-            name='SectionHeader',
-            fontSize=16,
-            leading=22,
-            alignment=TA_LEFT,
-            spaceBefore=12,
-            spaceAfter=8,
-            textColor=self.primary_color,
-            fontName='Helvetica-Bold',
-            leftIndent=0,
-            borderLeft=4,
-            borderColor=self.secondary_color,
-            borderPadding=(0, 0, 0, 10)
-        ))
-        
-        self.styles.add(ParagraphStyle(
-            name='BodyModern',
-            fontSize=11,
-            leading=16,
-            alignment=TA_JUSTIFY,
-            spaceAfter=10,
-            textColor=self.dark_gray,
-            fontName='Helvetica'
-        ))
-        
-        self.styles.add(ParagraphStyle(
-            name='BulletModern',
-            fontSize=11,
-            leading=16,
-            alignment=TA_JUSTIFY,
-            spaceAfter=6,
-            textColor=self.dark_gray,
-            fontName='Helvetica',
-            leftIndent=10,
-            bulletIndent=0,
-            bulletFontName='Helvetica-Bold',
-            bulletFontSize=11
-        ))
-
-    def _clean_text(self, text):
-        """
-        Remove hash symbols (#) and stars (*) from the text.
-        """
-        # Remove hash symbols
-        text = re.sub(r'#+\s*', '', text)
-        # Remove stars but keep the text
-        text = re.sub(r'\*\*([^*]+)\*\*', r'\1', text)  # Remove **bold** markers
-        text = re.sub(r'\*([^*]+)\*', r'\1', text)      # Remove *italic* markers
-        text = re.sub(r'\*\s?', '', text)               # Remove standalone * used as bullets
-        return text.strip()
-
-    def _split_summary_into_sections(self, summary):
-        """
-        Splits summary text into sections based on natural headings.
-        """
-        sections = []
-        cleaned_summary = self._clean_text(summary)
-        
-        # Split by potential headings (lines that end with colon or are in all caps)
-        pattern = r"(?:\n|^)([A-Z][A-Za-z ]+[:\-]?)\n"
-        parts = re.split(pattern, cleaned_summary)
-        
-        # The first part is usually content before any heading
-        if parts[0].strip():
-            sections.append(("Introduction", parts[0].strip()))
-        
-        # Process remaining parts in pairs (heading, content)
-        for i in range(1, len(parts), 2):
-            if i + 1 < len(parts):
-                heading = parts[i].strip().rstrip(':').strip()
-                content = parts[i + 1].strip()
-                if heading and content:
-                    sections.append((heading, content))
-        
-        # If no headings found, split by double newlines
-        if len(sections) == 0:
-            paragraphs = [p.strip() for p in cleaned_summary.split("\n\n") if p.strip()]
-            for para in paragraphs:
-                # Try to extract heading from first sentence
-                first_line = para.split('\n')[0]
-                if len(first_line.split()) < 8 and first_line.endswith(':'):
-                    heading = first_line[:-1]
-                    content = '\n'.join(para.split('\n')[1:]).strip()
-                    sections.append((heading, content))
-                else:
-                    sections.append(("Key Information", para))
-        
-        return sections
+        self.primary_color = PRIMARY_COLOR
+        self.secondary_color = SECONDARY_COLOR
+        self.accent_color = ACCENT_COLOR
+        self.light_gray = LIGHT_GRAY
+        self.dark_gray = DARK_GRAY
 
     def _add_header_footer(self, canvas, doc):
         """
@@ -155,18 +464,7 @@ class PDFGenerator:
         canvas.line(inch, 0.7 * inch, doc.pagesize[0] - inch, 0.7 * inch)
         canvas.restoreState()
 
-    def _format_bullet_points(self, text):
-        """
-        Format bullet points in the text.
-        """
-        # Replace numbered lists with proper bullet points
-        text = re.sub(r"(\d+\.)\s", "• ", text)
-        return text
-
-    def create_report(self, summary, filename=None, stats=None):
-        """
-        Create PDF report with clean headings and professional formatting.
-        """
+    def _new_document(self, filename=None):
         if filename:
             self.filename = os.path.join(self.save_dir, os.path.basename(filename))
         if not self.filename:
@@ -174,22 +472,30 @@ class PDFGenerator:
 
         os.makedirs(os.path.dirname(self.filename), exist_ok=True)
 
+        # Laid out into a private temp file; _build renames it into place.
         doc = SimpleDocTemplate(
-            self.filename,
+            f"{self.filename}.{os.getpid()}.{threading.get_ident()}.tmp",
             pagesize=A4,
             leftMargin=1.5*cm,
             rightMargin=1.5*cm,
             topMargin=2*cm,
             bottomMargin=2*cm
         )
-        
-        doc.build = lambda elements: SimpleDocTemplate.build(
-            doc, 
-            elements, 
-            onFirstPage=self._add_header_footer,
-            onLaterPages=self._add_header_footer
-        )
+        return doc
 
+    def _build(self, doc, elements):
+        try:
+            doc.build(
+                elements,
+                onFirstPage=self._add_header_footer,
+                onLaterPages=self._add_header_footer
+            )
+            os.replace(doc.filename, self.filename)
+        finally:
+            if os.path.exists(doc.filename):
+                os.remove(doc.filename)
+
+    def _title_flowables(self):
         elements = []
 
         # Title
@@ -198,59 +504,156 @@ class PDFGenerator:
 
         # Date
         today_str = datetime.today().strftime('%B %d, %Y')
-        date_style = ParagraphStyle(
-            'DateStyle',
-            parent=self.styles['BodyModern'],
-            alignment=TA_CENTER,
-            textColor=self.secondary_color,
-            fontSize=11,
-            spaceAfter=24
-        )
-        elements.append(Paragraph(f"Report Generated: {today_str}", date_style))
+        elements.append(Paragraph(f"Report Generated: {today_str}", self.styles['DateModern']))
+        elements.append(Spacer(1, 12))
+        return elements
+
+    def _section_flowables(self, heading, blocks):
+        elements = [Paragraph(_inline_markup(heading), self.styles['SectionHeader'])]
+
+        for kind, markup, label in blocks:
+            if kind == "bullet":
+                elements.append(Paragraph(markup, self.styles['BulletModern'], bulletText=label))
+            elif kind == "subheading":
+                elements.append(Paragraph(markup, self.styles['SubSectionHeader']))
+            else:
+                elements.append(Paragraph(markup, self.styles['BodyModern']))
+        
         elements.append(Spacer(1, 12))
+        return elements
+
+    def _stats_flowables(self, stats, doc):
+        elements = []
+        elements.append(Paragraph("Key Statistics", self.styles['SectionHeader']))
+        
+        stat_data = [["Metric", "Value"]]
+        for key, value in stats.items():
+            stat_data.append([key, str(value)])
+        
+        stat_table = Table(stat_data, colWidths=[doc.width/2.5, doc.width/2.5])
+        stat_table.setStyle(get_stats_table_style())
+        
+        elements.append(stat_table)
+        elements.append(Spacer(1, 24))
+        return elements
+
+    def _company_flowables(self, companies, doc, rows_per_table=COMPANY_TABLE_ROWS):
+        """
+        List companies (any iterable of dicts, e.g. EntityStore.query()) as a
+        run of LongTables of rows_per_table rows, each built only when the
+        layout reaches it. Every table splits across pages and repeats its
+        header, so thousands of rows never sit in one flowable.
+        """
+        yield Paragraph("Companies", self.styles['SectionHeader'])
+        header = ["Company", "Sector", "Founded", "Website"]
+        widths = [doc.width * 0.32, doc.width * 0.2, doc.width * 0.1, doc.width * 0.38]
+        rows = []
+        for company in companies:
+            rows.append([
+                _cell(company.get("name"), 45),
+                _cell(company.get("sector"), 25),
+                _cell(company.get("founded_year"), 6),
+                _cell(company.get("website"), 55),
+            ])
+            if len(rows) == rows_per_table:
+                yield self._company_table(header, rows, widths)
+                rows = []
+        if rows:
+            yield self._company_table(header, rows, widths)
+        yield Spacer(1, 24)
 
-        # Summary as Sections
-        sections = self._split_summary_into_sections(summary)
-        for heading, content in sections:
-            # Format bullet points
-            content = self._format_bullet_points(content)
-            
-            # Add heading (make sure it's title case)
-            heading = heading.title()
-            elements.append(Paragraph(heading, self.styles['SectionHeader']))
-            
-            # Split content into paragraphs
-            paragraphs = [p.strip() for p in content.split("\n") if p.strip()]
-            for para in paragraphs:
-                if para.startswith("•"):
-                    elements.append(Paragraph(para, self.styles['BulletModern']))
-                else:
-                    elements.append(Paragraph(para, self.styles['BodyModern']))
-            
-            elements.append(Spacer(1, 12))
-
-        # Optional Statistics
+    def _company_table(self, header, rows, widths):
+        table = LongTable([header] + rows, colWidths=widths, repeatRows=1)
+        table.setStyle(get_company_table_style())
+        return table
+
+    def _chart_flowables(self, charts, doc):
+        """
+        Charts may be PNG bytes, file-like buffers, file paths or reportlab
+        Drawings (embedded as vector graphics). Images are decoded as the
+        layout reaches them.
+        """
+        yield Paragraph("Charts", self.styles['SectionHeader'])
+        for chart in charts:
+            if isinstance(chart, Drawing):
+                chart.hAlign = 'CENTER'
+                yield chart
+            else:
+                yield ChartImage(get_image_reader(_chart_bytes(chart)), doc.width * 0.8)
+            yield Spacer(1, 12)
+
+    def _report_flowables(self, sections, doc, stats=None, charts=None, companies=None):
+        yield from self._title_flowables()
+        for heading, blocks in sections:
+            yield from self._section_flowables(heading, blocks)
         if stats:
-            elements.append(Paragraph("Key Statistics", self.styles['SectionHeader']))
-            
-            stat_data = [["Metric", "Value"]]
-            for key, value in stats.items():
-                stat_data.append([key, str(value)])
-            
-            stat_table = Table(stat_data, colWidths=[doc.width/2.5, doc.width/2.5])
-            stat_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(self.primary_color)),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 12),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor(self.light_gray)),
-                ('GRID', (0, 0), (-1, -1), 1, colors.HexColor(self.secondary_color)),
-            ]))
-            
-            elements.append(stat_table)
-            elements.append(Spacer(1, 24))
-
-        doc.build(elements)
-        return self.filename
\ No newline at end of file
+            yield from self._stats_flowables(stats, doc)
+        if companies:
+            yield from self._company_flowables(companies, doc)
+        if charts:
+            yield from self._chart_flowables(charts, doc)
+
+    def create_report(self, summary, filename=None, stats=None, charts=None, companies=None):
+        """
+        Create PDF report with clean headings and professional formatting.
+        Flowables are produced lazily as the layout consumes them, so a long
+        company listing or many charts never exist as flowables all at once.
+        reportlab still keeps the finished pages themselves in memory until
+        the file is saved.
+        :param companies: Optional iterable of company dicts listed in a table.
+        """
+        with tracing.span("pdf.render", streaming=False) as span:
+            doc = self._new_document(filename)
+            flowables = self._report_flowables(parse_summary(summary), doc, stats, charts, companies)
+            self._build(doc, _LazyFlowables(flowables))
+            span.record(bytes_out=os.path.getsize(self.filename))
+            return self.filename
+
+    def create_report_streaming(self, summary_chunks, filename=None, stats=None, charts=None, companies=None):
+        """
+        Create the same report from an iterable of summary text fragments
+        (e.g. Summarizer.stream_market_summary). Each section is laid out as
+        soon as it is complete, while the rest of the summary is still being
+        generated. If summary_chunks raises, the layout is aborted, the
+        previous report at filename is left alone and the error propagates.
+        """
+        with tracing.span("pdf.render", streaming=True) as span:
+            doc = self._new_document(filename)
+            stream = _FlowableStream(max_pending=PREFETCH_FLOWABLES * 4)
+            errors = []
+
+            def build():
+                try:
+                    self._build(doc, stream)
+                except Exception as e:
+                    errors.append(e)
+                    stream.close()  # release a producer blocked on a full stream
+
+            builder = threading.Thread(target=build, name="pdf-build", daemon=True)
+            builder.start()
+            try:
+                stream.put(self._title_flowables())
+                parser = MarkdownSectionParser()
+                for chunk in summary_chunks:
+                    for heading, blocks in parser.feed(chunk):
+                        stream.put(self._section_flowables(heading, blocks))
+                for heading, blocks in parser.close():
+                    stream.put(self._section_flowables(heading, blocks))
+                if stats:
+                    stream.put(self._stats_flowables(stats, doc))
+                if companies:
+                    stream.put(self._company_flowables(companies, doc))
+                if charts:
+                    stream.put(self._chart_flowables(charts, doc))
+            except BaseException:
+                # _build then removes the partial temp file instead of renaming it into place.
+                stream.abort()
+                raise
+            finally:
+                stream.close()
+                builder.join()
+
+            if errors:
+                raise errors[0]
+            span.record(bytes_out=os.path.getsize(self.filename))
+            return self.filename
@@ -0,0 +1,248 @@
+import re
+from typing import Callable, Dict, List, Tuple
+
+import config
+from config import GOOGLE_API_KEY, GOOGLE_CSE_ID
+
+from modules import tracing
+from modules.artifacts import fingerprint, get_artifact_store
+
+# Stage modules are imported inside each stage so that a run only pays for
+# the dependencies it uses (requests, pandas, matplotlib, reportlab, openai).
+# Long-lived workers call prewarm() to load them all up front instead.
+
+
+def slugify(text: str, max_length: int = 60) -> str:
+    """
+    Turn a research goal into a filesystem-friendly slug.
+    """
+    slug = re.sub(r"[^a-z0-9]+", "_", text.lower()).strip("_")
+    return slug[:max_length] or "report"
+
+
+def new_context(goal: str, query: str = None, recipients: List[str] = None,
+                num_results: int = 5) -> Dict:
+    """
+    Build the shared state dict that every stage reads from and writes to.
+    """
+    return {
+        "goal": goal,
+        "query": query or goal,
+        "slug": slugify(goal),
+        "num_results": num_results,
+        "recipients": list(recipients or []),
+    }
+
+
+def plan_stage(ctx: Dict) -> Dict:
+    from modules.planner import Planner
+
+    return {"plan": Planner().create_plan(ctx["goal"])}
+
+
+def research_stage(ctx: Dict) -> Dict:
+    from modules.researcher import Researcher
+
+    researcher = Researcher(api_key=GOOGLE_API_KEY, cse_id=GOOGLE_CSE_ID)
+    return {"raw_results": researcher.search(ctx["query"], num_results=ctx["num_results"])}
+
+
+def enrich_stage(ctx: Dict) -> Dict:
+    """
+    Attach page content to each result when ENRICH_ENABLED is set; otherwise a no-op.
+    """
+    if not config.ENRICH_ENABLED:
+        return {}
+    from modules.enricher import Enricher
+
+    return {"raw_results": Enricher().enrich(ctx["raw_results"])}
+
+
+def extract_stage(ctx: Dict) -> Dict:
+    from modules.entity_store import get_entity_store
+    from modules.summarizer import Summarizer
+
+    return {"structured": Summarizer().extract_structured(ctx["raw_results"], store=get_entity_store())}
+
+
+def dedup_stage(ctx: Dict) -> Dict:
+    """
+    Merge near-duplicate companies so the summary, stats and charts count each once.
+    """
+    from modules.dedup import resolve_entities
+
+    entries = [e for e in ctx["structured"] if isinstance(e, dict)]
+    structured, clusters = resolve_entities(entries)
+    merged = [[entries[i].get("name") for i in members] for members in clusters]
+    return {"structured": structured, "merged_clusters": merged}
+
+
+def summarize_stage(ctx: Dict) -> Dict:
+    from modules.summarizer import Summarizer
+
+    return {"summary": Summarizer().summarize_market(ctx["structured"])}
+
+
+def analyze_stage(ctx: Dict) -> Dict:
+    from modules.analyzer import Analyzer
+
+    analyzer = Analyzer()
+    df = analyzer.to_dataframe(ctx["structured"])
+    stats, charts, *_ = analyzer.basic_stats_and_charts(df, slug=ctx["slug"], in_memory=True)
+    return {"stats": stats, "charts": charts}
+
+
+def report_payload(ctx: Dict) -> Dict:
+    """
+    Everything the PDF renderer needs, in a picklable dict (see RenderService).
+    """
+    # Named by content so concurrent runs never write the same file, and an
+    # unchanged report keeps its path.
+    digest = fingerprint(ctx["summary"], ctx["stats"], ctx.get("charts"), ctx.get("structured"))[:12]
+    return {
+        "summary": ctx["summary"],
+        "filename": f"{ctx['slug']}-{digest}.pdf",
+        "stats": ctx["stats"],
+        "charts": ctx.get("charts"),
+        "companies": ctx.get("structured"),
+    }
+
+
+def render_stage(ctx: Dict) -> Dict:
+    from modules.pdf_generator import PDFGenerator
+
+    payload = report_payload(ctx)
+    pdf_gen = PDFGenerator()
+    pdf_path = pdf_gen.create_report(payload["summary"], payload["filename"], stats=payload["stats"],
+                                     charts=payload["charts"], companies=payload["companies"])
+    return {"pdf_path": pdf_path}
+
+
+def send_stage(ctx: Dict) -> Dict:
+    from modules.email_sender import EmailSender
+
+    # "delivered": recipients an earlier attempt of the same job already reached.
+    recipients = [r for r in ctx["recipients"] if r not in ctx.get("delivered", ())]
+    if not recipients:
+        return {"deliveries": []}
+    email_sender = EmailSender()
+    try:
+        deliveries = email_sender.send_bulk(
+            recipients,
+            subject="Market Research Report",
+            body="Please find attached the market research report.",
+            attachment_path=ctx["pdf_path"]
+        )
+    finally:
+        email_sender.close()
+    return {"deliveries": deliveries}
+
+
+# Ordered (name, callable) pairs; each callable takes the context and returns
+# the keys it adds to it.
+STAGES: List[Tuple[str, Callable[[Dict], Dict]]] = [
+    ("plan", plan_stage),
+    ("research", research_stage),
+    ("enrich", enrich_stage),
+    ("extract", extract_stage),
+    ("dedup", dedup_stage),
+    ("summarize", summarize_stage),
+    ("analyze", analyze_stage),
+    ("render", render_stage),
+    ("send", send_stage),
+]
+
+
+# What each stage's output depends on: context keys, config settings, and the
+# config setting (if any) holding how many seconds the output stays valid.
+# run_stage reuses a stored output while these are unchanged; stages missing
+# here (send) always run.
+STAGE_INPUTS = {
+    "plan": {"keys": ("goal",)},
+    "research": {"keys": ("query", "num_results"), "max_age": "SEARCH_FRESH_TTL"},
+    "enrich": {"keys": ("raw_results",), "settings": ("ENRICH_ENABLED", "ENRICH_TEXT_CHARS")},
+    "extract": {"keys": ("raw_results",), "settings": ("EXTRACT_CHUNK_TOKENS", "EXTRACT_CHUNK_MAX_ITEMS")},
+    "dedup": {"keys": ("structured",)},
+    "summarize": {"keys": ("structured",),
+                  "settings": ("SUMMARY_HIERARCHICAL_THRESHOLD", "SUMMARY_GROUP_SIZE", "SUMMARY_REDUCE_FANIN")},
+    "analyze": {"keys": ("structured",)},
+    "render": {"keys": ("slug", "summary", "stats", "charts", "structured")},
+}
+
+
+# Imported by prewarm(); the stage functions import them on first use.
+STAGE_MODULES = [
+    "modules.planner",
+    "modules.researcher",
+    "modules.enricher",
+    "modules.summarizer",
+    "modules.dedup",
+    "modules.entity_store",
+    "modules.analyzer",
+    "modules.pdf_generator",
+    "modules.email_sender",
+]
+
+
+def prewarm():
+    """
+    Import every stage's dependencies and build the shared, cached objects
+    (OpenAI client, HTTP session, PDF styles, chart backend) so the first
+    goal handled by a long-lived worker does not pay for them.
+    """
+    import importlib
+
+    for name in STAGE_MODULES:
+        importlib.import_module(name)
+    from modules.charts import bar_spec, render_chart
+    from modules.pdf_generator import get_stats_table_style, get_styles
+    from modules.researcher import get_session
+
+    config.ensure_dirs()
+    getattr(config, "client")
+    get_session()
+    get_styles()
+    get_stats_table_style()
+    render_chart(bar_spec("warm-up", {"warm-up": 1}))
+
+
+def stage_key(name: str, ctx: Dict, store) -> str:
+    """
+    Artifact key of a stage's output: a hash of the inputs listed in STAGE_INPUTS.
+    """
+    inputs = STAGE_INPUTS[name]
+    values = {key: ctx.get(key) for key in inputs["keys"]}
+    values.update({setting: getattr(config, setting) for setting in inputs.get("settings", ())})
+    return store.key(name, values)
+
+
+def run_stage(name: str, stage: Callable[[Dict], Dict], ctx: Dict) -> Dict:
+    """
+    Run one stage inside a "stage.<name>" span; the span picks up the tokens,
+    bytes and cache hits of every call the stage makes. When the artifact
+    store holds an output for the stage's current inputs, that output is
+    returned instead and the stage does not run.
+    """
+    with tracing.span(f"stage.{name}", goal=ctx["slug"]) as span:
+        store = get_artifact_store() if name in STAGE_INPUTS else None
+        if store is None:
+            return stage(ctx)
+
+        key = stage_key(name, ctx, store)
+        max_age = STAGE_INPUTS[name].get("max_age")
+        output = store.get(key, max_age=getattr(config, max_age) if max_age else None)
+        span.set(artifact=key[:12], reused=output is not None)
+        if output is None:
+            output = stage(ctx)
+            store.put(key, name, output)
+        return output
+
+
+def run_pipeline(ctx: Dict) -> Dict:
+    """
+    Run every stage in order for a single goal, synchronously.
+    """
+    with tracing.span("pipeline", goal=ctx["slug"]):
+        for name, stage in STAGES:
+            ctx.update(run_stage(name, stage, ctx))
+    return ctx
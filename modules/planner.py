@@ -1,8 +1,10 @@
-from config import client
+from modules import tracing
+from modules.llm_cache import chat_completion
 
 class Planner:
+    @tracing.traced("planner.plan")
     def create_plan(self, goal):
-        resp = client.chat.completions.create(
+        return chat_completion(
             model="gpt-4o-mini",  # You can change model here
             messages=[
                 {"role": "system", "content": "You are a market research planner that creates step-by-step research plans."},
@@ -10,4 +12,3 @@ class Planner:
             ],
             temperature=0.7
         )
-        return resp.choices[0].message.content
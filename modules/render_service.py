@@ -0,0 +1,68 @@
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+# Per-process generator, created once by the pool initializer.
+_generator = None
+
+
+def _init_worker():
+    """
+    Build styles, table styles and the header/footer callbacks once per
+    worker process so each render only lays out its own content.
+    """
+    global _generator
+    from modules.pdf_generator import PDFGenerator, get_stats_table_style, get_styles
+
+    get_styles()
+    get_stats_table_style()
+    _generator = PDFGenerator()
+
+
+def render_payload(payload: Dict) -> str:
+    """
+    Render one report payload and return the absolute PDF path.
+    Payload keys: summary, filename, and optionally stats, charts and companies.
+    """
+    from modules.pdf_generator import PDFGenerator
+
+    generator = _generator or PDFGenerator()
+    path = generator.create_report(
+        payload["summary"],
+        payload.get("filename"),
+        stats=payload.get("stats"),
+        charts=payload.get("charts"),
+        companies=payload.get("companies"),
+    )
+    return os.path.abspath(path)
+
+
+class RenderService:
+    def __init__(self, max_workers: Optional[int] = None):
+        """
+        Render PDFs on a pool of worker processes so throughput scales with cores.
+        :param max_workers: Worker processes, defaults to the CPU count.
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._pool = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker)
+
+    def submit(self, payload: Dict) -> Future:
+        return self._pool.submit(render_payload, payload)
+
+    def render(self, payload: Dict) -> str:
+        return self.submit(payload).result()
+
+    def render_many(self, payloads: List[Dict]) -> List[str]:
+        """
+        Render every payload, returning PDF paths in the same order.
+        """
+        return list(self._pool.map(render_payload, payloads))
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,45 +1,162 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+
 import requests
+from requests.adapters import HTTPAdapter
+
+from modules import tracing
+from modules.search_cache import get_search_cache
 #from config import GOOGLE_API_KEY, GOOGLE_CSE_ID
 #from .summarizer import Summarizer
 
+SEARCH_URL = "https://www.googleapis.com/customsearch/v1"
+PAGE_SIZE = 10  # API limit per request
+MAX_RESULTS = 100  # CSE never returns results past start=91
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session(pool_size: int = 10) -> requests.Session:
+    """
+    Shared keep-alive session so every search reuses the same connection pool.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+
+def _retry_after_seconds(value):
+    """
+    Seconds to wait from a Retry-After header, given as seconds or an HTTP-date; None if absent or malformed.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if when is None or when.tzinfo is None:
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
 
 class Researcher:
-    def __init__(self, api_key: str, cse_id: str):
+    def __init__(self, api_key: str, cse_id: str, max_workers: int = 5, max_retries: int = 4,
+                 backoff: float = 0.5, max_backoff: float = 60.0, timeout: float = 15, use_cache: bool = True):
         """
         Initialize the Researcher with Google Custom Search API credentials.
         :param api_key: Google API key.
         :param cse_id: Custom Search Engine ID.
+        :param max_workers: Result pages fetched concurrently.
+        :param max_retries: Retries per page on 429/5xx and connection errors.
+        :param backoff: Base delay in seconds for exponential backoff.
+        :param max_backoff: Longest wait between retries, also capping a server's Retry-After.
+        :param timeout: Per-request timeout in seconds.
+        :param use_cache: Serve repeated queries from the local search cache.
         """
         self.api_key = api_key
         self.cse_id = cse_id
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.session = get_session()
+        self.cache = get_search_cache() if use_cache else None
 
-    def search(self, query: str, num_results: int = 10):
-        """
-        Search Google using the Custom Search JSON API.
-        :param query: Search query string.
-        :param num_results: Number of results to fetch (max 10 per API call).
-        :return: List of search result dicts.
-        """
-        url = "https://www.googleapis.com/customsearch/v1"
+    def _retry_delay(self, attempt: int, response=None) -> float:
+        if response is not None:
+            retry_after = _retry_after_seconds(response.headers.get("Retry-After"))
+            if retry_after is not None:
+                return min(self.max_backoff, retry_after)
+        return min(self.max_backoff, self.backoff * (2 ** attempt) * (0.5 + random.random()))
+
+    def _fetch_page(self, query: str, start: int, num: int) -> dict:
         params = {
             "key": self.api_key,
             "cx": self.cse_id,
             "q": query,
-            "num": min(num_results, 10)  # API limit per request
+            "num": num,
+            "start": start,
         }
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        results = response.json()
+        with tracing.span("search.page", start=start, num=num) as span:
+            for attempt in range(self.max_retries + 1):
+                span.set(attempts=attempt + 1)
+                try:
+                    response = self.session.get(SEARCH_URL, params=params, timeout=self.timeout)
+                except (requests.ConnectionError, requests.Timeout):
+                    if attempt == self.max_retries:
+                        raise
+                    time.sleep(self._retry_delay(attempt))
+                    continue
+
+                span.record(bytes_in=len(response.content))
+                if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                    time.sleep(self._retry_delay(attempt, response))
+                    continue
+                response.raise_for_status()
+                return response.json()
+
+    def search(self, query: str, num_results: int = 10, max_age: float = None):
+        """
+        Search Google using the Custom Search JSON API.
+        Results beyond the first 10 are paged through the `start` parameter
+        and fetched concurrently; links are de-duplicated across pages.
+        :param query: Search query string.
+        :param num_results: Number of results to fetch (up to 100).
+        :param max_age: Seconds a cached result for this query counts as fresh.
+        :return: List of search result dicts.
+        """
+        num_results = max(1, min(num_results, MAX_RESULTS))
+        with tracing.span("search", num_results=num_results):
+            if self.cache is None:
+                return self._search_live(query, num_results)
+            return self.cache.get_or_fetch(
+                query, self.cse_id, num_results,
+                lambda: self._search_live(query, num_results),
+                max_age=max_age,
+            )
+
+    def _search_live(self, query: str, num_results: int):
+        pages = [
+            (start, min(PAGE_SIZE, num_results - start + 1))
+            for start in range(1, num_results + 1, PAGE_SIZE)
+        ]
+
+        if len(pages) == 1:
+            responses = [self._fetch_page(query, *pages[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(pages))) as executor:
+                fetch = tracing.propagate(lambda page: self._fetch_page(query, *page))
+                responses = list(executor.map(fetch, pages))
 
         items = []
-        if "items" in results:
-            for item in results["items"]:
+        seen = set()
+        for results in responses:
+            for item in results.get("items", []):
+                link = item.get("link")
+                if link in seen:
+                    continue
+                seen.add(link)
                 items.append({
                     "title": item.get("title"),
-                    "link": item.get("link"),
+                    "link": link,
                     "snippet": item.get("snippet")
                 })
-        return items
+        return items[:num_results]
 
 # testing the files here 
 """ if __name__ == "__main__":
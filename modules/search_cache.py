@@ -0,0 +1,178 @@
+import atexit
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from typing import Callable, Dict, List, Optional
+
+import config
+from modules import tracing
+
+_TOKEN_RE = re.compile(r"[^\w]+", re.UNICODE)
+
+
+def normalize_query(query: str) -> str:
+    """
+    Collapse case, punctuation, whitespace and word order so trivially
+    different phrasings of the same query share one cache entry.
+    """
+    text = unicodedata.normalize("NFKC", query).casefold()
+    tokens = [t for t in _TOKEN_RE.split(text) if t]
+    return " ".join(sorted(tokens))
+
+
+class SearchCache:
+    def __init__(self, directory: str, fresh_ttl: float = 24 * 3600, stale_ttl: float = 7 * 24 * 3600,
+                 offline: bool = False):
+        """
+        File-backed cache of search results, one JSON file per normalized query.
+        :param directory: Root of the store; doubles as a recorded fixture set.
+        :param fresh_ttl: Seconds an entry is served without revalidation.
+        :param stale_ttl: Seconds a stale entry may still be served while it is refreshed in the background.
+        :param offline: Never touch the network; serve any recorded entry regardless of age.
+        """
+        self.directory = directory
+        self.fresh_ttl = fresh_ttl
+        self.stale_ttl = stale_ttl
+        self.offline = offline
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refresh_errors = 0
+        self._refreshing = {}
+        self._lock = threading.Lock()
+
+    def key(self, query: str, cx: str, num: int) -> str:
+        payload = json.dumps([normalize_query(query), cx, num], separators=(",", ":"))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def load(self, key: str) -> Optional[Dict]:
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def store(self, key: str, query: str, cx: str, num: int, items: List[Dict]):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        entry = {
+            "query": query,
+            "normalized": normalize_query(query),
+            "cx": cx,
+            "num": num,
+            "fetched_at": time.time(),
+            "items": items,
+        }
+        # Write then rename so concurrent readers never see a partial file.
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, path)
+
+    def _refresh(self, key: str, query: str, cx: str, num: int, fetch: Callable[[], List[Dict]]):
+        try:
+            # The span records the failure; the stale entry keeps being served until a refresh succeeds.
+            with tracing.span("search.refresh", query=query):
+                self.store(key, query, cx, num, fetch())
+        except Exception:
+            with self._lock:
+                self.refresh_errors += 1
+        finally:
+            with self._lock:
+                self._refreshing.pop(key, None)
+
+    def join(self, timeout: float):
+        """
+        Wait up to timeout seconds in total for pending background refreshes.
+        """
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            threads = list(self._refreshing.values())
+        for thread in threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+
+    def get_or_fetch(self, query: str, cx: str, num: int, fetch: Callable[[], List[Dict]],
+                     max_age: Optional[float] = None) -> List[Dict]:
+        """
+        Return cached items for the query, fetching or revalidating as the
+        freshness policy requires.
+        :param max_age: Per-query override of fresh_ttl in seconds.
+        """
+        key = self.key(query, cx, num)
+        entry = self.load(key)
+
+        if self.offline:
+            if entry is None:
+                with self._lock:
+                    self.misses += 1
+                raise LookupError(f"No recorded search results for '{query}' (offline mode)")
+            with self._lock:
+                self.hits += 1
+            tracing.record(cache_hits=1)
+            return entry["items"]
+
+        fresh_ttl = self.fresh_ttl if max_age is None else max_age
+        age = time.time() - entry["fetched_at"] if entry else None
+
+        if entry is not None and age <= fresh_ttl:
+            with self._lock:
+                self.hits += 1
+            tracing.record(cache_hits=1)
+            return entry["items"]
+
+        if entry is not None and age <= max(self.stale_ttl, fresh_ttl):
+            with self._lock:
+                self.stale_hits += 1
+                thread = None
+                if key not in self._refreshing:
+                    thread = threading.Thread(
+                        target=self._refresh, args=(key, query, cx, num, fetch), daemon=True
+                    )
+                    self._refreshing[key] = thread
+            if thread is not None:
+                thread.start()
+            tracing.record(cache_hits=1)
+            return entry["items"]
+
+        with self._lock:
+            self.misses += 1
+        tracing.record(cache_misses=1)
+        items = fetch()
+        self.store(key, query, cx, num, items)
+        return items
+
+    def stats(self) -> Dict:
+        return {"hits": self.hits, "stale_hits": self.stale_hits, "misses": self.misses,
+                "refresh_errors": self.refresh_errors}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def _join_refreshes():
+    # Refresh threads are daemons so a hung fetch cannot block exit; give them a bounded grace period instead.
+    if _cache is not None:
+        _cache.join(config.SEARCH_REFRESH_JOIN_TIMEOUT)
+
+
+def get_search_cache() -> Optional[SearchCache]:
+    """
+    Return the process-wide search cache, or None when caching is disabled.
+    """
+    global _cache
+    if not config.SEARCH_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = SearchCache(config.SEARCH_CACHE_DIR, fresh_ttl=config.SEARCH_FRESH_TTL,
+                                 stale_ttl=config.SEARCH_STALE_TTL, offline=config.SEARCH_OFFLINE)
+            atexit.register(_join_refreshes)
+        return _cache
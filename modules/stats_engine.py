@@ -0,0 +1,181 @@
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+UNKNOWN = "Unknown"
+# Founding years outside this range are treated as unknown (bad extractions).
+YEAR_RANGE = (1800, 2100)
+
+
+def _normalize_sector(series: pd.Series) -> pd.Series:
+    """
+    Categorical sector column with normalized labels. Normalization runs on
+    the (few) distinct categories, then row codes are remapped in one
+    vectorized step. An already-normalized categorical is returned as is.
+    """
+    cat = series if isinstance(series.dtype, pd.CategoricalDtype) else series.astype("category")
+    codes = cat.cat.codes.to_numpy()
+    categories = cat.cat.categories
+    cleaned = pd.Index(categories.astype(str).str.strip().str.title())
+    cleaned = cleaned.where(cleaned != "", UNKNOWN)
+    if cleaned.equals(categories) and UNKNOWN in categories and not (codes < 0).any():
+        return cat
+
+    labels = pd.Index(list(dict.fromkeys(cleaned.tolist() + [UNKNOWN])))
+    unknown_code = labels.get_loc(UNKNOWN)
+    if len(cleaned):
+        new_codes = np.where(codes >= 0, labels.get_indexer(cleaned)[codes], unknown_code)
+    else:
+        new_codes = np.full(len(codes), unknown_code)
+    return pd.Series(pd.Categorical.from_codes(new_codes, categories=labels), index=series.index, name=series.name)
+
+
+def describe_counts(values, counts) -> Dict:
+    """
+    Series.describe() for a value -> frequency table, with the same linearly
+    interpolated quantiles as on the expanded series.
+    """
+    values = np.asarray(values, dtype=float)
+    counts = np.asarray(counts, dtype=float)
+    present = counts > 0
+    values, counts = values[present], counts[present]
+    order = np.argsort(values, kind="stable")
+    values, counts = values[order], counts[order]
+    total = counts.sum()
+    mean = (values * counts).sum() / total
+    std = np.sqrt((counts * (values - mean) ** 2).sum() / (total - 1)) if total > 1 else float('nan')
+    cumulative = counts.cumsum()
+
+    def at(rank):
+        # Value at a 0-based rank of the expanded, sorted series
+        return values[np.searchsorted(cumulative, rank, side='right')]
+
+    def quantile(q):
+        position = (total - 1) * q
+        lower = np.floor(position)
+        below, above = at(lower), at(min(lower + 1, total - 1))
+        return float(below + (position - lower) * (above - below))
+
+    return {
+        'count': float(total), 'mean': float(mean), 'std': float(std), 'min': float(values.min()),
+        '25%': quantile(0.25), '50%': quantile(0.5), '75%': quantile(0.75), 'max': float(values.max()),
+    }
+
+
+def prepare_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Return a frame whose sector is a normalized categorical and whose
+    founded_year is nullable Int64. The input is never modified, other
+    columns are shared, and already-typed columns are left as they are.
+    """
+    updates = {}
+    if 'sector' in df.columns:
+        column = df['sector']
+        sector = _normalize_sector(column)
+        if sector is not column:
+            updates['sector'] = sector
+    if 'founded_year' in df.columns and df['founded_year'].dtype != "Int64":
+        updates['founded_year'] = pd.to_numeric(df['founded_year'], errors='coerce').round().astype("Int64")
+    return df.assign(**updates) if updates else df
+
+
+def compute_stats(df: pd.DataFrame, bucket_size: int = 5, detail: bool = True) -> Dict:
+    """
+    Compute the full stat set from one sector x founding-year count matrix.
+    The rows are scanned once (a single bincount); sector counts, cohorts,
+    founding-year buckets, growth over time and cross-tabs are all derived
+    from that matrix.
+    :param detail: Also derive sector cohorts, founding-year buckets and the
+                   sector x bucket cross-tab; without it only the counts, the
+                   founding-year summary and growth over time are returned.
+    """
+    df = prepare_frame(df)
+    total = len(df)
+    stats = {'total_companies': total}
+
+    if 'sector' in df.columns:
+        sector = df['sector']
+        sector_codes = sector.cat.codes.to_numpy()
+        sector_labels = list(sector.cat.categories)
+    else:
+        sector_codes = np.zeros(total, dtype=np.int64)
+        sector_labels = [UNKNOWN]
+
+    if 'founded_year' in df.columns:
+        years = df['founded_year']
+        year_values = years.to_numpy(dtype="float64", na_value=np.nan)
+        # NaN compares False, so missing years drop out here too
+        known = (year_values >= YEAR_RANGE[0]) & (year_values <= YEAR_RANGE[1])
+    else:
+        known = np.zeros(total, dtype=bool)
+        year_values = np.full(total, np.nan)
+
+    if known.any():
+        first_year = int(year_values[known].min())
+        last_year = int(year_values[known].max())
+    else:
+        first_year = last_year = 0
+    n_years = last_year - first_year + 1
+    n_sectors = len(sector_labels)
+
+    # Column n_years collects rows with an unknown founding year.
+    year_idx = np.where(known, np.nan_to_num(year_values) - first_year, n_years).astype(np.int64)
+    flat = sector_codes.astype(np.int64) * (n_years + 1) + year_idx
+    matrix = np.bincount(flat, minlength=n_sectors * (n_years + 1)).reshape(n_sectors, n_years + 1)
+
+    year_axis = np.arange(first_year, last_year + 1)
+    dated = matrix[:, :n_years]
+    sector_totals = matrix.sum(axis=1)
+    year_totals = dated.sum(axis=0)
+
+    order = np.argsort(-sector_totals, kind="stable")
+    sector_counts = {sector_labels[i]: int(sector_totals[i]) for i in order if sector_totals[i]}
+    stats['sector_counts'] = sector_counts
+    stats['unique_sectors'] = len(sector_counts)
+
+    if not known.any():
+        return stats
+
+    stats['founded_year_summary'] = describe_counts(year_axis, year_totals)
+
+    # Growth over time: companies founded per year and running total
+    cumulative_founded = year_totals.cumsum()
+    stats['growth_over_time'] = {
+        int(year): {'founded': int(n), 'cumulative': int(c)}
+        for year, n, c in zip(year_axis, year_totals, cumulative_founded) if n
+    }
+
+    if not detail:
+        return stats
+
+    # Per-sector cohorts
+    dated_totals = dated.sum(axis=1)
+    cumulative_rows = dated.cumsum(axis=1)
+    cohorts = {}
+    for i in order:
+        if not sector_totals[i]:
+            continue
+        cohort = {'count': int(sector_totals[i]), 'share': float(sector_totals[i] / total)}
+        if dated_totals[i]:
+            present = np.nonzero(dated[i])[0]
+            cohort['first_founded'] = int(year_axis[present[0]])
+            cohort['last_founded'] = int(year_axis[present[-1]])
+            cohort['median_founded'] = int(year_axis[np.argmax(cumulative_rows[i] >= 0.5 * dated_totals[i])])
+        cohorts[sector_labels[i]] = cohort
+    stats['sector_cohorts'] = cohorts
+
+    # Founding-year buckets and sector x bucket cross-tab
+    bucket_starts = (year_axis // bucket_size) * bucket_size
+    unique_starts, bucket_of_year = np.unique(bucket_starts, return_inverse=True)
+    bucket_labels = [f"{s}-{s + bucket_size - 1}" for s in unique_starts]
+    by_bucket = np.zeros((n_sectors, len(unique_starts)), dtype=np.int64)
+    np.add.at(by_bucket.T, bucket_of_year, dated.T)
+    bucket_totals = by_bucket.sum(axis=0)
+    stats['founded_buckets'] = {label: int(n) for label, n in zip(bucket_labels, bucket_totals) if n}
+    stats['sector_by_bucket'] = {
+        sector_labels[i]: {label: int(n) for label, n in zip(bucket_labels, by_bucket[i]) if n}
+        for i in order if dated_totals[i]
+    }
+
+    return stats
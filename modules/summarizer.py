@@ -1,62 +1,286 @@
-from typing import List, Dict
-from config import client
+from typing import List, Dict, Iterator, Optional
+from concurrent.futures import ThreadPoolExecutor
+import config
+from config import (
+    EXTRACT_CHUNK_TOKENS, EXTRACT_CHUNK_MAX_ITEMS, EXTRACT_MAX_TOKENS, EXTRACT_MAX_WORKERS,
+    SUMMARY_GROUP_SIZE, SUMMARY_HIERARCHICAL_THRESHOLD, SUMMARY_REDUCE_FANIN,
+)
+from modules import llm_cache, llm_scheduler, tracing
+from modules.llm_cache import chat_completion, stream_chat_completion
+from modules.llm_scheduler import estimate_tokens
+from modules.normalize import company_website, normalize_name, normalize_website
 import json
+import math
+import zlib
+
+EXTRACT_PROMPT = (
+    "Extract JSON objects for each of the following search results. "
+    "For each result return: result (the Result number it came from), name, description, "
+    "sector (if known), founded_year (if known), website, notes. If unknown use null. "
+    "Return only a JSON array, no extra text.\n\nResults:\n"
+)
+
+
+GROUP_PROMPT = (
+    "Summarize this group of companies in the {group} sector for a market research report. "
+    "Cover the key players, what they do, founding trends and anything notable. "
+    "Be concise and factual.\n\n"
+)
+
+REDUCE_PROMPT = (
+    "Combine these partial market research summaries into one concise summary "
+    "that keeps the key players, trends and notable facts of each part.\n\n"
+)
+
+FINAL_PROMPT = (
+    "Write a professional market research summary using these sector summaries. "
+    "Highlight trends, notable companies, and quick recommendations.\n\n"
+)
+
+class _Placeholders(list):
+    """
+    Entries copied from the search results when extraction failed. They are
+    reported but never stored, so their links are extracted again next run.
+    """
 
 
 class Summarizer:
-    def __init__(self, model: str = "gpt-4o-mini"):
+    def __init__(self, model: str = "gpt-4o-mini", max_workers: int = EXTRACT_MAX_WORKERS,
+                 chunk_tokens: int = EXTRACT_CHUNK_TOKENS, chunk_max_items: int = EXTRACT_CHUNK_MAX_ITEMS):
         self.model = model
+        self.max_workers = max_workers
+        self.chunk_tokens = chunk_tokens
+        self.chunk_max_items = chunk_max_items
 
-    def extract_structured(self, raw_results: List[Dict]) -> List[Dict]:
-        """
-        Extract structured JSON data (name, description, sector, founded_year, website, notes)
-        from raw Google CSE search results using the AI model.
-        """
-        content = (
-            "Extract JSON objects for each of the following search results. "
-            "For each result return: name, description, sector (if known), founded_year (if known), "
-            "website, notes. If unknown use null. Return only a JSON array, no extra text.\n\nResults:\n"
+    def _format_result(self, r: Dict, number: int = None) -> str:
+        text = (
+            f"- Title: {r.get('title')}\n"
+            f"  Snippet: {r.get('snippet')}\n"
+            f"  Link: {r.get('link')}\n"
         )
+        if number is not None:
+            text += f"  Result: {number}\n"
+        page = r.get("page")
+        if page:
+            # Added by Enricher: facts from the linked page itself
+            if page.get("title"):
+                text += f"  Page title: {page['title']}\n"
+            for name, value in page.get("meta", {}).items():
+                text += f"  Page {name}: {value}\n"
+            if page.get("text"):
+                text += f"  Page text: {page['text']}\n"
+        return text + "\n"
 
+    def _chunk_results(self, raw_results: List[Dict]) -> List[List[Dict]]:
+        """
+        Pack results into chunks that fit the prompt token budget and whose
+        JSON answer fits comfortably inside max_tokens.
+        """
+        chunks, current, used = [], [], 0
         for r in raw_results:
-            content += (
-                f"- Title: {r.get('title')}\n"
-                f"  Snippet: {r.get('snippet')}\n"
-                f"  Link: {r.get('link')}\n\n"
-            )
-
-        resp = client.chat.completions.create(
-            model=self.model,
-            messages=[{"role": "user", "content": content}],
-            max_tokens=800,
-            temperature=0.0,
-        )
-
-        text = resp.choices[0].message.content.strip()
+            cost = estimate_tokens(self._format_result(r))
+            if current and (used + cost > self.chunk_tokens or len(current) >= self.chunk_max_items):
+                chunks.append(current)
+                current, used = [], 0
+            current.append(r)
+            used += cost
+        if current:
+            chunks.append(current)
+        return chunks
 
+    def _parse_entries(self, text: str):
         # Robust JSON extraction
         try:
             start = text.find("[")
             end = text.rfind("]") + 1
             return json.loads(text[start:end])
         except Exception:
-            # Fallback to basic mapping if AI output is not valid JSON
-            return [
-                {
-                    "name": r.get("title"),
-                    "description": r.get("snippet"),
-                    "sector": None,
-                    "founded_year": None,
-                    "website": r.get("link"),
-                    "notes": "",
-                }
-                for r in raw_results
-            ]
+            return None
 
-    def summarize_market(self, structured_list: List[Dict]) -> str:
+    def _extract_chunk(self, raw_results: List[Dict]) -> List[Dict]:
         """
-        Produce a textual market research summary from structured data.
+        Extract one chunk. During bulk runs a small chunk is handed to the
+        shared extraction batcher, so small chunks from concurrent goals
+        share one LLM call (see _extract_batch), unless the cache already
+        holds the chunk's own answer.
+        """
+        if config.LLM_BATCH_WINDOW > 0 and llm_scheduler.current_priority() == llm_scheduler.BULK:
+            cost = sum(estimate_tokens(self._format_result(r)) for r in raw_results)
+            if cost < self.chunk_tokens // 2 and len(raw_results) < self.chunk_max_items:
+                cached = llm_cache.cached_completion(**self._extract_request(raw_results))
+                entries = self._parse_entries(cached) if cached is not None else None
+                if isinstance(entries, list):
+                    return entries
+                # _extract_batch depends on the model and the chunk settings, so they are part of the key.
+                batcher = llm_scheduler.get_batcher(
+                    ("extract", type(self), self.model, self.chunk_tokens, self.chunk_max_items), self._extract_batch
+                )
+                return batcher.submit(raw_results, items=len(raw_results),
+                                      tokens=self._answer_tokens(len(raw_results)))
+        return self._extract_single(raw_results)
+
+    def _answer_tokens(self, results: int) -> int:
+        """
+        Completion budget for extracting this many results at the rate of one
+        full chunk per EXTRACT_MAX_TOKENS.
+        """
+        return math.ceil(EXTRACT_MAX_TOKENS * results / self.chunk_max_items)
+
+    def _extract_request(self, raw_results: List[Dict]) -> Dict:
+        content = EXTRACT_PROMPT + "".join(self._format_result(r, n) for n, r in enumerate(raw_results, 1))
+        return {"model": self.model, "messages": [{"role": "user", "content": content}],
+                "max_tokens": EXTRACT_MAX_TOKENS, "temperature": 0.0}
+
+    def _extract_single(self, raw_results: List[Dict]) -> List[Dict]:
+        """
+        Extract one chunk with its own call. Entries keep the "result" number
+        (within the chunk) the model tagged them with.
+        """
+        request = self._extract_request(raw_results)
+
+        text = chat_completion(**request).strip()
+
+        entries = self._parse_entries(text)
+        if isinstance(entries, list):
+            return entries
+        llm_cache.invalidate(**request)
+        # Fallback to basic mapping if AI output is not valid JSON
+        return _Placeholders(
+            {
+                "result": n,
+                "name": r.get("title"),
+                "description": r.get("snippet"),
+                "sector": None,
+                "founded_year": None,
+                "website": r.get("link"),
+                "notes": "",
+            }
+            for n, r in enumerate(raw_results, 1)
+        )
+
+    def _extract_batch(self, chunks: List[List[Dict]]) -> List[List[Dict]]:
+        """
+        Extract several small chunks with one call. Results are numbered and
+        the model tags each object with its result number, which routes it
+        back to its chunk (renumbered within the chunk). A chunk whose
+        results all came back is cached as the answer to its own request;
+        a chunk with an untagged or missing result is extracted on its own.
+        """
+        if len(chunks) == 1:
+            return [self._extract_single(chunks[0])]
+
+        owner = [(i, n) for i, chunk in enumerate(chunks) for n in range(1, len(chunk) + 1)]
+        results = [r for chunk in chunks for r in chunk]
+        content = EXTRACT_PROMPT + "".join(self._format_result(r, n) for n, r in enumerate(results, 1))
+        request = {"model": self.model, "messages": [{"role": "user", "content": content}],
+                   "max_tokens": max(EXTRACT_MAX_TOKENS, self._answer_tokens(len(results))), "temperature": 0.0}
+        text = chat_completion(**request).strip()
+
+        entries = self._parse_entries(text)
+        split = [[] for _ in chunks]
+        try:
+            for entry in entries:
+                number = int(entry["result"])
+                if not 1 <= number <= len(results):
+                    raise ValueError(number)
+                index, entry["result"] = owner[number - 1]
+                split[index].append(entry)
+        except (TypeError, ValueError, KeyError, AttributeError):
+            llm_cache.invalidate(**request)
+            return [self._extract_single(chunk) for chunk in chunks]
+
+        extracted = []
+        for chunk, chunk_entries in zip(chunks, split):
+            if {entry["result"] for entry in chunk_entries} != set(range(1, len(chunk) + 1)):
+                extracted.append(self._extract_single(chunk))
+                continue
+            llm_cache.store_completion(**self._extract_request(chunk), content=json.dumps(chunk_entries))
+            extracted.append(chunk_entries)
+        return extracted
+
+    def _pop_origin(self, chunk: List[Dict], entry) -> Optional[str]:
+        """
+        Remove the "result" tag from an extracted entry and return the link
+        of the result it names, or None.
+        """
+        if not isinstance(entry, dict):
+            return None
+        try:
+            number = int(entry.pop("result", None))
+        except (TypeError, ValueError):
+            return None
+        return chunk[number - 1].get("link") if 1 <= number <= len(chunk) else None
+
+    def _merge_entries(self, entries: List[Dict]) -> List[Dict]:
+        """
+        De-duplicate entries by company website or normalized name, filling
+        missing fields of the first occurrence from later ones. Article links
+        (see company_website) never merge entries, so fallback entries and
+        companies cited from the same publisher stay apart.
+        """
+        merged = []
+        by_website, by_name = {}, {}
+        for entry in entries:
+            if not isinstance(entry, dict):
+                continue
+            website = company_website(entry.get("website"))
+            name = normalize_name(entry.get("name"))
+            index = by_website.get(website) if website else None
+            if index is None and name:
+                index = by_name.get(name)
+
+            if index is None:
+                index = len(merged)
+                merged.append(dict(entry))
+            else:
+                target = merged[index]
+                for field, value in entry.items():
+                    if target.get(field) in (None, "") and value not in (None, ""):
+                        target[field] = value
+
+            if website:
+                by_website.setdefault(website, index)
+            if name:
+                by_name.setdefault(name, index)
+        return merged
+
+    def extract_structured(self, raw_results: List[Dict], store=None) -> List[Dict]:
+        """
+        Extract structured JSON data (name, description, sector, founded_year, website, notes)
+        from raw Google CSE search results using the AI model.
+        Results are split into token-budgeted chunks that are extracted
+        concurrently, then merged and de-duplicated.
+        With an EntityStore, only links the store has not seen are sent to the
+        model; known links contribute their stored entities instead. Each new
+        entity is tied to the result it was extracted from; placeholders for a
+        failed extraction are returned but not stored.
         """
+        with tracing.span("summarizer.extract", results=len(raw_results)):
+            known = []
+            if store is not None:
+                seen = store.seen_links(r.get("link") for r in raw_results)
+                known = store.entities_for_links(seen)
+                raw_results = [r for r in raw_results if r.get("link") not in seen]
+
+            chunks = self._chunk_results(raw_results)
+            if len(chunks) <= 1:
+                extracted = [self._extract_chunk(c) for c in chunks]
+            else:
+                with ThreadPoolExecutor(max_workers=min(self.max_workers, len(chunks))) as executor:
+                    extracted = list(executor.map(tracing.propagate(self._extract_chunk), chunks))
+
+            origins = [[self._pop_origin(chunk, entry) for entry in entries]
+                       for chunk, entries in zip(chunks, extracted)]
+            if store is not None:
+                for chunk, entries, entry_origins in zip(chunks, extracted, origins):
+                    if isinstance(entries, _Placeholders):
+                        continue
+                    links = [r.get("link") for r in chunk if r.get("link")]
+                    store.upsert(entries, source=f"extract:{self.model}", links=links, origins=entry_origins)
+
+            return self._merge_entries(known + [entry for chunk in extracted for entry in chunk])
+
+    def _market_prompt(self, structured_list: List[Dict]) -> str:
         text = "\n".join(
             [
                 f"Name: {s.get('name')}, Sector: {s.get('sector')}, Founded: {s.get('founded_year')} -- {s.get('description')}"
@@ -64,16 +288,141 @@ class Summarizer:
             ]
         )
 
-        prompt = (
+        return (
             "Write a professional market research summary using these entries. "
             "Highlight trends, notable companies, and quick recommendations.\n\n" + text
         )
 
-        resp = client.chat.completions.create(
+    def summarize_market(self, structured_list: List[Dict]) -> str:
+        """
+        Produce a textual market research summary from structured data.
+        Large entity sets are summarized hierarchically (see summarize_market_hierarchical).
+        """
+        with tracing.span("summarizer.summarize", entries=len(structured_list)):
+            if len(structured_list) > SUMMARY_HIERARCHICAL_THRESHOLD:
+                return self.summarize_market_hierarchical(structured_list)
+            return chat_completion(
+                model=self.model,
+                messages=[{"role": "user", "content": self._market_prompt(structured_list)}],
+                max_tokens=700,
+                temperature=0.2,
+            )
+
+    def stream_market_summary(self, structured_list: List[Dict]) -> Iterator[str]:
+        """
+        Same as summarize_market, but yield text fragments as the model
+        generates them (see PDFGenerator.create_report_streaming).
+        """
+        # Not made current: the consumer runs between yields, outside this span.
+        span = tracing.get_tracer().start_span("summarizer.stream", entries=len(structured_list))
+        error = None
+        try:
+            if len(structured_list) > SUMMARY_HIERARCHICAL_THRESHOLD:
+                prompt = self._final_prompt(self._map_reduce_partials(structured_list))
+            else:
+                prompt = self._market_prompt(structured_list)
+            yield from stream_chat_completion(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=700,
+                temperature=0.2,
+            )
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            span.end(error=None if isinstance(error, GeneratorExit) else error)
+
+    def _group_entries(self, structured_list: List[Dict], group_by: str) -> Dict[str, List[Dict]]:
+        """
+        Group entries by a field and split large groups into parts of at most
+        SUMMARY_GROUP_SIZE. Parts are hash buckets of the normalized name, so
+        a new company only changes the part it lands in, and entries are
+        sorted so an unchanged part always yields the same prompt.
+        """
+        groups = {}
+        for entry in structured_list:
+            group = str(entry.get(group_by) or "Unknown").strip().title() or "Unknown"
+            groups.setdefault(group, []).append(entry)
+
+        parts = {}
+        for group in sorted(groups):
+            entries = sorted(
+                groups[group],
+                key=lambda e: (normalize_name(e.get("name")), normalize_website(e.get("website"))),
+            )
+            if len(entries) <= SUMMARY_GROUP_SIZE:
+                parts[group] = entries
+                continue
+            for bucket, bucket_entries in self._split_group(entries):
+                parts[f"{group} (part {bucket})"] = bucket_entries
+        return parts
+
+    def _split_group(self, entries: List[Dict], bucket: int = 1, depth: int = 0):
+        """
+        Halve entries on successive bits of their name hash until each half
+        fits; bucket numbers the halves like a binary heap (2, 3, 4...).
+        """
+        if len(entries) <= SUMMARY_GROUP_SIZE or depth >= 32:
+            yield bucket, entries
+            return
+        halves = ([], [])
+        for entry in entries:
+            key = normalize_name(entry.get("name")) or normalize_website(entry.get("website"))
+            halves[(zlib.crc32(key.encode("utf-8")) >> depth) & 1].append(entry)
+        for bit, half in enumerate(halves):
+            if half:
+                yield from self._split_group(half, 2 * bucket + bit, depth + 1)
+
+    def _summarize_group(self, group: str, entries: List[Dict]) -> str:
+        prompt = GROUP_PROMPT.format(group=group) + "\n".join(
+            f"Name: {s.get('name')}, Founded: {s.get('founded_year')}, Website: {s.get('website')} -- {s.get('description')}"
+            for s in entries
+        )
+        summary = chat_completion(
             model=self.model,
             messages=[{"role": "user", "content": prompt}],
-            max_tokens=700,
+            max_tokens=400,
             temperature=0.2,
         )
+        return f"{group}:\n{summary.strip()}"
+
+    def _reduce(self, partials: List[str]) -> str:
+        return chat_completion(
+            model=self.model,
+            messages=[{"role": "user", "content": REDUCE_PROMPT + "\n\n".join(partials)}],
+            max_tokens=500,
+            temperature=0.2,
+        ).strip()
 
-        return resp.choices[0].message.content
+    def _final_prompt(self, partials: List[str]) -> str:
+        return FINAL_PROMPT + "\n\n".join(partials)
+
+    def _map_reduce_partials(self, structured_list: List[Dict], group_by: str = "sector") -> List[str]:
+        """
+        Summarize each group concurrently, then combine partial summaries in
+        batches of SUMMARY_REDUCE_FANIN until they fit one final prompt.
+        """
+        groups = self._group_entries(structured_list, group_by)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            partials = list(executor.map(tracing.propagate(lambda item: self._summarize_group(*item)), groups.items()))
+
+            while len(partials) > SUMMARY_REDUCE_FANIN:
+                batches = [partials[i:i + SUMMARY_REDUCE_FANIN] for i in range(0, len(partials), SUMMARY_REDUCE_FANIN)]
+                partials = list(executor.map(tracing.propagate(self._reduce), batches))
+        return partials
+
+    def summarize_market_hierarchical(self, structured_list: List[Dict], group_by: str = "sector") -> str:
+        """
+        Map-reduce summary for large entity sets: summarize groups of entries
+        (by sector by default) in parallel, then reduce the partial summaries
+        into the final report. Group prompts are deterministic, so groups whose
+        entries have not changed are answered from the LLM response cache.
+        """
+        partials = self._map_reduce_partials(structured_list, group_by)
+        return chat_completion(
+            model=self.model,
+            messages=[{"role": "user", "content": self._final_prompt(partials)}],
+            max_tokens=700,
+            temperature=0.2,
+        )
@@ -0,0 +1,315 @@
+import argparse
+import contextvars
+import json
+import math
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Dict, Iterable, List, Optional
+
+import config
+
+# Numeric span attributes that are summed into the parent span when a child ends.
+COUNTERS = ("bytes_in", "bytes_out", "prompt_tokens", "completion_tokens", "cache_hits", "cache_misses",
+            "rate_limited")
+
+_current = contextvars.ContextVar("current_span", default=None)
+
+
+def percentile(values: List[float], q: float) -> float:
+    """
+    Nearest-rank percentile of an unsorted list (q in 0..1).
+    """
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(0, min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1))
+    return ordered[rank]
+
+
+class Span:
+    def __init__(self, tracer: "Tracer", name: str, parent: Optional["Span"], attrs: Dict):
+        self.tracer = tracer
+        self.name = name
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex[:16]
+        self.span_id = uuid.uuid4().hex[:16]
+        self.attrs = dict(attrs)
+        self.counters = {}
+        self.error = None
+        self.start = time.time()
+        self._t0 = time.perf_counter()
+        self.duration = None
+
+    def record(self, **counters):
+        """
+        Add to this span's counters (bytes_in, prompt_tokens, cache_hits, ...).
+        """
+        with self.tracer._lock:
+            for key, value in counters.items():
+                if value:
+                    self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def end(self, error: BaseException = None):
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self._t0
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        if self.parent is not None:
+            self.parent.record(**self.counters)
+        self.tracer._finish(self)
+
+    def to_dict(self) -> Dict:
+        return {
+            "trace": self.trace_id,
+            "span": self.span_id,
+            "parent": self.parent.span_id if self.parent else None,
+            "name": self.name,
+            "start": self.start,
+            "duration_ms": round(self.duration * 1000, 3),
+            "attrs": self.attrs,
+            "counters": self.counters,
+            "error": self.error,
+        }
+
+
+class Tracer:
+    def __init__(self, path: Optional[str] = None):
+        """
+        Collect spans for pipeline stages and outbound calls. Finished spans
+        are appended to a JSONL file when path is set; durations and counters
+        are always kept per span name for summary() and OpenMetrics output.
+        :param path: JSONL file to append finished spans to.
+        """
+        self.path = path
+        self._lock = threading.RLock()
+        self._durations: Dict[str, List[float]] = {}
+        self._totals: Dict[str, Dict[str, float]] = {}
+        self._errors: Dict[str, int] = {}
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def start_span(self, name: str, **attrs) -> Span:
+        """
+        Start a span under the current one without making it current; the
+        caller must end() it. Used where a context manager cannot span the
+        work, e.g. across the yields of a generator.
+        """
+        return Span(self, name, _current.get(), attrs)
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        span = self.start_span(name, **attrs)
+        token = _current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.end(error=e)
+            raise
+        else:
+            span.end()
+        finally:
+            _current.reset(token)
+
+    def _finish(self, span: Span):
+        with self._lock:
+            self._durations.setdefault(span.name, []).append(span.duration)
+            totals = self._totals.setdefault(span.name, {})
+            for key, value in span.counters.items():
+                totals[key] = totals.get(key, 0) + value
+            if span.error:
+                self._errors[span.name] = self._errors.get(span.name, 0) + 1
+            if self.path:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(span.to_dict(), default=str) + "\n")
+
+    def summary(self) -> Dict[str, Dict]:
+        """
+        Per span name: count, errors, p50/p95/max duration in seconds and summed counters.
+        """
+        with self._lock:
+            return summarize(self._durations, self._totals, self._errors)
+
+    def write_openmetrics(self, path: str):
+        with self._lock:
+            text = openmetrics(summarize(self._durations, self._totals, self._errors))
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def reset(self):
+        with self._lock:
+            self._durations.clear()
+            self._totals.clear()
+            self._errors.clear()
+
+
+def summarize(durations: Dict[str, List[float]], totals: Dict[str, Dict], errors: Dict[str, int]) -> Dict:
+    result = {}
+    for name, values in sorted(durations.items()):
+        result[name] = {
+            "count": len(values),
+            "errors": errors.get(name, 0),
+            "p50": percentile(values, 0.5),
+            "p95": percentile(values, 0.95),
+            "max": max(values),
+            "sum": sum(values),
+            **totals.get(name, {}),
+        }
+    return result
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def openmetrics(summary: Dict[str, Dict]) -> str:
+    """
+    Render a summary() as OpenMetrics text: a duration summary per span
+    name plus one counter family per recorded counter.
+    """
+    lines = ["# TYPE span_duration_seconds summary", "# UNIT span_duration_seconds seconds"]
+    for name, s in summary.items():
+        label = _label(name)
+        lines.append(f'span_duration_seconds{{span="{label}",quantile="0.5"}} {s["p50"]:.6f}')
+        lines.append(f'span_duration_seconds{{span="{label}",quantile="0.95"}} {s["p95"]:.6f}')
+        lines.append(f'span_duration_seconds_sum{{span="{label}"}} {s["sum"]:.6f}')
+        lines.append(f'span_duration_seconds_count{{span="{label}"}} {s["count"]}')
+    lines.append("# TYPE span_errors counter")
+    for name, s in summary.items():
+        lines.append(f'span_errors_total{{span="{_label(name)}"}} {s["errors"]}')
+    for counter in COUNTERS:
+        rows = [(name, s[counter]) for name, s in summary.items() if counter in s]
+        if not rows:
+            continue
+        lines.append(f"# TYPE span_{counter} counter")
+        for name, value in rows:
+            lines.append(f'span_{counter}_total{{span="{_label(name)}"}} {value}')
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+def load_jsonl(path: str, roots_only: bool = False) -> Iterable[Dict]:
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                span = json.loads(line)
+                if not roots_only or span["parent"] is None:
+                    yield span
+
+
+def summarize_jsonl(path: str) -> Dict[str, Dict]:
+    """
+    summary() for a JSONL trace file written by an earlier run.
+    """
+    durations, totals, errors = {}, {}, {}
+    for span in load_jsonl(path):
+        name = span["name"]
+        durations.setdefault(name, []).append(span["duration_ms"] / 1000)
+        bucket = totals.setdefault(name, {})
+        for key, value in span["counters"].items():
+            bucket[key] = bucket.get(key, 0) + value
+        if span["error"]:
+            errors[name] = errors.get(name, 0) + 1
+    return summarize(durations, totals, errors)
+
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """
+    Return the process-wide tracer, writing to config.TRACE_PATH when set.
+    """
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = Tracer(config.TRACE_PATH)
+        return _tracer
+
+
+def configure(path: Optional[str]) -> Tracer:
+    """
+    Replace the process-wide tracer, e.g. to point a batch run at its own trace file.
+    """
+    global _tracer
+    with _tracer_lock:
+        _tracer = Tracer(path)
+        return _tracer
+
+
+def span(name: str, **attrs):
+    return get_tracer().span(name, **attrs)
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def record(**counters):
+    """
+    Add counters to the current span; a no-op outside of any span.
+    """
+    current = _current.get()
+    if current is not None:
+        current.record(**counters)
+
+
+def traced(name: str):
+    """
+    Decorator running the function inside a span of the given name.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def propagate(fn: Callable) -> Callable:
+    """
+    Bind fn to the caller's tracing context so spans opened in a worker
+    thread (executor.map, run_in_executor) nest under the caller's span.
+    """
+    ctx = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        # A Context can only be entered by one thread at a time, so each call gets its own copy.
+        return ctx.copy().run(fn, *args, **kwargs)
+
+    return run
+
+
+def print_summary(summary: Dict[str, Dict]):
+    for name, s in summary.items():
+        tokens = ""
+        if "prompt_tokens" in s or "completion_tokens" in s:
+            tokens = f"  tokens {s.get('prompt_tokens', 0)}+{s.get('completion_tokens', 0)}"
+        hits = ""
+        if "cache_hits" in s or "cache_misses" in s:
+            hits = f"  cache {s.get('cache_hits', 0)}/{s.get('cache_hits', 0) + s.get('cache_misses', 0)}"
+        print(f"  {name:<28} n={s['count']:<5} p50 {s['p50']:.3f}s  p95 {s['p95']:.3f}s"
+              f"  max {s['max']:.3f}s{tokens}{hits}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize a JSONL trace file.")
+    parser.add_argument("trace_file")
+    parser.add_argument("--openmetrics", default=None, help="Also write the summary in OpenMetrics format")
+    args = parser.parse_args()
+
+    summary = summarize_jsonl(args.trace_file)
+    print_summary(summary)
+    if args.openmetrics:
+        with open(args.openmetrics, "w", encoding="utf-8") as f:
+            f.write(openmetrics(summary))
+        print(f"OpenMetrics written to {args.openmetrics}")
@@ -0,0 +1,67 @@
+from modules.dedup import EntityResolver, resolve_entities
+
+
+def clusters(entries):
+    return EntityResolver().clusters(entries)
+
+
+def test_merges_name_and_domain_variants():
+    entries = [
+        {"name": "Foo AI", "website": "https://foo.ai"},
+        {"name": "Foo.ai (Pvt) Ltd", "website": "https://www.foo.com.pk/about"},
+        {"name": "Foo", "website": "https://linkedin.com/company/foo-ai"},
+        {"name": "Bar Labs", "website": "https://bar.io"},
+    ]
+    assert clusters(entries) == [[0, 1, 2]]
+
+
+def test_publisher_host_does_not_merge_companies():
+    entries = [
+        {"name": "Alpha Pay", "website": "https://techcrunch.com/2024/01/10/alpha-pay-raises"},
+        {"name": "Beta Health", "website": "https://techcrunch.com/2024/02/02/beta-health-launches"},
+        {"name": "Gamma", "website": "https://medium.com/@gamma"},
+        {"name": "Delta", "website": "https://medium.com/@delta"},
+        {"name": "Epsilon", "website": "https://dawn.com/news/1234/epsilon"},
+        {"name": "Zeta", "website": "https://dawn.com/news/5678/zeta"},
+    ]
+    assert clusters(entries) == []
+
+
+def test_same_article_link_needs_matching_names():
+    link = "https://propakistani.pk/2024/top-fintech-startups"
+    entries = [
+        {"name": "Alpha Pay", "website": link},
+        {"name": "Beta Bank", "website": link},
+        {"name": "Alpha Pay", "website": None},
+    ]
+    assert clusters(entries) == [[0, 2]]
+
+
+def test_vetoes_hold_across_the_whole_cluster():
+    entries = [
+        {"name": "Foo", "website": "https://foo.com", "sector": "Fintech"},
+        {"name": "Foo", "website": None, "sector": None},
+        {"name": "Foo", "website": "https://foo.io", "sector": "Healthtech"},
+    ]
+    assert clusters(entries) == [[0, 1]]
+
+
+def test_fuzzy_matches_respect_cluster_vetoes():
+    entries = [
+        {"name": "Acme Robotics", "founded_year": 2015},
+        {"name": "Acme Robotic", "founded_year": None},
+        {"name": "Acme Robotix", "founded_year": 2021},
+    ]
+    found = clusters(entries)
+    assert all(not {0, 2} <= set(members) for members in found)
+
+
+def test_resolve_keeps_company_domain_as_canonical():
+    entries = [
+        {"name": "Foo", "website": "https://techcrunch.com/2024/foo-raises", "sector": "Fintech"},
+        {"name": "Foo Inc", "website": "https://foo.com", "description": "Payments"},
+    ]
+    resolved, found = resolve_entities(entries)
+    assert found == [[0, 1]]
+    assert resolved == [{"name": "Foo Inc", "website": "https://foo.com", "description": "Payments",
+                         "sector": "Fintech", "aliases": ["Foo"]}]
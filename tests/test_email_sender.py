@@ -0,0 +1,116 @@
+import email
+import os
+import socket
+
+import pytest
+
+from modules import email_sender
+from modules.email_sender import EmailSender
+
+aiosmtpd = pytest.importorskip("aiosmtpd.controller")
+
+BODY = "Report attached.\n.a line starting with a dot\n..and one with two\n.\n"
+
+
+class Sink:
+    """
+    Keeps every message; rejects recipients on the refused list, and those on
+    the busy list once with a 4xx reply.
+    """
+    def __init__(self, refused=(), busy=()):
+        self.refused = set(refused)
+        self.busy = set(busy)
+        self.messages = []
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address in self.refused:
+            return "550 No such user"
+        if address in self.busy:
+            self.busy.discard(address)
+            return "451 Try again later"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append((envelope.rcpt_tos[0], email.message_from_bytes(envelope.original_content)))
+        return "250 Message accepted"
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def smtp():
+    def start(**kwargs):
+        sink = Sink(**kwargs)
+        controller = aiosmtpd.Controller(sink, hostname="127.0.0.1", port=free_port())
+        controller.start()
+        controllers.append(controller)
+        return sink, controller.port
+
+    controllers = []
+    yield start
+    for controller in controllers:
+        controller.stop()
+
+
+def sender(port, connects):
+    client = EmailSender(host="127.0.0.1", port=port, user="", password="", sender="reports@example.com",
+                         use_ssl=False, pool_size=1, backoff=0)
+    connect = client._connect
+
+    def counting_connect():
+        connects.append(1)
+        return connect()
+
+    client._connect = counting_connect
+    return client
+
+
+def attachment(message):
+    part = next(p for p in message.walk() if p.get_content_type() == "application/pdf")
+    return part.get_filename(), part.get_payload(decode=True)
+
+
+def test_send_bulk_reports_each_recipient_and_reuses_the_connection(smtp, tmp_path):
+    sink, port = smtp(refused={"gone@example.com"}, busy={"busy@example.com"})
+    path = tmp_path / "report.pdf"
+    path.write_bytes(b"%PDF-1.4 small report")
+    recipients = ["a@example.com", "gone@example.com", "busy@example.com", "b@example.com"]
+    connects = []
+    client = sender(port, connects)
+
+    results = client.send_bulk(recipients, "Report", BODY, str(path))
+    client.close()
+
+    assert [r["recipient"] for r in results] == recipients
+    assert [r["ok"] for r in results] == [True, False, True, True]
+    assert [r["attempts"] for r in results] == [1, 1, 2, 1]
+    assert "550" in results[1]["error"]
+    assert sorted(r for r, _ in sink.messages) == ["a@example.com", "b@example.com", "busy@example.com"]
+    # One pooled connection, reopened only after each of the two failures.
+    assert len(connects) == 3
+
+
+def test_streamed_attachment_arrives_byte_identical(smtp, tmp_path, monkeypatch):
+    monkeypatch.setattr(email_sender, "EMAIL_STREAM_MIN_BYTES", 0)
+    monkeypatch.setattr(email_sender, "STREAM_CHUNK", 57 * 4)
+    sink, port = smtp()
+    data = os.urandom(57 * 40 + 13) + b"\n.\r\n.\n"
+    path = tmp_path / "summary.pdf"
+    path.write_bytes(data)
+    connects = []
+    client = sender(port, connects)
+
+    results = client.send_bulk(["a@example.com", "b@example.com"], "Report", BODY, str(path))
+    client.close()
+
+    assert all(r["ok"] for r in results)
+    assert len(connects) == 1
+    for _, message in sink.messages:
+        assert attachment(message) == ("summary.pdf", data)
+        text = next(p for p in message.walk() if p.get_content_type() == "text/plain")
+        assert text.get_payload(decode=True).decode().replace("\r\n", "\n") == BODY
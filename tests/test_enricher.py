@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+
+from modules import tracing
+from modules.enricher import Enricher, PageCache
+
+web = pytest.importorskip("aiohttp.web")
+
+PAGE = "<html><head><title>Foo AI</title></head><body><p>{}</p></body></html>"
+
+
+class Site:
+    """
+    Test pages: /slow/* hold the connection briefly and track how many are
+    open at once, /big streams a body larger than the byte cap, and
+    /etag and /dated answer conditional requests with 304.
+    """
+    def __init__(self):
+        self.open = 0
+        self.max_open = 0
+        self.conditional = []
+
+    async def slow(self, request):
+        self.open += 1
+        self.max_open = max(self.max_open, self.open)
+        await asyncio.sleep(0.05)
+        self.open -= 1
+        return web.Response(text=PAGE.format(request.path), content_type="text/html")
+
+    async def big(self, request):
+        response = web.StreamResponse(headers={"Content-Type": "text/html"})
+        await response.prepare(request)
+        await response.write(b"<html><body><p>" + b"a " * 4096)
+        await response.write(b"TAIL " * 4096 + b"</p></body></html>")
+        return response
+
+    async def etag(self, request):
+        if request.headers.get("If-None-Match") == '"v1"':
+            self.conditional.append(request.path)
+            return web.Response(status=304)
+        return web.Response(text=PAGE.format("tagged"), content_type="text/html", headers={"ETag": '"v1"'})
+
+    async def dated(self, request):
+        modified = "Wed, 01 May 2024 00:00:00 GMT"
+        if request.headers.get("If-Modified-Since") == modified:
+            self.conditional.append(request.path)
+            return web.Response(status=304)
+        return web.Response(text=PAGE.format("dated"), content_type="text/html",
+                            headers={"Last-Modified": modified})
+
+
+async def serve(site, fetch):
+    app = web.Application()
+    app.router.add_get("/slow/{n}", site.slow)
+    app.router.add_get("/big", site.big)
+    app.router.add_get("/etag", site.etag)
+    app.router.add_get("/dated", site.dated)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    server = web.TCPSite(runner, "127.0.0.1", 0)
+    await server.start()
+    port = server._server.sockets[0].getsockname()[1]
+    try:
+        return await fetch(f"http://127.0.0.1:{port}")
+    finally:
+        await runner.cleanup()
+
+
+def test_per_host_limit():
+    site = Site()
+    enricher = Enricher(concurrency=16, per_host=2, use_cache=False)
+    pages = asyncio.run(serve(site, lambda base: enricher.fetch_pages([f"{base}/slow/{n}" for n in range(6)])))
+    assert all(page["text"].startswith("/slow/") for page in pages.values())
+    assert site.max_open == 2
+
+
+def test_stops_reading_at_max_bytes():
+    enricher = Enricher(max_bytes=4096, max_text_chars=100000, use_cache=False)
+
+    async def fetch(base):
+        with tracing.span("test.enrich") as span:
+            pages = await enricher.fetch_pages([f"{base}/big"])
+        return pages[f"{base}/big"], span.counters
+
+    page, counters = asyncio.run(serve(Site(), fetch))
+    assert page["text"].startswith("a a a")
+    assert "TAIL" not in page["text"]
+    assert counters["bytes_in"] == 4096
+
+
+@pytest.mark.parametrize("path", ["/etag", "/dated"])
+def test_revalidates_stale_pages(tmp_path, path):
+    site = Site()
+    cache = PageCache(str(tmp_path), fresh_ttl=0)
+    enricher = Enricher(cache=cache)
+
+    async def fetch(base):
+        url = base + path
+        first = (await enricher.fetch_pages([url]))[url]
+        stored = cache.load(url)
+        second = (await enricher.fetch_pages([url]))[url]
+        return first, stored, second, cache.load(url)
+
+    first, stored, second, revalidated = asyncio.run(serve(site, fetch))
+    assert site.conditional == [path]
+    assert second == first == stored["page"]
+    assert revalidated["fetched_at"] >= stored["fetched_at"]
@@ -0,0 +1,87 @@
+import html
+import re
+
+import pytest
+
+from reportlab.platypus import Paragraph
+
+from modules.pdf_generator import MarkdownSectionParser, _inline_markup, parse_summary
+
+
+def regex_sections(summary):
+    """
+    The splitter MarkdownSectionParser replaced (PDFGenerator._split_summary_into_sections).
+    """
+    text = re.sub(r'#+\s*', '', summary)
+    text = re.sub(r'\*\*([^*]+)\*\*', r'\1', text)
+    text = re.sub(r'\*([^*]+)\*', r'\1', text)
+    text = re.sub(r'\*\s?', '', text).strip()
+
+    sections = []
+    parts = re.split(r"(?:\n|^)([A-Z][A-Za-z ]+[:\-]?)\n", text)
+    if parts[0].strip():
+        sections.append(("Introduction", parts[0].strip()))
+    for i in range(1, len(parts), 2):
+        if i + 1 < len(parts):
+            heading = parts[i].strip().rstrip(':').strip()
+            content = parts[i + 1].strip()
+            if heading and content:
+                sections.append((heading, content))
+    return sections
+
+
+def words(text):
+    return re.findall(r"\w+", html.unescape(re.sub(r"<[^>]+>", "", text)))
+
+
+def parsed_sections(sections):
+    return [
+        (heading, words(" ".join(f"{label or ''} {markup}" for _, markup, label in blocks)))
+        for heading, blocks in sections
+    ]
+
+
+SUMMARIES = [
+    "Overview:\nThe market is growing fast.\n\nKey Players:\n- Foo builds payments.\n- Bar sells loans.\n\n"
+    "Recommendations:\n1. Focus on fintech.\n2. Watch new entrants.\n\nConclusion:\nFinal words",
+    "Some context before any heading.\n\nMarket Trends\nMore growth is expected.\nConclusion:\nFinal words\n",
+    "## Overview\nThe market shows **steady growth** in *payments*.\n\n## Recommendations\n1. Focus.\n2. Track.\n",
+    "Summary:\nGrowth is strong.\nOutlook",
+    "Summary:\nGrowth is strong.\nConclusion:\n\n",
+]
+
+
+@pytest.mark.parametrize("summary", SUMMARIES)
+def test_matches_regex_splitter(summary):
+    expected = [(heading, words(content)) for heading, content in regex_sections(summary)]
+    assert parsed_sections(parse_summary(summary)) == expected
+
+
+@pytest.mark.parametrize("summary", SUMMARIES)
+def test_streamed_fragments_match_whole_text(summary):
+    parser = MarkdownSectionParser()
+    sections = []
+    for i in range(0, len(summary), 3):
+        sections.extend(parser.feed(summary[i:i + 3]))
+    sections.extend(parser.close())
+    assert sections == parse_summary(summary)
+
+
+def test_trailing_plain_heading_is_text():
+    sections = parse_summary("Overview:\nGrowth.\n\nConclusion:\nFinal words")
+    assert [heading for heading, _ in sections] == ["Overview", "Conclusion"]
+    assert sections[-1][1] == [("para", "Final words", None)]
+
+
+@pytest.mark.parametrize("url", [
+    'https://example.com/a?x=1&y=2',
+    'https://example.com/"onclick="x',
+    "https://example.com/it's",
+])
+def test_link_href_is_escaped(url):
+    markup = _inline_markup(f"See [the site]({url}) & more")
+    # reportlab raises on markup it cannot parse.
+    paragraph = Paragraph(markup)
+    links = [href for frag in paragraph.frags for _, href in frag.link]
+    assert set(links) == {url}
+    assert "".join(frag.text for frag in paragraph.frags) == "See the site & more"